@@ -8,7 +8,9 @@
 """
 
 from copy import deepcopy
-from typing import ClassVar, Dict, List, Optional, Set, Tuple, Union
+from typing import (Any, ClassVar, Dict, FrozenSet, Iterable, List, Optional,
+                    Sequence, Set, Tuple, Union)
+from weakref import WeakValueDictionary
 
 from opetopy.common import *
 
@@ -17,39 +19,65 @@ class Variable:
     """
     A variable is just a string representing its name, annotated by an integer
     representing its dimension.
+
+    Variables are interned: constructing a variable with a name and dimension
+    that are already in use returns the existing instance. Consequently, two
+    variables are equal if and only if they are the same object. The interning
+    table only holds weak references, so variables that are no longer used
+    anywhere are evicted.
     """
 
     dimension: int
     name: str
 
+    _hash: int
+    _table: ClassVar['WeakValueDictionary[Tuple[str, int], Variable]'] = \
+        WeakValueDictionary()
+
+    def __copy__(self) -> 'Variable':
+        return self
+
+    def __deepcopy__(self, memo) -> 'Variable':
+        return self
+
     def __eq__(self, other) -> bool:
         """
         Tests syntactic equality between two variables. Two variables are equal
-        if they have the same dimension and the same name.
+        if they have the same dimension and the same name, which, since
+        variables are interned, amounts to being the same object.
         """
         if not isinstance(other, Variable):
             raise NotImplementedError
-        return self.name == other.name and self.dimension == other.dimension
+        return self is other
 
     def __hash__(self):
         """
         Return a hash of the variable. This is for Python purposes.
         """
-        return self.name.__hash__()
+        return self._hash
 
-    def __init__(self, name: str, dim: int) -> None:
+    def __new__(cls, name: str, dim: int) -> 'Variable':
         if dim < 0 and name is not None:
             raise DerivationError(
                 "Variable decrlaration",
                 f"Dimension of new variable {name} must be >= 0 (is {dim})")
-        self.dimension = dim
-        self.name = name
+        var = cls._table.get((name, dim))
+        if var is None:
+            var = super().__new__(cls)
+            var.dimension = dim
+            var.name = name
+            var._hash = hash(name)
+            cls._table[(name, dim)] = var
+        return var
 
     def __ne__(self, other) -> bool:
         if not isinstance(other, Variable):
             raise NotImplementedError
         return not (self == other)
 
+    def __reduce__(self):
+        return (Variable, (self.name, self.dimension))
+
     def __repr__(self) -> str:
         return f"{self.name}{self.dimension}"
 
@@ -251,10 +279,19 @@ class Type:
     An :math:`n`-type is a sequence of :math:`(n+1)` terms of dimension
     :math:`(n-1), (n-2), \\ldots, -1`.
 
+    Types are immutable, and represented as cons-lists: an :math:`n`-type
+    consists of its first term :py:attr:`NamedOpetope.Type.head` (the
+    :math:`1`-source), and of the :math:`(n-1)`-type
+    :py:attr:`NamedOpetope.Type.tail` made of the remaining terms (``None`` if
+    :math:`n = 0`). Thus prefixing a term (:meth:`NamedOpetope.Type.cons`) and
+    taking suffixes (:meth:`NamedOpetope.Type.suffix`) share structure instead
+    of copying terms.
     """
 
     dimension: int
-    terms: List[Term]
+    head: Term
+    tail: Optional['Type']
+    _terms: Optional[Tuple[Term, ...]]
 
     def __contains__(self, var) -> bool:
         """
@@ -268,7 +305,7 @@ class Type:
                 return True
         return False
 
-    def __init__(self, terms: List[Term]) -> None:
+    def __init__(self, terms: Sequence[Term]) -> None:
         """
         Creates a new type from a list of term. The dimension is inferred from
         the length of the list, and the terms are checked to have the correct
@@ -282,16 +319,22 @@ class Type:
         if len(terms) < 1:
             raise DerivationError("Type declaration",
                                   "A type requires at least one term")
-        self.dimension = len(terms) - 1
-        self.terms = terms
-        for i in range(len(self.terms)):
-            if self.terms[i].dimension != self.dimension - i - 1:
+        dimension = len(terms) - 1
+        for i in range(len(terms)):
+            if terms[i].dimension != dimension - i - 1:
                 raise DerivationError(
                     "Type declaration",
                     f"Invalid dimensions in term list: {i}th term "
-                    f"{str(self.terms[i])} has "
-                    f"dimension {self.terms[i].dimension}, "
-                    f"sould have {self.dimension - i - 1}")
+                    f"{str(terms[i])} has "
+                    f"dimension {terms[i].dimension}, "
+                    f"sould have {dimension - i - 1}")
+        tail = None  # type: Optional[Type]
+        for t in reversed(terms[1:]):
+            tail = Type._make(t, tail)
+        self.dimension = dimension
+        self.head = terms[0]
+        self.tail = tail
+        self._terms = tuple(terms)
 
     def __repr__(self) -> str:
         return str(self)
@@ -299,6 +342,68 @@ class Type:
     def __str__(self) -> str:
         return " ⊷ ".join([str(t) for t in self.terms])
 
+    @staticmethod
+    def _make(head: Term, tail: Optional['Type']) -> 'Type':
+        """
+        Creates the type whose first term is ``head`` and whose other terms
+        are that of ``tail``, without any check.
+        """
+        res = Type.__new__(Type)
+        res.dimension = 0 if tail is None else tail.dimension + 1
+        res.head = head
+        res.tail = tail
+        res._terms = None
+        return res
+
+    @staticmethod
+    def cons(term: Term, tail: 'Type') -> 'Type':
+        """
+        Returns the :math:`(n+1)`-type whose first term is the :math:`n`-term
+        ``term``, and whose other terms are that of the :math:`n`-type
+        ``tail``, which is shared and not copied.
+        """
+        if term.dimension != tail.dimension:
+            raise DerivationError(
+                "Type declaration",
+                f"Invalid dimensions: term {str(term)} has dimension "
+                f"{term.dimension}, sould have {tail.dimension}")
+        return Type._make(term, tail)
+
+    def suffix(self, i: int) -> 'Type':
+        """
+        Returns the :math:`(n-i)`-type made of the terms of the current
+        :math:`n`-type, except for the first ``i`` ones. This is an existing
+        subtype, and no new object is created.
+        """
+        if i < 0 or i > self.dimension:
+            raise DerivationError(
+                "Type suffix",
+                "Index out of bounds: type has dimension {dim}, so index "
+                "should be between 0 and {dim} included (is {i})",
+                dim=self.dimension,
+                i=i)
+        res = self
+        for _ in range(i):
+            if res.tail is None:
+                raise RuntimeError("[Type, suffix] Type is shorter than its "
+                                   "dimension. In valid proof trees, this "
+                                   "should not happen")
+            res = res.tail
+        return res
+
+    @property
+    def terms(self) -> Tuple[Term, ...]:
+        """
+        Returns the tuple of all the terms of the type. It is computed once,
+        and then cached.
+        """
+        if self._terms is None:
+            if self.tail is None:
+                self._terms = (self.head, )
+            else:
+                self._terms = (self.head, ) + self.tail.terms
+        return self._terms
+
     def toTex(self) -> str:
         """
         Converts the type to TeX code.
@@ -354,27 +459,24 @@ class Typing:
 class Context(Set[Typing]):
     """
     A context is a set of tyings (see :class:`opetopy.NamedOpetope.Typing`).
+
+    On top of the underlying ``set``, the context maintains an index mapping
+    each typed variable to its typing, and each variable name to the typed
+    variable, so that membership tests and type lookups are constant time.
+    Typings are never modified once added, so copies of a context share them.
     """
+
+    _names: Dict[str, Variable]
+    _typings: Dict[Variable, Typing]
+
     def __add__(self, typing: Typing) -> 'Context':
         """
-        Adds a variable typing to a deep copy of the context context, if the
+        Adds a variable typing to a copy of the context context, if the
         typed  variable isn't already typed in the context.
+
+        :see: :meth:`NamedOpetope.Context.extend`
         """
-        if not typing.term.isVariable():
-            raise DerivationError(
-                "Context, new typing",
-                f"Context typings only type variables, and {str(typing.term)} "
-                "is not one")
-        elif typing.term.variable in self:
-            raise DerivationError(
-                "Context, new typing",
-                f"Variable {str(typing.term.variable)} is already typed in "
-                "this context"
-            )
-        else:
-            res = deepcopy(self)
-            res.add(typing)
-            return res
+        return self.extend([typing])
 
     def __and__(self, other) -> 'Context':
         """
@@ -384,7 +486,7 @@ class Context(Set[Typing]):
         res = Context()
         for typing in self:
             if typing.term.variable in other:
-                res += typing
+                res.add(typing)
         return res
 
     def __contains__(self, var) -> bool:
@@ -393,31 +495,40 @@ class Context(Set[Typing]):
         """
         if not isinstance(var, Variable):
             raise NotImplementedError
-        for typing in self:
-            if Term(var) == typing.term:
-                return True
-        return False
+        return var in self._typings
 
     def __getitem__(self, name: str) -> Variable:
         """
         Returns the varible term in current context whose name is ``name``.
         """
-        for typing in self:
-            if typing.term.isVariable and \
-                    typing.term.variable is not None and \
-                    typing.term.variable.name == name:
-                return typing.term.variable
-        raise DerivationError("Context, get variable",
-                              f"Context types no variable named {name}")
+        if name not in self._names:
+            raise DerivationError("Context, get variable",
+                                  f"Context types no variable named {name}")
+        return self._names[name]
+
+    def __init__(self, typings: Iterable[Typing] = ()) -> None:
+        """
+        Creates a context containing the typings ``typings`` (empty by
+        default).
+        """
+        super().__init__()
+        self._names = {}
+        self._typings = {}
+        for typing in typings:
+            self.add(typing)
 
     def __or__(self, other):
         """
-        Returns the union of two compatible contexts.
+        Returns the union of two compatible contexts. The largest context is
+        copied, and the typings of the smallest are added to the copy.
         """
-        res = deepcopy(self)
-        for t in other:
+        if len(self) >= len(other):
+            res, small = self.copy(), other
+        else:
+            res, small = other.copy(), self
+        for t in small:
             if t.term.variable not in res:
-                res += t
+                res.add(t)
         return res
 
     def __repr__(self) -> str:
@@ -426,6 +537,52 @@ class Context(Set[Typing]):
     def __str__(self) -> str:
         return ", ".join([str(t) for t in self])
 
+    def add(self, typing: Typing) -> None:
+        """
+        Adds a typing to the context **in place**, and updates the index. No
+        check is performed, use :meth:`NamedOpetope.Context.__add__` instead.
+        """
+        var = typing.term.variable
+        if var is None:
+            raise RuntimeError("[Context, add] Cannot add a typing of the "
+                               "null term. In valid proof trees, this should "
+                               "not happen")
+        super().add(typing)
+        self._typings[var] = typing
+        self._names.setdefault(var.name, var)
+
+    def copy(self) -> 'Context':
+        """
+        Returns a shallow copy of the context: the typings are shared, the
+        index is not.
+        """
+        res = Context()
+        set.update(res, self)
+        res._names = dict(self._names)
+        res._typings = dict(self._typings)
+        return res
+
+    def extend(self, typings: Iterable[Typing]) -> 'Context':
+        """
+        Adds several variable typings at once to a single copy of the context,
+        which is returned, provided that none of the typed variables is already
+        typed.
+        """
+        res = self.copy()
+        for typing in typings:
+            if not typing.term.isVariable():
+                raise DerivationError(
+                    "Context, new typing",
+                    f"Context typings only type variables, and "
+                    f"{str(typing.term)} is not one")
+            elif typing.term.variable in res:
+                raise DerivationError(
+                    "Context, new typing",
+                    f"Variable {str(typing.term.variable)} is already typed "
+                    "in this context")
+            res.add(typing)
+        return res
+
     def graftTuples(self) -> Set[Tuple[Variable, Variable]]:
         """
         Returns all tuples (b, a) for :math:`b \\leftarrow a (\\ldots)` a
@@ -476,77 +633,85 @@ class Context(Set[Typing]):
         """
         Returns the type of a variable.
         """
-        for typing in self:
-            if typing.term == Term(var):
-                return typing.type
-        raise DerivationError(
-            "Context, type computation",
-            "Variable {var} with dimension {dim} is not typed in context, so "
-            "computing its type is not possible",
-            var=str(var),
-            dim=var.dimension)
+        if var not in self._typings:
+            raise DerivationError(
+                "Context, type computation",
+                "Variable {var} with dimension {dim} is not typed in context, "
+                "so computing its type is not possible",
+                var=str(var),
+                dim=var.dimension)
+        return self._typings[var].type
 
     def variables(self) -> Set[Variable]:
         """
         Return the set of all variables typed in the context.
         """
-        return set([
-            typing.term.variable for typing in self
-            if typing.term.variable is not None
-        ])
+        return set(self._typings.keys())
+
+
+_ClassData = Tuple[int, int, Any, List[Optional[FrozenSet[Variable]]]]
+"""
+Data of a class of an :class:`opetopy.NamedOpetope.EquationalTheory`.
+"""
 
 
 class EquationalTheory:
     """
     An equational theory (among variables), is here represented as a partition
-    of a subset of the set of all variables. Is is thus a list of sets of
-    variables. (set of sets isn't possible as python ``set`` isn't hashable)
+    of a subset of the set of all variables. It is stored as a persistent
+    union-find structure: every variable occurring in the theory but not
+    representing its class points to another variable of its class, and
+    every representative is mapped to the data of its class. Both mappings are
+    :class:`opetopy.common.PersistentDict`, so that a copy of the theory is
+    made in constant time, and that adding an equality to it only copies a
+    logarithmic number of nodes, instead of the whole theory.
+
+    The data of a class is a tuple ``(order, size, members, cache)``, where
+    ``order`` is the creation rank of the class, ``members`` is a binary tree
+    (nested pairs) whose leaves are the variables of the class, and ``cache``
+    is a one-element list holding the class as a ``frozenset`` once it has
+    been computed. Merging two classes makes the representative of the
+    smallest point to that of the largest, so that representatives are found
+    in logarithmic time.
     """
 
-    classes: List[Set[Variable]]
+    _classes: PersistentDict[Variable, '_ClassData']
+    _nextId: int
+    _parent: PersistentDict[Variable, Variable]
+    _size: int
 
     def __add__(self, eq: Tuple[Variable, Variable]) -> 'EquationalTheory':
         """
         Adds an equality (represented by a tuple of two
         :class:`opetopy.NamedOpetope.Variable`) to the theory.
         """
-        a, b = eq
-        if a.dimension != b.dimension:
-            raise DerivationError(
-                "Eq. th. extension",
-                "Dimension mismatch in new equality {a} = {b}: respective "
-                "dimensions are {da} and {db}",
-                a=str(a),
-                b=str(b),
-                da=a.dimension,
-                db=b.dimension)
-        else:
-            ia = self._index(a)
-            ib = self._index(b)
-            res = deepcopy(self)
-            if ia == -1 and ib == -1:  # Neither a nor b are in a class
-                res.classes += [set({a, b})]
-            elif ia == -1 and ib != -1:  # b is in a class but not a
-                res.classes[ib].add(a)
-            elif ia != -1 and ib == -1:  # a is in a class but not b
-                res.classes[ia].add(b)
-            elif ia != ib:  # a and b are in different classes
-                res.classes[ia] |= res.classes[ib]
-                del res.classes[ib]
-            return res
+        res = self.copy()
+        res._merge(eq[0], eq[1])
+        return res
+
+    def __deepcopy__(self, memo) -> 'EquationalTheory':
+        return self.copy()
 
     def __init__(self) -> None:
-        self.classes = []
+        self._classes = PersistentDict()
+        self._nextId = 0
+        self._parent = PersistentDict()
+        self._size = 0
 
     def __or__(self, other: 'EquationalTheory') -> 'EquationalTheory':
         """
-        Returns the union of two equational theories
+        Returns the union of two equational theories. The theory with the most
+        variables is copied, and the classes of the other are merged into the
+        copy.
         """
-        res = deepcopy(self)
-        for cls in other.classes:
+        if self._size >= other._size:
+            res, small = self.copy(), other
+        else:
+            res, small = other.copy(), self
+        for cls in small.classes:
             lcls = list(cls)
             for i in range(1, len(lcls)):
-                res += (lcls[0], lcls[i])
+                res._merge(lcls[0], lcls[i])
         return res
 
     def __repr__(self) -> str:
@@ -558,37 +723,117 @@ class EquationalTheory:
         ]
         return ", ".join(cls)
 
-    def _index(self, a: Variable) -> int:
+    def _find(self, a: Variable) -> Variable:
+        """
+        Returns the representative of the class of variable ``a``.
+        """
+        while True:
+            p = self._parent.get(a)
+            if p is None:
+                return a
+            a = p
+
+    def _merge(self, a: Variable, b: Variable) -> None:
+        """
+        Adds the equality :math:`a = b` to the theory **in place**. The
+        underlying mappings are persistent, so copies made by
+        :meth:`NamedOpetope.EquationalTheory.copy` are not affected.
+        """
+        if a.dimension != b.dimension:
+            raise DerivationError(
+                "Eq. th. extension",
+                "Dimension mismatch in new equality {a} = {b}: respective "
+                "dimensions are {da} and {db}",
+                a=str(a),
+                b=str(b),
+                da=a.dimension,
+                db=b.dimension)
+        ra, rb = self._find(a), self._find(b)
+        ca = self._classes.get(ra)  # type: Optional[_ClassData]
+        cb = self._classes.get(rb)  # type: Optional[_ClassData]
+        if ca is None:  # a is not in a class yet
+            ca = (self._nextId, 1, ra, [None])
+            self._nextId += 1
+            self._size += 1
+            if ra == rb:
+                self._classes = self._classes.set(ra, ca)
+                return
+        elif ra == rb:
+            return
+        if cb is None:  # b is not in a class yet
+            cb = (self._nextId, 1, rb, [None])
+            self._nextId += 1
+            self._size += 1
+        if ca[1] < cb[1]:
+            ra, rb, ca, cb = rb, ra, cb, ca
+        self._parent = self._parent.set(rb, ra)
+        if rb in self._classes:
+            self._classes = self._classes.remove(rb)
+        self._classes = self._classes.set(
+            ra, (min(ca[0], cb[0]), ca[1] + cb[1], (ca[2], cb[2]), [None]))
+
+    @property
+    def classes(self) -> List[FrozenSet[Variable]]:
         """
-        Returns the index (in
-        :py:attr:`NamedOpetope.EquationalTheory.classes`)
-        of the class of the variable ``a``, or `-1` of the class doesn't exist.
+        Returns the list of classes of the theory, in order of creation.
         """
-        for i in range(len(self.classes)):
-            if a in self.classes[i]:
-                return i
-        return -1
+        return [
+            self.classOf(r) for r, _ in sorted(self._classes.items(),
+                                                key=lambda x: x[1][0])
+        ]
 
-    def classOf(self, a: Variable) -> Set[Variable]:
+    def classOf(self, a: Variable) -> FrozenSet[Variable]:
         """
         Returns the class of a variable.
         """
-        ia = self._index(a)
-        if ia == -1:
-            return set({a})
-        else:
-            return self.classes[ia]
+        cls = self._classes.get(self._find(a))
+        if cls is None:
+            return frozenset({a})
+        res = cls[3][0]
+        if res is None:
+            members = []  # type: List[Variable]
+            todo = [cls[2]]
+            while len(todo) > 0:
+                t = todo.pop()
+                if isinstance(t, tuple):
+                    todo.extend(t)
+                else:
+                    members.append(t)
+            res = frozenset(members)
+            cls[3][0] = res
+        return res
+
+    def copy(self) -> 'EquationalTheory':
+        """
+        Returns a copy of the theory, in constant time: the underlying
+        mappings are persistent, and thus shared.
+        """
+        res = EquationalTheory()
+        res._classes = self._classes
+        res._nextId = self._nextId
+        res._parent = self._parent
+        res._size = self._size
+        return res
+
+    def extend(self, eqs: Iterable[Tuple[Variable, Variable]]) \
+            -> 'EquationalTheory':
+        """
+        Adds several equalities at once to a single copy of the theory, which
+        is returned.
+
+        :see: :meth:`NamedOpetope.EquationalTheory.__add__`
+        """
+        res = self.copy()
+        for a, b in eqs:
+            res._merge(a, b)
+        return res
 
     def equal(self, a: Variable, b: Variable) -> bool:
         """
         Tells wether variables (:class:`opetopy.NamedOpetope.Variable`)
         ``a`` and ``b`` are equal modulo the equational theory.
         """
-        ia = self._index(a)
-        if ia == -1:
-            return a == b
-        else:
-            return b in self.classes[ia]
+        return a == b or self._find(a) == self._find(b)
 
     def isIn(self, var: Variable, term: Term) -> bool:
         """
@@ -632,6 +877,108 @@ class OCMT:
         return "{th} ▷ {ctx}".format(th=str(self.theory),
                                      ctx=str(self.context))
 
+    def _extraTerms(self) -> List[Term]:
+        """
+        Returns the terms that are not part of the context, but should be
+        taken into account by :meth:`NamedOpetope.OCMT.canonicalForm`.
+        """
+        return []
+
+    def canonicalForm(self) -> Tuple[Any, Dict[Variable, int]]:
+        """
+        Computes a canonical labelling of the OCMT modulo its equational
+        theory (see :func:`opetopy.common.canonicalLabelling`). Returns a
+        tuple consisting of a hashable certificate, and of a ``dict`` mapping
+        every variable occurring in the context to its label. Variables that
+        are equal modulo the theory have the same label, and two OCMTs have
+        the same certificate if and only if they are equal up to a renaming
+        of variables, and modulo their respective theories.
+
+        A class of variables is initially coloured by its dimension, and
+        colours are then refined along the types of the variables of the
+        class, where terms are encoded by the colours of their variables, and
+        along the classes whose types mention it.
+        """
+        typed = {}  # type: Dict[FrozenSet[Variable], List[Variable]]
+        up = {}  # type: Dict[FrozenSet[Variable], List[FrozenSet[Variable]]]
+        # Classes mentioned in the types of the variables of a class
+        mentioned = {
+        }  # type: Dict[FrozenSet[Variable], List[FrozenSet[Variable]]]
+
+        def collect(t: Term, owner: Optional[FrozenSet[Variable]]) -> None:
+            if t.variable is None:
+                return
+            for v in [t.variable] + list(t.keys()):
+                cls = self.theory.classOf(v)
+                typed.setdefault(cls, [])
+                up.setdefault(cls, [])
+                mentioned.setdefault(cls, [])
+                if owner is not None:
+                    up[cls].append(owner)
+                    mentioned[owner].append(cls)
+            for u in t.values():
+                collect(u, owner)
+
+        for typing in self.context:
+            var = typing.term.variable
+            if var is None:
+                continue
+            cls = self.theory.classOf(var)
+            collect(typing.term, None)
+            typed[cls].append(var)
+            for t in typing.type.terms:
+                collect(t, cls)
+        for t in self._extraTerms():
+            collect(t, None)
+        classes = sorted(typed.keys(),
+                         key=lambda c: min((v.dimension, v.name) for v in c))
+
+        def encode(c: Dict[FrozenSet[Variable], int], t: Term) -> Any:
+            if t.variable is None:
+                return ()
+            return (t.degenerate, c[self.theory.classOf(t.variable)],
+                    tuple(
+                        sorted((c[self.theory.classOf(k)], encode(c, u))
+                               for k, u in t.items())))
+
+        def down(c: Dict[FrozenSet[Variable], int],
+                 cls: FrozenSet[Variable]) -> Any:
+            return tuple(
+                sorted(
+                    set(
+                        tuple(encode(c, t) for t in self.typeOf(v).terms)
+                        for v in typed[cls])))
+
+        def invariant(cls: FrozenSet[Variable]) -> Any:
+            return (next(iter(cls)).dimension, len(typed[cls]) > 0)
+
+        def signature(c: Dict[FrozenSet[Variable], int],
+                      cls: FrozenSet[Variable]) -> Any:
+            return (down(c, cls), tuple(sorted(c[d] for d in up[cls])))
+
+        def neighbours(
+                cls: FrozenSet[Variable]) -> List[FrozenSet[Variable]]:
+            return up[cls] + mentioned[cls]
+
+        def certificate(l: Dict[FrozenSet[Variable], int]) -> Any:
+            return (tuple(
+                sorted((l[cls], invariant(cls), down(l, cls))
+                       for cls in classes)),
+                    tuple(encode(l, t) for t in self._extraTerms()))
+
+        cert, labels = canonicalLabelling(classes, invariant, signature,
+                                          neighbours, certificate)
+        return cert, {v: l for cls, l in labels.items() for v in cls}
+
+    def certificate(self) -> Any:
+        """
+        Returns the certificate of the canonical form of the OCMT (see
+        :meth:`NamedOpetope.OCMT.canonicalForm`). It is hashable, so that
+        OCMTs can be deduplicated up to renaming and modulo theory with a
+        ``set`` or a ``dict``.
+        """
+        return self.canonicalForm()[0]
+
     def equal(self, t: Term, u: Term) -> bool:
         """
         Tells wether two terms ``t`` and ``u`` are equal modulo the equational
@@ -673,6 +1020,14 @@ class OCMT:
         """
         return self.theory.isIn(var, term)
 
+    def isomorphic(self, other: 'OCMT') -> bool:
+        """
+        Tells wether two OCMTs are equal up to a renaming of variables, and
+        modulo their respective theories (see
+        :meth:`NamedOpetope.OCMT.canonicalForm`).
+        """
+        return self.certificate() == other.certificate()
+
     def source(self, var: Variable, k: int = 1) -> Term:
         """
         Returns the :mathm``k``-source of a variable.
@@ -683,9 +1038,12 @@ class OCMT:
 
     def target(self, var: Variable, k: int = 1) -> Variable:
         """
-        Returns the :math:`k` target of a variable.
+        Returns the :math:`k` target of a variable. By convention, the
+        :math:`0`-target of a variable is the variable itself.
         """
-        if var.dimension == 0:
+        if k == 0:
+            return var
+        elif var.dimension == 0:
             raise DerivationError(
                 "OCMT, target computation",
                 "Cannot compute target of 0-dimensional variable {var}",
@@ -735,6 +1093,13 @@ class Sequent(OCMT):
                                              ctx=str(self.context),
                                              typ=str(self.typing))
 
+    def _extraTerms(self) -> List[Term]:
+        """
+        The typing of the sequent is taken into account by
+        :meth:`NamedOpetope.OCMT.canonicalForm`.
+        """
+        return [self.typing.term] + list(self.typing.type.terms)
+
     def graft(self, t: Term, x: Variable, u: Term) -> Term:
         """
         Grafts term (:class:`opetopy.NamedOpetope.Term`) u on term t via
@@ -791,7 +1156,14 @@ class Sequent(OCMT):
             raise DerivationError("Sequent, substitute",
                                   "Cannot substitute with the null term")
         elif s.degenerate:
-            if a in [v.variable for v in u.values()]:
+            if self.theory.equal(u.variable, a):
+                # a is the root of u, whose target is implicit, so no equality
+                # is needed
+                if len(u.keys()) == 0:
+                    return (deepcopy(s), None)
+                else:
+                    return (deepcopy(list(u.values())[0]), None)
+            elif a in [v.variable for v in u.values()]:
                 # a appears grafted on the root of u
                 # ta = None  # Term grafted in the root of u whose root is a
                 # ka = None  # Key of ta
@@ -868,7 +1240,7 @@ def shift(seq: Sequent, name: str) -> Sequent:
                               "Variable {var} already typed in context",
                               var=name)
     res = deepcopy(seq)
-    typing = Typing(Term(var), Type([seq.typing.term] + seq.typing.type.terms))
+    typing = Typing(Term(var), Type.cons(seq.typing.term, seq.typing.type))
     res.context += typing
     res.typing = typing
     return res
@@ -888,8 +1260,8 @@ def degen(seq: Sequent) -> Sequent:
             term=str(seq.typing.term))
     res = deepcopy(seq)
     var = res.typing.term.variable
-    res.typing = Typing(Term(var, True),
-                        Type([Term(var)] + res.typing.type.terms))
+    res.typing = Typing(Term(var, True), Type.cons(Term(var),
+                                                   res.typing.type))
     return res
 
 
@@ -987,13 +1359,17 @@ def graft(seqt: Sequent, seqx: Sequent, name: str) -> Sequent:
     # forming conclusion sequent
     theory = seqt.theory | seqx.theory  # union of both theories
     context = seqt.context | seqx.context  # union of both contexts
-    term = seqt.graft(seqt.typing.term, a, seqx.typing.term)  # new term
-    s1, eq = seqt.substitute(
+    # terms are computed in the union, as the substitution may graft on the
+    # source of x
+    union = Sequent(theory, context, seqt.typing)
+    term = union.graft(seqt.typing.term, a, seqx.typing.term)  # new term
+    s1, eq = union.substitute(
         seqt.typing.type.terms[0],  # 1st source of
         seqx.typing.type.terms[0],
         a)  # that new term
-    type = deepcopy(seqt.typing.type)  # the type of the new term is that of t
-    type.terms[0] = s1  # except for the 1st source, which is s1
+    # the type of the new term is that of t, except for the 1st source, which
+    # is s1
+    type = Type.cons(s1, seqt.typing.type.suffix(1))
     if eq is not None:  # add new equation on theory if needed
         theory += eq
     return Sequent(theory, context, Typing(term, type))
@@ -1123,9 +1499,17 @@ class DegenFill(RuleInstance):
 
     proofTree: RuleInstance
 
-    def __init__(self, p: RuleInstance, name: str) -> None:
+    def __init__(self, p: RuleInstance, name: str,
+                 check: bool = True) -> None:
+        """
+        Creates an instance of the ``degen-shift`` rule introducing variable
+        ``name``, and plugs proof tree ``p`` on the unique premise. If
+        ``check`` is ``True`` (default), the proof tree is evaluated, so that
+        invalid instances are rejected on construction.
+        """
         self.proofTree = Shift(Degen(p), name)
-        self.eval()
+        if check:
+            self.eval()
 
     def __repr__(self) -> str:
         return repr(self.proofTree)
@@ -1154,17 +1538,24 @@ class Graft(RuleInstance):
     proofTree2: RuleInstance
     variableName: str
 
-    def __init__(self, p1: RuleInstance, p2: RuleInstance, a: str) -> None:
+    def __init__(self,
+                 p1: RuleInstance,
+                 p2: RuleInstance,
+                 a: str,
+                 check: bool = True) -> None:
         """
         Creates an instance of the ``graft`` rule at variable ``a``, and plugs
-        proof tree ``p1`` on the first premise, and ``p2`` on the second.
+        proof tree ``p1`` on the first premise, and ``p2`` on the second. If
+        ``check`` is ``True`` (default), the proof tree is evaluated, so that
+        invalid instances are rejected on construction.
 
         :see: :func:`opetopy.NamedOpetope.graft`.
         """
         self.proofTree1 = p1
         self.proofTree2 = p2
         self.variableName = a
-        self.eval()
+        if check:
+            self.eval()
 
     def __repr__(self) -> str:
         return "Graft({p1}, {p2}, {a})".format(p1=repr(self.proofTree1),
@@ -1245,3 +1636,94 @@ def OpetopicInteger(n: int,
         for i in range(1, n):
             res = Graft(res, arrows[i], pointNames[i - 1])
         return Shift(res, cellName)
+
+
+def ProofTree(seq: Sequent, check: bool = True) -> RuleInstance:
+    """
+    Returns a proof tree deriving the sequent ``seq``, with the same variable
+    names. This is the named counterpart of
+    :func:`opetopy.UnnamedOpetope.ProofTree`.
+
+    If ``seq`` types a variable :math:`x`, then the proof tree of :math:`x` is
+
+    * :math:`\\texttt{point}` if :math:`x` is a :math:`0`-variable;
+    * :math:`\\texttt{degen-shift}` applied to the proof tree of :math:`y` if
+      the :math:`1`-source of :math:`x` is the degeneracy at :math:`y`;
+    * :math:`\\texttt{shift}` applied to the proof tree of the
+      :math:`1`-source of :math:`x` otherwise.
+
+    The proof tree of a term :math:`r(k_1 \\leftarrow u_1, \\ldots)` grafts
+    the proof trees of the roots of the :math:`u_i` on that of :math:`r`,
+    parents first. The proof tree of every variable is constructed once,
+    and then shared, so that the construction is linear in the size of the
+    terms of the context.
+
+    If ``check`` is ``True`` (default), the proof tree is then evaluated, and
+    its conclusion is compared to ``seq``: it must type the same term modulo
+    the theory, in a context typing the same variables with the same types
+    modulo the theory, and its theory must contain that of ``seq``.
+    Otherwise, a :class:`opetopy.common.DerivationError` is raised.
+    """
+    proofs = {}  # type: Dict[Variable, RuleInstance]
+
+    def ofVariable(var: Variable) -> RuleInstance:
+        res = proofs.get(var)
+        if res is None:
+            s = seq.source(var, 1)
+            if var.dimension == 0:
+                res = Point(var.name)
+            elif s.degenerate and s.variable is not None:
+                res = DegenFill(ofVariable(s.variable), var.name, False)
+            else:
+                res = Shift(ofTerm(s), var.name)
+            proofs[var] = res
+        return res
+
+    def ofTerm(t: Term) -> RuleInstance:
+        if t.variable is None:
+            raise DerivationError("Proof tree of a sequent",
+                                  "Cannot derive the (-1)-term")
+        elif t.degenerate:
+            return Degen(ofVariable(t.variable))
+        res = ofVariable(t.variable)
+        todo = [t]
+        while len(todo) > 0:
+            u = todo.pop()
+            for k, v in u.items():
+                if v.variable is None or v.degenerate:
+                    raise DerivationError(
+                        "Proof tree of a sequent",
+                        "Term {term} grafted on variable {var} should have a "
+                        "variable as root",
+                        term=str(v),
+                        var=str(k))
+                res = Graft(res, ofVariable(v.variable), k.name, False)
+                todo.append(v)
+        return res
+
+    res = ofTerm(seq.typing.term)
+    if check:
+        conclusion = res.eval()
+
+        def sameType(t: Type, u: Type) -> bool:
+            return len(t.terms) == len(u.terms) and all(
+                conclusion.equal(v, w) for v, w in zip(t.terms, u.terms))
+
+        valid = conclusion.context.variables() == seq.context.variables() \
+            and conclusion.equal(conclusion.typing.term, seq.typing.term) \
+            and sameType(conclusion.typing.type, seq.typing.type)
+        for typing in seq.context:
+            valid = valid and typing.term.variable is not None and sameType(
+                conclusion.typeOf(typing.term.variable), typing.type)
+        for cls in seq.theory.classes:
+            a = next(iter(cls))
+            for b in cls:
+                valid = valid and conclusion.theory.equal(a, b)
+        if not valid:
+            raise DerivationError(
+                "Proof tree of a sequent",
+                "The reconstructed proof tree derives {conclusion}, which "
+                "differs from {seq}",
+                conclusion=str(conclusion),
+                seq=str(seq))
+    return res
@@ -7,7 +7,7 @@
 
 """
 
-from copy import deepcopy
+from typing import List, Tuple
 
 from opetopy.common import *
 from opetopy import NamedOpetope
@@ -22,7 +22,7 @@ def repres(seq: NamedOpetope.Sequent) -> NamedOpetope.OCMT:
             "repr rule",
             "Opt! sequent expected to type a variable, typing {term}",
             term=repr(seq.typing.term))
-    res = NamedOpetope.OCMT(deepcopy(seq.theory), deepcopy(seq.context))
+    res = NamedOpetope.OCMT(seq.theory.copy(), seq.context.copy())
     # new context
     for typing in seq.context:
         v = typing.term.variable
@@ -33,7 +33,7 @@ def repres(seq: NamedOpetope.Sequent) -> NamedOpetope.OCMT:
         for i in range(1, v.dimension + 1):
             res.context += NamedOpetope.Typing(
                 NamedOpetope.Term(res.target(v, i)),
-                NamedOpetope.Type(typing.type.terms[i:]))
+                typing.type.suffix(i))
     # new theory
     for tup in seq.context.graftTuples():
         b, a = tup
@@ -63,8 +63,7 @@ def repres(seq: NamedOpetope.Sequent) -> NamedOpetope.OCMT:
                                            dim=res.target(a, k).dimension))
                 res.theory += (res.target(a, k + 2), c)
     # identification of targets
-    tmp = deepcopy(res.theory)
-    for cls in tmp.classes:
+    for cls in res.theory.classes:
         elems = list(cls)
         dim = elems[0].dimension
         for i in range(1, len(cls)):
@@ -78,13 +77,22 @@ def sum(ocmt1: NamedOpetope.OCMT,
         ocmt2: NamedOpetope.OCMT) -> NamedOpetope.OCMT:
     """
     The :math:`\\textbf{OptSet${}^!$}` :math:`\\texttt{sum}` rule.
+
+    The disjointness check and the unions run in time proportional to the
+    smallest premiss: only its variables are looked up in the other context,
+    and only its typings and equations are added to a copy of the largest.
     """
-    if len(ocmt1.context.variables() & ocmt2.context.variables()) != 0:
+    if len(ocmt1.context) <= len(ocmt2.context):
+        small, large = ocmt1.context, ocmt2.context
+    else:
+        small, large = ocmt2.context, ocmt1.context
+    inter = set([v for v in small.variables() if v in large])
+    if len(inter) != 0:
         raise DerivationError(
             "sum rule",
             "The two premiss OCTM are expected to have disjoint contexts, "
             "but intersection types the following variables {inter}",
-            inter=ocmt1.context.variables() & ocmt2.context.variables())
+            inter=inter)
     return NamedOpetope.OCMT(ocmt1.theory | ocmt2.theory,
                              ocmt1.context | ocmt2.context)
 
@@ -117,8 +125,52 @@ def glue(ocmt: NamedOpetope.OCMT, aName: str, bName: str) -> NamedOpetope.OCMT:
             sb=str(ocmt.source(b)),
             ta=str(ocmt.target(a)),
             tb=str(ocmt.target(b)))
-    res = deepcopy(ocmt)
-    res.theory += (a, b)
+    # The context is left untouched, and is thus shared with the premiss
+    return NamedOpetope.OCMT(ocmt.theory + (a, b), ocmt.context)
+
+
+def gluemany(ocmt: NamedOpetope.OCMT,
+             pairs: List[Tuple[str, str]]) -> NamedOpetope.OCMT:
+    """
+    Applies the :math:`\\textbf{OptSet${}^!$}` :math:`\\texttt{glue}` rule
+    for all pairs of variable names in ``pairs`` at once.
+
+    All equations are first added to a single copy of the theory. Since the
+    sources and targets of :math:`n`-variables only involve variables of lower
+    dimension, checking every pair for parallelism modulo that final theory is
+    equivalent to applying :func:`opetopy.NamedOpetopicSet.glue` pair after
+    pair, by increasing dimension. Unlike chaining ``glue``, all invalid pairs
+    are reported in a single :class:`opetopy.common.DerivationError`.
+    """
+    errors = []  # type: List[str]
+    eqs = []  # type: List[Tuple[NamedOpetope.Variable, NamedOpetope.Variable]]
+    for aName, bName in pairs:
+        try:
+            a = ocmt.context[aName]
+            b = ocmt.context[bName]
+        except DerivationError as e:
+            errors.append(e.message)
+            continue
+        if a.dimension != b.dimension:
+            errors.append(f"{a} and {b} do not have the same dimension (have "
+                          f"respectively {a.dimension} and {b.dimension})")
+        else:
+            eqs.append((a, b))
+    theory = ocmt.theory.extend(eqs)
+    res = NamedOpetope.OCMT(theory, ocmt.context)
+    for a, b in eqs:
+        if a.dimension != 0 and not \
+            (res.equal(res.source(a), res.source(b)) and
+             theory.equal(res.target(a), res.target(b))):
+            errors.append(f"{a} and {b} are not parallel: sa = "
+                          f"{res.source(a)}, sb = {res.source(b)}, ta = "
+                          f"{res.target(a)}, tb = {res.target(b)}")
+    if len(errors) != 0:
+        raise DerivationError(
+            "glue rule",
+            "{n} identification(s) cannot be performed: {errors}",
+            n=len(errors),
+            errors="; ".join(errors))
     return res
 
 
@@ -256,6 +308,43 @@ class Glue(RuleInstance):
         return glue(self.proofTree.eval(), self.aName, self.bName)
 
 
+class GlueMany(RuleInstance):
+    """
+    A class representing several consecutive instances of the ``glue`` rule in
+    a proof tree, evaluated at once with
+    :func:`opetopy.NamedOpetopicSet.gluemany`.
+    """
+
+    proofTree: RuleInstance
+    pairs: List[Tuple[str, str]]
+
+    def __init__(self, p: RuleInstance, pairs: List[Tuple[str, str]]) -> None:
+        self.proofTree = p
+        self.pairs = pairs
+
+    def __repr__(self) -> str:
+        return "GlueMany({p}, {pairs})".format(p=repr(self.proofTree),
+                                               pairs=repr(self.pairs))
+
+    def __str__(self) -> str:
+        return "GlueMany({p}, {pairs})".format(p=str(self.proofTree),
+                                               pairs=str(self.pairs))
+
+    def _toTex(self) -> str:
+        """
+        Converts the proof tree in TeX code. This method should not be called
+        directly, use :meth:`NamedOpetope.RuleInstance.toTex`
+        instead.
+        """
+        eqs = ", ".join([a + " = " + b for a, b in self.pairs])
+        return self.proofTree._toTex() + \
+            "\n\t\\RightLabel{\\texttt{glue-}$(" + eqs + \
+            ")$}\n\t\\UnaryInfC{$" + self.eval().toTex() + "$}"
+
+    def eval(self) -> NamedOpetope.OCMT:
+        return gluemany(self.proofTree.eval(), self.pairs)
+
+
 class Zero(RuleInstance):
     """
     A class representing an instance of the ``zero`` rule in a proof tree.
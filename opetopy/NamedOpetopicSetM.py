@@ -8,7 +8,7 @@
 """
 
 from copy import deepcopy
-from typing import Union
+from typing import List, Tuple, Union
 
 from opetopy.common import *
 from opetopy import NamedOpetope
@@ -35,7 +35,7 @@ def degen(ocmt: NamedOpetope.OCMT, name: str) -> NamedOpetope.Sequent:
     type = ocmt.context.typeOf(var)
     t = NamedOpetope.Typing(
         NamedOpetope.Term(var, True),
-        NamedOpetope.Type([NamedOpetope.Term(var)] + type.terms))
+        NamedOpetope.Type.cons(NamedOpetope.Term(var), type))
     return NamedOpetope.Sequent(deepcopy(ocmt.theory), deepcopy(ocmt.context),
                                 t)
 
@@ -66,6 +66,10 @@ def shift(seq: NamedOpetope.Sequent, name: str) -> NamedOpetope.OCMT:
     The :math:`\\textbf{OptSet${}^!_m$}` :math:`\\texttt{shift}` rule.
     Takes a sequent ``seq`` typing a term ``t`` and introduces
     a new variable ``x`` having ``t`` as :math:`1`-source.
+
+    The premiss is left untouched: the new variable and its :math:`n+1`
+    targets are added at once to a single copy of its context, and the new
+    equations to a single copy of its theory.
     """
     n = seq.typing.term.dimension
     var = NamedOpetope.Variable(name, n + 1)
@@ -74,30 +78,31 @@ def shift(seq: NamedOpetope.Sequent, name: str) -> NamedOpetope.OCMT:
             "shift rule",
             "NamedOpetope.Variable {var} already typed in context",
             var=name)
-    typing = NamedOpetope.Typing(
-        NamedOpetope.Term(var),
-        NamedOpetope.Type([seq.typing.term] + seq.typing.type.terms))
-    res = NamedOpetope.OCMT(deepcopy(seq.theory),
-                            deepcopy(seq.context) + typing)
-    # targets of new variable
-    for i in range(1, n + 2):
-        res.context += NamedOpetope.Typing(
-            NamedOpetope.Term(res.target(var, i)),
-            NamedOpetope.Type(typing.type.terms[i:]))
-    # additional theory
     termVar = seq.typing.term.variable
     if termVar is None:
         raise RuntimeError(
             "[shift rule] Premiss sequent types an invalid term. In valid "
             "proof trees, this should not happen")
+    typing = NamedOpetope.Typing(
+        NamedOpetope.Term(var),
+        NamedOpetope.Type.cons(seq.typing.term, seq.typing.type))
+    # new variable and its targets
+    typings = [typing] + [
+        NamedOpetope.Typing(NamedOpetope.Term(seq.target(var, i)),
+                            typing.type.suffix(i))
+        for i in range(1, n + 2)
+    ]
+    # additional theory
+    eqs = []  # type: List[Tuple[NamedOpetope.Variable, NamedOpetope.Variable]]
     if seq.typing.term.degenerate:
         for i in range(n):
-            res.theory += (res.target(var, i + 2), res.target(termVar, i))
+            eqs.append((seq.target(var, i + 2), seq.target(termVar, i)))
     elif n >= 1:
-        seq.theory += (res.target(var, 2), res.target(termVar))
+        eqs.append((seq.target(var, 2), seq.target(termVar)))
         for gt in seq.typing.term.graftTuples():
-            seq.theory += (res.target(gt[1]), gt[0])
-    return res
+            eqs.append((seq.target(gt[1]), gt[0]))
+    return NamedOpetope.OCMT(seq.theory.extend(eqs),
+                             seq.context.extend(typings))
 
 
 def zero() -> NamedOpetope.OCMT:
@@ -128,6 +133,16 @@ def glue(ocmt: NamedOpetope.OCMT, aName: str, bName: str) -> NamedOpetope.OCMT:
     return NamedOpetopicSet.glue(ocmt, aName, bName)
 
 
+def gluemany(ocmt: NamedOpetope.OCMT,
+             pairs: List[Tuple[str, str]]) -> NamedOpetope.OCMT:
+    """
+    Applies the :math:`\\textbf{OptSet${}^!_m$}` :math:`\\texttt{glue}` rule
+    for all pairs in ``pairs`` at once, which is the same as
+    :func:`opetopy.NamedOpetopicSet.gluemany`.
+    """
+    return NamedOpetopicSet.gluemany(ocmt, pairs)
+
+
 class RuleInstance(AbstractRuleInstance):
     """
     A rule instance of system :math:`\\textbf{OptSet${}^!_m$}`.
@@ -480,6 +495,48 @@ class Glue(RuleInstance):
             return glue(ocmt, self.aName, self.bName)
 
 
+class GlueMany(RuleInstance):
+    """
+    A class representing several consecutive instances of the ``glue`` rule in
+    a proof tree, evaluated at once with
+    :func:`opetopy.NamedOpetopicSetM.gluemany`.
+    """
+
+    proofTree: RuleInstance
+    pairs: List[Tuple[str, str]]
+
+    def __init__(self, p: RuleInstance, pairs: List[Tuple[str, str]]) -> None:
+        self.proofTree = p
+        self.pairs = pairs
+
+    def __repr__(self) -> str:
+        return "GlueMany({p}, {pairs})".format(p=repr(self.proofTree),
+                                               pairs=repr(self.pairs))
+
+    def __str__(self) -> str:
+        return "GlueMany({p}, {pairs})".format(p=str(self.proofTree),
+                                               pairs=str(self.pairs))
+
+    def _toTex(self) -> str:
+        """
+        Converts the proof tree in TeX code. This method should not be called
+        directly, use :meth:`NamedOpetopicSetM.RuleInstance.toTex`
+        instead.
+        """
+        eqs = ", ".join([a + " = " + b for a, b in self.pairs])
+        return self.proofTree._toTex() + \
+            "\n\t\\RightLabel{\\texttt{glue-}$(" + eqs + \
+            ")$}\n\t\\UnaryInfC{$" + self.eval().toTex() + "$}"
+
+    def eval(self) -> NamedOpetope.OCMT:
+        ocmt = self.proofTree.eval()
+        if not isinstance(ocmt, NamedOpetope.OCMT):
+            raise DerivationError("glue rule",
+                                  "Premiss expected to be an OCMT")
+        else:
+            return gluemany(ocmt, self.pairs)
+
+
 class DegenFill(RuleInstance):
     """
     A convenient class chaining an instance of the ``degen`` rule with an
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: Translation
+   :synopsis: Translations between named and unnamed opetopes
+
+.. moduleauthor:: Cédric HT
+
+"""
+
+from typing import (Any, Callable, Dict, FrozenSet, Iterable, List, Optional,
+                    Set, Tuple, Union)
+
+from opetopy.common import *
+from opetopy import NamedOpetope
+from opetopy import UnnamedOpetope
+
+
+class NameSupply:
+    """
+    A deterministic supply of fresh names: calling it returns the names
+    ``prefix0``, ``prefix1``, etc. in that order, skipping the names that
+    have been declared as used.
+    """
+
+    count: int
+    prefix: str
+    used: Set[str]
+
+    def __call__(self) -> str:
+        """
+        Returns the next fresh name, and marks it as used.
+        """
+        while self.prefix + str(self.count) in self.used:
+            self.count += 1
+        res = self.prefix + str(self.count)
+        self.used.add(res)
+        self.count += 1
+        return res
+
+    def __init__(self, prefix: str = "x", used: Iterable[str] = ()) -> None:
+        """
+        Inits a name supply whose names start with ``prefix``, and that will
+        never return a name in ``used``.
+        """
+        self.count = 0
+        self.prefix = prefix
+        self.used = set(used)
+
+
+def _renameSequent(seq: NamedOpetope.Sequent,
+                   rename: Callable[[NamedOpetope.Variable],
+                                    NamedOpetope.Variable]) \
+        -> NamedOpetope.Sequent:
+    """
+    Returns a copy of sequent ``seq`` in which every variable :math:`v` is
+    replaced by ``rename(v)``. Types sharing a suffix in ``seq`` still share
+    its copy.
+    """
+    types = {}  # type: Dict[int, NamedOpetope.Type]
+
+    def term(t: NamedOpetope.Term) -> NamedOpetope.Term:
+        if t.variable is None:
+            return NamedOpetope.Term()
+        res = NamedOpetope.Term(rename(t.variable), t.degenerate)
+        for k, u in t.items():
+            res[rename(k)] = term(u)
+        return res
+
+    def typeOf(t: NamedOpetope.Type) -> NamedOpetope.Type:
+        res = types.get(id(t))
+        if res is None:
+            if t.tail is None:
+                res = NamedOpetope.Type([term(t.head)])
+            else:
+                res = NamedOpetope.Type.cons(term(t.head), typeOf(t.tail))
+            types[id(t)] = res
+        return res
+
+    # Every variable is equated to a representative of its class
+    eqs = []  # type: List[Tuple[NamedOpetope.Variable, NamedOpetope.Variable]]
+    for cls in seq.theory.classes:
+        a = next(iter(cls))
+        eqs.extend((rename(a), rename(b)) for b in cls if b != a)
+    theory = NamedOpetope.EquationalTheory().extend(eqs)
+    context = NamedOpetope.Context(
+        NamedOpetope.Typing(term(t.term), typeOf(t.type))
+        for t in seq.context)
+    return NamedOpetope.Sequent(
+        theory, context,
+        NamedOpetope.Typing(term(seq.typing.term), typeOf(seq.typing.type)))
+
+
+def _prefixed(prefix: str, var: NamedOpetope.Variable) \
+        -> NamedOpetope.Variable:
+    """
+    Prefixes the name of a variable of a template (see
+    :func:`opetopy.Translation._namedTemplate`) by ``prefix``. The variable
+    named ``""`` is renamed ``prefix``.
+    """
+    return NamedOpetope.Variable(
+        prefix + "." + var.name if var.name else prefix, var.dimension)
+
+
+def _subterm(seq: NamedOpetope.Sequent, t: NamedOpetope.Term,
+             addr: UnnamedOpetope.Address) -> NamedOpetope.Term:
+    """
+    Returns the subterm of term ``t`` whose root is the node at address
+    ``addr``. The :math:`i`-th edge of ``addr`` is an address in the
+    :math:`1`-source of the :math:`i`-th node on the way, and designates the
+    key of the next subterm.
+    """
+    for e in addr.edges:
+        if t.variable is None:
+            raise RuntimeError(
+                "[Translation, to named] Address {addr} is not in a term. "
+                "In valid derivations, this should not happen".format(
+                    addr=str(addr)))
+        k = _subterm(seq, seq.source(t.variable, 1), e).variable
+        if k is None or k not in t:
+            raise RuntimeError(
+                "[Translation, to named] Address {addr} is not in a term. "
+                "In valid derivations, this should not happen".format(
+                    addr=str(addr)))
+        t = t[k]
+    return t
+
+
+def _matchTerms(seqc: NamedOpetope.Sequent, c: NamedOpetope.Term,
+                seqp: NamedOpetope.Sequent, p: NamedOpetope.Term,
+                res: Dict[NamedOpetope.Variable, NamedOpetope.Variable]) \
+        -> None:
+    """
+    Maps the variables of term ``c`` of sequent ``seqc`` to the variables at
+    the same positions in term ``p`` of sequent ``seqp``, in ``res``, and
+    likewise for the types of the variables that are newly mapped.
+    """
+    if c.variable is None or p.variable is None:
+        return
+    if c.variable not in res:
+        res[c.variable] = p.variable
+        for i in range(1, c.variable.dimension + 1):
+            _matchTerms(seqc, seqc.source(c.variable, i), seqp,
+                        seqp.source(p.variable, i), res)
+    if c.degenerate or len(c) == 0:
+        return
+    addresses = {}  # type: Dict[NamedOpetope.Variable, Any]
+    todo = [(UnnamedOpetope.Address.epsilon(c.variable.dimension - 1),
+             seqc.source(c.variable, 1))]
+    while len(todo) > 0:
+        addr, u = todo.pop()
+        if u.variable is not None and not u.degenerate:
+            addresses[u.variable] = addr
+            for k, v in u.items():
+                todo.append((addr + addresses[k], v))
+    for k, u in c.items():
+        kp = _subterm(seqp, seqp.source(p.variable, 1),
+                      addresses[k]).variable
+        if kp is None or kp not in p:
+            raise RuntimeError(
+                "[Translation, to named] Terms {c} and {p} do not match. In "
+                "valid derivations, this should not happen".format(
+                    c=str(c), p=str(p)))
+        res.setdefault(k, kp)
+        _matchTerms(seqc, u, seqp, p[kp], res)
+
+
+def _namedTemplate(omega: UnnamedOpetope.Shape) -> NamedOpetope.Sequent:
+    """
+    Returns the template of the named translation of shape ``omega`` (see
+    :func:`opetopy.Translation.toNamed`), i.e. that translation where the
+    typed variable is named ``""``, and where the names of the other variables
+    are not prefixed. The template is derived by the rules of
+    :math:`\\textbf{Opt${}^!$}` from the templates of the sources (or of the
+    degeneracy) of ``omega``, and then cached.
+    """
+    res = _namedTemplates.get(omega.id)
+    if res is not None:
+        return res
+    if omega.source.dimension == 0:
+        res = NamedOpetope.point("")
+    elif omega.source.isDegenerate:
+        res = NamedOpetope.degenfill(
+            _renameSequent(_namedTemplate(omega.degeneracyShape()),
+                           lambda v: _prefixed("d", v)), "")
+    else:
+        # The node at address [p[q]] is grafted on the variable at address
+        # [q] of the source of the node at address [p], parents first, and
+        # shares the variables of its 2-source, and of their types, with
+        # those of the source of that variable. The nodes grafted on the
+        # source of a node are grafted farthest from its root first, as
+        # grafting a degenerate node on the root of a term adds no equation
+        # (the target of the root being implicit)
+        eps = UnnamedOpetope.Address.epsilon(omega.source.dimension - 1)
+        children = {}  # type: Dict[UnnamedOpetope.Address, List[Any]]
+        for a in omega.source.nodes.keys():
+            if not a.isEpsilon():
+                children.setdefault(a.edgeDecomposition()[0], []).append(a)
+        res = _renameSequent(_namedTemplate(omega.sourceShape(eps)),
+                             lambda v: _prefixed("s" + str(eps), v))
+        todo = [eps]
+        while len(todo) > 0:
+            p = todo.pop()
+            node = NamedOpetope.Variable("s" + str(p),
+                                         omega.source.dimension - 1)
+            for a in sorted(children.get(p, []), reverse=True):
+                q = a.edgeDecomposition()[1]
+                k = _subterm(res, res.source(node, 1), q).variable
+                if k is None:
+                    raise RuntimeError(
+                        "[Translation, to named] Node {node} has no source "
+                        "at address {q}. In valid derivations, this should "
+                        "not happen".format(node=str(node), q=str(q)))
+                child = _namedTemplate(omega.sourceShape(a))
+                top = child.typing.term.variable
+                if top is None:
+                    raise RuntimeError(
+                        "[Translation, to named] Template of shape {shape} "
+                        "does not type a variable. In valid derivations, "
+                        "this should not happen".format(shape=str(child)))
+                shared = {}  # type: Dict[Any, NamedOpetope.Variable]
+                if k.dimension > 0:
+                    _matchTerms(child, child.source(top, 2), res,
+                                res.source(k, 1), shared)
+                prefix = "s" + str(a)
+                res = NamedOpetope.graft(
+                    res,
+                    _renameSequent(
+                        child,
+                        lambda v: shared.get(v) or _prefixed(prefix, v)),
+                    k.name)
+                todo.append(a)
+        res = NamedOpetope.shift(res, "")
+    _namedTemplates[omega.id] = res
+    return res
+
+
+def toNamed(p: Union[UnnamedOpetope.Preopetope, UnnamedOpetope.Sequent,
+                     UnnamedOpetope.RuleInstance, UnnamedOpetope.Shape],
+            name: str = "x") -> NamedOpetope.Sequent:
+    """
+    Translates an unnamed opetope, given as a preopetope, as a sequent
+    deriving it, as a proof tree, or as a registered shape, into a derivable
+    sequent of system :math:`\\textbf{Opt${}^!$}` typing a variable of that
+    shape.
+
+    The typed variable is named ``name``, and every other variable is named
+    after the path of source (``s`` followed by an address) and degeneracy
+    (``d``) steps leading to it from the whole opetope, e.g. ``x.s[].s[*]``,
+    as in :func:`opetopy.UnnamedOpetopicSet.representableCells`. A variable
+    is introduced for every such path, except that a node grafted on a
+    variable :math:`a` shares the variables of its target with those of
+    :math:`a`, as in a derivation. Hence, a face of the opetope (see
+    :class:`opetopy.UnnamedOpetope.FacePoset`) may be represented by several
+    variables, that are then equal modulo the equational theory of the
+    sequent (e.g. the endpoints of an arrow on which a degenerate face is
+    grafted).
+
+    The translation of a registered shape (see
+    :func:`opetopy.UnnamedOpetope.shapeOf`) is derived once, from that of its
+    sources, as a template whose variables are then renamed at each call, in
+    linear time.
+    """
+    return _renameSequent(_namedTemplate(UnnamedOpetope.shapeOf(p)),
+                          lambda v: _prefixed(name, v))
+
+
+def toNamedAll(ps: Iterable[Union[UnnamedOpetope.Preopetope,
+                                  UnnamedOpetope.Sequent,
+                                  UnnamedOpetope.RuleInstance,
+                                  UnnamedOpetope.Shape]],
+               names: Optional[NameSupply] = None) \
+        -> List[NamedOpetope.Sequent]:
+    """
+    Translates several unnamed opetopes at once (see
+    :func:`opetopy.Translation.toNamed`). The typed variables are named by the
+    name supply ``names`` (by default, ``x0``, ``x1``, etc.), so that the
+    resulting sequents have pairwise disjoint contexts. Opetopes of the same
+    shape share the template of their translation.
+    """
+    if names is None:
+        names = NameSupply()
+    return [toNamed(p, names()) for p in ps]
+
+
+def toUnnamed(p: Union[NamedOpetope.Sequent, NamedOpetope.RuleInstance]) \
+        -> Tuple[UnnamedOpetope.Shape, Dict[UnnamedOpetope.Address,
+                                            NamedOpetope.Variable]]:
+    """
+    Translates a sequent of system :math:`\\textbf{Opt${}^!$}`, or a proof
+    tree deriving it, into the registered shape (see
+    :func:`opetopy.UnnamedOpetope.shapeOf`) of the corresponding unnamed
+    opetope, whose sequent holds its preopetope and its context. If the
+    sequent types an :math:`n`-variable :math:`x`, then that opetope is the
+    :math:`n`-opetope of which :math:`x` is a cell. Otherwise, it types an
+    :math:`n`-term :math:`t`, and that opetope is the :math:`(n+1)`-opetope
+    whose source is :math:`t`, i.e. that of the variable that the
+    :math:`\\texttt{shift}` rule would introduce.
+
+    Also returns a ``dict`` mapping the node addresses of that opetope to the
+    variables of the corresponding nodes of the :math:`1`-source of
+    :math:`x` (or of :math:`t`).
+
+    The preopetope of every variable class (modulo the equational theory) is
+    computed once, so that the translation is linear in the size of the
+    context. Then, the proof tree of the shape is only reconstructed the first
+    time that shape is encountered.
+    """
+    seq = p.eval() if isinstance(p, NamedOpetope.RuleInstance) else p
+    cache = {}  # type: Dict[FrozenSet[NamedOpetope.Variable], Any]
+
+    def fromTerm(t: NamedOpetope.Term) \
+            -> Tuple[UnnamedOpetope.Preopetope,
+                     Dict[UnnamedOpetope.Address, NamedOpetope.Variable]]:
+        if t.variable is None:
+            return UnnamedOpetope.Preopetope.point(), {}
+        elif t.degenerate:
+            return (UnnamedOpetope.Preopetope.degenerate(
+                fromVariable(t.variable)[0]), {})
+        res = UnnamedOpetope.Preopetope(t.dimension + 1)
+        names = {}  # type: Dict[UnnamedOpetope.Address, NamedOpetope.Variable]
+        todo = [(UnnamedOpetope.Address.epsilon(t.dimension), t)]
+        while len(todo) > 0:
+            addr, u = todo.pop()
+            if u.variable is None or u.degenerate:
+                raise RuntimeError(
+                    "[Translation, to unnamed] Term {term} has an invalid "
+                    "subterm. In valid derivations, this should not "
+                    "happen".format(term=str(t)))
+            res.nodes[addr], edges = fromVariable(u.variable)
+            names[addr] = u.variable
+            for k, v in u.items():
+                todo.append((addr + edges[seq.theory.classOf(k)], v))
+        return res, names
+
+    def fromVariable(var: NamedOpetope.Variable) \
+            -> Tuple[UnnamedOpetope.Preopetope,
+                     Dict[FrozenSet[NamedOpetope.Variable],
+                          UnnamedOpetope.Address]]:
+        cls = seq.theory.classOf(var)
+        res = cache.get(cls)
+        if res is None:
+            q, names = fromTerm(seq.source(var, 1))
+            res = (q, {seq.theory.classOf(v): a for a, v in names.items()})
+            cache[cls] = res
+        return res
+
+    term = seq.typing.term
+    if term.isVariable() and term.variable is not None:
+        term = seq.source(term.variable, 1)
+    q, names = fromTerm(term)
+    return UnnamedOpetope.shapeOf(q), names
+
+
+def toUnnamedAll(
+    ps: Iterable[Union[NamedOpetope.Sequent, NamedOpetope.RuleInstance]]
+) -> List[Tuple[UnnamedOpetope.Shape, Dict[UnnamedOpetope.Address,
+                                           NamedOpetope.Variable]]]:
+    """
+    Translates several named opetopes at once (see
+    :func:`opetopy.Translation.toUnnamed`). Named opetopes of the same shape
+    share a single registered shape, whose proof tree is only reconstructed
+    once.
+    """
+    return [toUnnamed(p) for p in ps]
+
+
+_namedTemplates = {}  # type: Dict[int, NamedOpetope.Sequent]
+"""
+Templates of the named translations of the registered shapes, indexed by
+shape identifier (see :func:`opetopy.Translation._namedTemplate`).
+"""
@@ -8,7 +8,8 @@
 """
 
 from copy import deepcopy
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+from weakref import WeakKeyDictionary
 
 from opetopy.common import *
 
@@ -525,8 +526,7 @@ class Preopetope:
             return "∅"
         elif self.dimension == 0:
             return "⧫"
-        elif self == Preopetope.fromDictOfPreopetopes(
-            {Address.epsilon(0): Preopetope.point()}):
+        elif self == ARROW.source:
             return "■"
         elif self.isDegenerate:
             return "degen({d})".format(d=str(self.degeneracy))
@@ -708,7 +708,7 @@ class Preopetope:
                 return q
             else:  # otherwise, the node at addr must be globular
                 r = Preopetope(p.dimension)
-                for a in p.nodeAddresses():
+                for a in (p - addr).nodeAddresses():
                     r += (Address.substitution(
                         a, addr + Address.epsilon(p.dimension - 2),
                         addr), p.source(a))
@@ -759,8 +759,7 @@ class Preopetope:
             return "\\emptyset"
         elif self.dimension == 0:
             return "\\optZero"
-        elif self == Preopetope.fromDictOfPreopetopes(
-            {Address.epsilon(0): Preopetope.point()}):
+        elif self == ARROW.source:
             return "\\optOne"
         elif self.isDegenerate:
             if self.degeneracy is None:
@@ -1246,3 +1245,570 @@ def ProofTree(p: Dict[Optional[Address], Dict]) -> RuleInstance:
             res = Graft(res, ProofTree(p[sa[i]]), sa[i])
         res.eval()
         return res
+
+
+class Shape:
+    """
+    An opetope together with a proof tree
+    (:class:`opetopy.UnnamedOpetope.RuleInstance`) deriving it, and the
+    evaluated conclusion (:class:`opetopy.UnnamedOpetope.Sequent`) of that
+    proof tree. Shapes are not meant to be constructed directly, but obtained
+    through :func:`opetopy.UnnamedOpetope.shape`, which registers them so that
+    every opetope is represented by a unique instance. Consequently, shapes
+    are shared, must never be modified, and can be compared by identity.
+
+    Every opetope (and more generally every preopetope) encountered by the
+    registry is given an integer identifier. The identifiers of the sources and
+    of the target of the shape (and of its degeneracy, if any) are
+    precomputed, so that shape compatibility checks reduce to integer
+    comparisons.
+    """
+
+    degeneracyId: Optional[int]
+    id: int
+    proof: RuleInstance
+    sequent: Sequent
+    sourceIds: Dict[Address, int]
+    targetId: int
+    _degeneracyShape: Optional['Shape']
+    _faces: Optional['FacePoset']
+    _sourceShapes: Dict[Address, 'Shape']
+    _targetShape: Optional['Shape']
+
+    def __copy__(self) -> 'Shape':
+        return self
+
+    def __deepcopy__(self, memo) -> 'Shape':
+        return self
+
+    def __init__(self, id: int, proof: RuleInstance, seq: Sequent) -> None:
+        """
+        Inits a shape. This method should not be called directly, use
+        :func:`opetopy.UnnamedOpetope.shape` instead.
+        """
+        self.degeneracyId = None
+        if seq.source.isDegenerate and seq.source.degeneracy is not None:
+            self.degeneracyId = _preopetopeId(seq.source.degeneracy)
+        self.id = id
+        self.proof = proof
+        self.sequent = seq
+        self.sourceIds = {
+            addr: _preopetopeId(p)
+            for addr, p in seq.source.nodes.items()
+        }
+        self.targetId = _preopetopeId(seq.target)
+        self._degeneracyShape = None
+        self._faces = None
+        self._sourceShapes = {}
+        self._targetShape = None
+
+    def __reduce__(self):
+        return (shape, (self.proof, ))
+
+    def __repr__(self) -> str:
+        return "Shape({id}, {proof})".format(id=self.id,
+                                             proof=repr(self.proof))
+
+    def __str__(self) -> str:
+        return str(self.source)
+
+    def degeneracyShape(self) -> 'Shape':
+        """
+        Returns the registered shape of the degeneracy of the current
+        (degenerate) shape. It is computed once, and then cached.
+        """
+        if self._degeneracyShape is None:
+            if not self.source.isDegenerate or \
+                    self.source.degeneracy is None:
+                raise DerivationError("Shape, degeneracy",
+                                      "Shape is not degenerate")
+            degeneracy = self.source.degeneracy
+            res = _shapesById.get(_preopetopeId(degeneracy))
+            if res is None:
+                if isinstance(self.proof, Degen):
+                    res = shape(self.proof.proofTree)
+                else:
+                    res = shape(ProofTree(degeneracy.toDict()))
+            self._degeneracyShape = res
+        return self._degeneracyShape
+
+    def faces(self) -> 'FacePoset':
+        """
+        Returns the face poset (:class:`opetopy.UnnamedOpetope.FacePoset`) of
+        the shape. It is computed once, and then cached.
+        """
+        if self._faces is None:
+            self._faces = _facePoset(self)
+        return self._faces
+
+    @property
+    def source(self) -> Preopetope:
+        """
+        Returns the opetope (:class:`opetopy.UnnamedOpetope.Preopetope`)
+        described by the shape.
+        """
+        return self.sequent.source
+
+    def sourceShape(self, addr: Address) -> 'Shape':
+        """
+        Returns the registered shape of the source at address ``addr`` of the
+        current shape. It is computed once, and then cached.
+        """
+        res = self._sourceShapes.get(addr)
+        if res is None:
+            if addr not in self.sourceIds:
+                raise DerivationError("Shape, source",
+                                      "Address {addr} not in shape {this}",
+                                      addr=str(addr),
+                                      this=str(self))
+            res = _shapesById.get(self.sourceIds[addr])
+            if res is None:
+                res = shape(ProofTree(self.source.nodes[addr].toDict()))
+            self._sourceShapes[addr] = res
+        return res
+
+    @property
+    def target(self) -> Preopetope:
+        """
+        Returns the target (:class:`opetopy.UnnamedOpetope.Preopetope`) of the
+        opetope described by the shape.
+        """
+        return self.sequent.target
+
+    def targetShape(self) -> 'Shape':
+        """
+        Returns the registered shape of the target of the current shape. It is
+        computed once, and then cached. If the target has already been
+        registered, it is returned as is. Otherwise, its proof tree is derived
+        from that of the current shape when the latter ends with a
+        :math:`\\texttt{shift}` or :math:`\\texttt{degen}` rule, and
+        reconstructed with :func:`opetopy.UnnamedOpetope.ProofTree` in the
+        remaining cases.
+        """
+        if self._targetShape is None:
+            if self.source.dimension == 0:
+                raise DerivationError(
+                    "Shape, target",
+                    "The target of the point is not an opetope")
+            res = _shapesById.get(self.targetId)
+            if res is None:
+                if isinstance(self.proof, Shift):
+                    res = shape(self.proof.proofTree)
+                elif isinstance(self.proof, Degen):
+                    res = shape(Shift(self.proof.proofTree))
+                else:
+                    res = shape(ProofTree(self.target.toDict()))
+            self._targetShape = res
+        return self._targetShape
+
+
+class FacePoset:
+    """
+    The poset of faces of an opetope, i.e. the cells of the representable
+    opetopic set it generates. Faces are numbered, the opetope itself being
+    face ``0``, and for every face are stored its shape, its sources (by
+    address), its degeneracy and its target (as face numbers), and the path
+    of source (``"s"`` followed by the address), degeneracy (``"d"``) and
+    target (``"t"``) steps leading to it from face ``0``.
+
+    The face poset of a shape is computed once, by
+    :meth:`opetopy.UnnamedOpetope.Shape.faces`, from the face posets of its
+    sources and target, and is then shared. On top of the face lists, it
+    indexes the faces by dimension and the iterated targets of every face, so
+    that the queries below are constant time (except for
+    :meth:`opetopy.UnnamedOpetope.FacePoset.faces`, which is computed once
+    per face, and then cached).
+    """
+
+    degeneracy: List[Optional[int]]
+    paths: List[Tuple[str, ...]]
+    shapes: List['Shape']
+    sources: List[Dict[Address, int]]
+    target: List[Optional[int]]
+    _byDimension: Dict[int, List[int]]
+    _downsets: Dict[int, FrozenSet[int]]
+    _targets: List[List[int]]
+
+    def __init__(self) -> None:
+        """
+        Inits an empty face poset. This method should not be called directly,
+        use :meth:`opetopy.UnnamedOpetope.Shape.faces` instead.
+        """
+        self.degeneracy = []
+        self.paths = []
+        self.shapes = []
+        self.sources = []
+        self.target = []
+        self._byDimension = {}
+        self._downsets = {}
+        self._targets = []
+
+    def __len__(self) -> int:
+        return len(self.shapes)
+
+    def _index(self) -> None:
+        """
+        Computes the index of faces by dimension, and the iterated targets of
+        every face. A target has a lower dimension than its face, so faces are
+        processed by increasing dimension.
+        """
+        self._targets = [[] for _ in range(len(self))]
+        for i in sorted(range(len(self)), key=self.dimension):
+            self._byDimension.setdefault(self.dimension(i), []).append(i)
+            t = self.target[i]
+            self._targets[i] = [i] + ([] if t is None else self._targets[t])
+
+    def codimension(self, k: int, face: int = 0) -> List[int]:
+        """
+        Returns the list of the faces of codimension ``k`` of the face numbered
+        ``face`` (the whole opetope by default).
+        """
+        dim = self.dimension(face) - k
+        if face == 0:
+            return list(self._byDimension.get(dim, []))
+        return sorted(i for i in self.faces(face) if self.dimension(i) == dim)
+
+    def dimension(self, face: int = 0) -> int:
+        """
+        Returns the dimension of the face numbered ``face``.
+        """
+        return self.shapes[face].source.dimension
+
+    def faces(self, face: int = 0) -> FrozenSet[int]:
+        """
+        Returns the set of all the faces of the face numbered ``face``,
+        including itself.
+        """
+        res = self._downsets.get(face)
+        if res is None:
+            res = frozenset({face})
+            for i in self.immediateFaces(face):
+                res |= self.faces(i)
+            self._downsets[face] = res
+        return res
+
+    def immediateFaces(self, face: int = 0) -> List[int]:
+        """
+        Returns the list of faces of codimension 1 of the face numbered
+        ``face``: its sources, by address (or its degeneracy), and its target.
+        """
+        res = [self.sources[face][a] for a in sorted(self.sources[face])]
+        for i in [self.degeneracy[face], self.target[face]]:
+            if i is not None:
+                res.append(i)
+        return res
+
+    def isFace(self, i: int, j: int) -> bool:
+        """
+        Tells wether the face numbered ``i`` is a face of the face numbered
+        ``j``, i.e. wether :math:`i \\leq j` in the face poset.
+        """
+        return i in self.faces(j)
+
+    def source(self, addr: Address, face: int = 0) -> int:
+        """
+        Returns the source at address ``addr`` of the face numbered ``face``.
+        """
+        if addr not in self.sources[face]:
+            raise DerivationError(
+                "Face poset, source",
+                "Face {face} has no source at address {addr}",
+                face=face,
+                addr=str(addr))
+        return self.sources[face][addr]
+
+    def targetAt(self, k: int = 1, face: int = 0) -> int:
+        """
+        Returns the :math:`k`-target of the face numbered ``face``, i.e. its
+        target taken ``k`` times. By convention, the :math:`0`-target of a
+        face is the face itself.
+        """
+        targets = self._targets[face]
+        if k < 0 or k >= len(targets):
+            raise DerivationError(
+                "Face poset, target",
+                "Face {face} has dimension {dim}, so the index should be "
+                "between 0 and {dim} included (is {k})",
+                face=face,
+                dim=self.dimension(face),
+                k=k)
+        return targets[k]
+
+
+def _facePoset(omega: Shape) -> FacePoset:
+    """
+    Computes the face poset of shape ``omega``. Use
+    :meth:`opetopy.UnnamedOpetope.Shape.faces` instead, which caches it.
+
+    The faces of the sources and target of ``omega`` (or of its degeneracy
+    and target, if it is degenerate) are taken as a disjoint union, and then
+    identified according to the opetopic identities: for :math:`[p[q]]` an
+    edge of ``omega``,
+
+    * :math:`\\mathsf{s}_{[q]} \\mathsf{s}_{[p]} = \\mathsf{t}
+      \\mathsf{s}_{[p[q]]}` if :math:`[p[q]]` is a node address,
+    * :math:`\\mathsf{s}_{[q]} \\mathsf{s}_{[p]} = \\mathsf{s}_{[r]}
+      \\mathsf{t}` otherwise, where :math:`[r]` is the image of the leaf
+      :math:`[p[q]]` by the context of ``omega``,
+
+    and :math:`\\mathsf{t} \\mathsf{s}_{[]} = \\mathsf{t} \\mathsf{t}`. If
+    ``omega`` is degenerate, the source and the target of its target are both
+    identified with its degeneracy. Identifying two faces identifies their
+    own faces, so that the union-find structure propagates identifications
+    downwards.
+    """
+    res = FacePoset()
+    if omega.source.dimension == 0:
+        res.degeneracy.append(None)
+        res.paths.append(())
+        res.shapes.append(omega)
+        res.sources.append({})
+        res.target.append(None)
+        res._index()
+        return res
+    # Faces of codimension 1, as (step, shape) tuples, and their face
+    # posets, as (step, face poset, offset) tuples
+    steps = []  # type: List[Tuple[str, Shape]]
+    if omega.source.isDegenerate:
+        steps.append(("d", omega.degeneracyShape()))
+    else:
+        steps += [("s" + str(a), omega.sourceShape(a))
+                  for a in sorted(omega.sourceIds.keys())]
+    steps.append(("t", omega.targetShape()))
+    embedded = []  # type: List[Tuple[str, FacePoset, int]]
+    # Maps a face of the disjoint union to its (embedding, face) indices
+    owner = [(-1, 0)]  # type: List[Tuple[int, int]]
+    for step, psi in steps:
+        faces = psi.faces()
+        embedded.append((step, faces, len(owner)))
+        owner += [(len(embedded) - 1, j) for j in range(len(faces))]
+    parent = list(range(len(owner)))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def facesOf(x: int) -> List[Optional[int]]:
+        i, j = owner[x]
+        faces, offset = embedded[i][1], embedded[i][2]
+        res = [faces.sources[j][a] for a in sorted(faces.sources[j].keys())
+               ]  # type: List[Optional[int]]
+        res += [faces.degeneracy[j], faces.target[j]]
+        return [None if y is None else offset + y for y in res]
+
+    def union(x: int, y: int) -> None:
+        todo = [(x, y)]
+        while len(todo) > 0:
+            u, v = todo.pop()
+            u, v = find(u), find(v)
+            if u != v:
+                parent[max(u, v)] = min(u, v)
+                for fu, fv in zip(facesOf(u), facesOf(v)):
+                    if fu is not None and fv is not None:
+                        todo.append((fu, fv))
+
+    def top(i: int) -> int:
+        return embedded[i][2]
+
+    def source(i: int, addr: Address) -> int:
+        return embedded[i][2] + embedded[i][1].sources[0][addr]
+
+    def target(i: int) -> int:
+        t = embedded[i][1].target[0]
+        if t is None:
+            raise RuntimeError("[Face structure] Face has no target. In "
+                               "valid derivations, this should not happen")
+        return embedded[i][2] + t
+
+    tgt = len(steps) - 1
+    if omega.source.isDegenerate:
+        for a in embedded[tgt][1].sources[0].keys():
+            union(source(tgt, a), top(0))
+        union(target(tgt), top(0))
+    elif omega.source.dimension >= 2:
+        nodes = sorted(omega.sourceIds.keys())
+        index = {a: i for i, a in enumerate(nodes)}
+        for p in nodes:
+            for q in omega.source.nodes[p].nodes.keys():
+                if p + q in index:
+                    union(source(index[p], q), target(index[p + q]))
+                else:
+                    union(source(index[p], q),
+                          source(tgt, omega.sequent.context(p + q)))
+        union(target(index[Address.epsilon(omega.source.dimension - 1)]),
+              target(tgt))
+    # Numbering the classes, in order of first occurrence, which is also the
+    # root of the class in the union-find structure
+    number = {}  # type: Dict[int, int]
+    for x in range(1, len(owner)):
+        if find(x) == x:
+            number[x] = len(number) + 1
+
+    def renumber(y: Optional[int], offset: int) -> Optional[int]:
+        return None if y is None else number[find(offset + y)]
+
+    res.paths.append(())
+    res.shapes.append(omega)
+    if omega.source.isDegenerate:
+        res.degeneracy.append(number[find(top(0))])
+        res.sources.append({})
+    else:
+        res.degeneracy.append(None)
+        res.sources.append({
+            a: number[find(top(i))]
+            for i, a in enumerate(sorted(omega.sourceIds.keys()))
+        })
+    res.target.append(number[find(top(tgt))])
+    for x in number.keys():
+        i, j = owner[x]
+        step, faces, offset = embedded[i]
+        res.paths.append((step, ) + faces.paths[j])
+        res.shapes.append(faces.shapes[j])
+        res.sources.append({
+            a: number[find(offset + y)]
+            for a, y in faces.sources[j].items()
+        })
+        res.degeneracy.append(renumber(faces.degeneracy[j], offset))
+        res.target.append(renumber(faces.target[j], offset))
+    res._index()
+    return res
+
+
+_preopetopeIds = {}  # type: Dict[Tuple, int]
+_shapesById = {}  # type: Dict[int, Shape]
+_shapesByProof = WeakKeyDictionary(
+)  # type: WeakKeyDictionary[RuleInstance, Shape]
+_shapesByRule = {}  # type: Dict[Tuple, Shape]
+
+
+def _preopetopeKey(p: Preopetope) -> Tuple:
+    """
+    Returns a hashable representation of a preopetope, such that two
+    preopetopes are equal if and only if their representations are.
+    """
+    if p.isDegenerate:
+        if p.degeneracy is None:
+            raise RuntimeError("[Preopetope key] Preopetope marked degenerate "
+                               "but the underlying preopetope is undefined. "
+                               "In valid proof trees, this should not happen")
+        return (p.dimension, None, _preopetopeKey(p.degeneracy))
+    return (p.dimension,
+            tuple(
+                sorted((str(a), _preopetopeKey(q))
+                       for a, q in p.nodes.items())))
+
+
+def _preopetopeId(p: Preopetope) -> int:
+    """
+    Returns the identifier of a preopetope, registering it if needed.
+    """
+    return _preopetopeIds.setdefault(_preopetopeKey(p), len(_preopetopeIds))
+
+
+def _ruleKey(p: RuleInstance) -> Optional[Tuple]:
+    """
+    Returns a hashable representation of the last rule of proof tree ``p``,
+    made of the name of the rule, the ids of the shapes of its premises and its
+    address, if any. It determines the opetope derived by ``p``, and its size
+    does not depend on that of ``p``. Returns ``None`` if ``p`` is not an
+    instance of a rule of :math:`\\textbf{Opt${}^?$}`.
+    """
+    if isinstance(p, Point):
+        return ("point", )
+    elif isinstance(p, Degen):
+        return ("degen", shape(p.proofTree).id)
+    elif isinstance(p, Shift):
+        return ("shift", shape(p.proofTree).id)
+    elif isinstance(p, Graft):
+        return ("graft", shape(p.proofTree1).id, shape(p.proofTree2).id,
+                p.addr)
+    return None
+
+
+def shape(p: RuleInstance) -> Shape:
+    """
+    Returns the registered :class:`opetopy.UnnamedOpetope.Shape` of the
+    opetope derived by proof tree ``p``. The shape is cached on the proof tree
+    object, and otherwise looked up from the last rule of ``p`` and the shapes
+    of its premises (see :func:`opetopy.UnnamedOpetope._ruleKey`), so that the
+    proof tree is only evaluated the first time that rule is applied to those
+    shapes. If another proof tree of the same opetope has already been
+    registered, the existing shape, carrying that other proof tree, is
+    returned.
+    """
+    res = _shapesByProof.get(p)
+    if res is None:
+        key = _ruleKey(p)
+        res = _shapesByRule.get(key) if key is not None else None
+        if res is None:
+            seq = p.eval()
+            sid = _preopetopeId(seq.source)
+            res = _shapesById.get(sid)
+            if res is None:
+                res = Shape(sid, p, seq)
+                _shapesById[sid] = res
+            if key is not None:
+                _shapesByRule[key] = res
+        _shapesByProof[p] = res
+    return res
+
+
+def shapeOf(p: Union[Preopetope, Sequent, RuleInstance, Shape]) -> Shape:
+    """
+    Returns the registered :class:`opetopy.UnnamedOpetope.Shape` of an
+    opetope, given as a preopetope, as a sequent deriving it, as a proof tree,
+    or as a shape (which is returned as is). If the opetope has not been
+    registered yet, its proof tree is reconstructed with
+    :func:`opetopy.UnnamedOpetope.ProofTree`.
+    """
+    if isinstance(p, Shape):
+        return p
+    elif isinstance(p, RuleInstance):
+        return shape(p)
+    elif isinstance(p, Sequent):
+        p = p.source
+    res = _shapesById.get(_preopetopeId(p))
+    if res is None:
+        res = shape(ProofTree(p.toDict()))
+    return res
+
+
+def faces(p: Union[Preopetope, Sequent, RuleInstance]) -> FacePoset:
+    """
+    Returns the face poset (:class:`opetopy.UnnamedOpetope.FacePoset`) of an
+    opetope, given as a preopetope, as a sequent deriving it, or as a proof
+    tree. The face poset is memoised per registered shape, so that it is
+    only computed once for every opetope, regardless of how it is given.
+    """
+    return shapeOf(p).faces()
+
+
+POINT = shape(Point())
+"""
+Registered shape of the point. Registered first, so its id is ``0``.
+"""
+
+ARROW = shape(Arrow())
+"""
+Registered shape of the arrow.
+"""
+
+OPETOPIC_INTEGERS = [shape(OpetopicInteger(n)) for n in range(8)]
+"""
+Registered shapes of the opetopic integers :math:`\\mathbf{0}` to
+:math:`\\mathbf{7}`. Larger ones can be obtained with
+``shape(OpetopicInteger(n))``.
+"""
+
+DEGEN_POINT = OPETOPIC_INTEGERS[0]
+"""
+Registered shape of the degenerate opetope at the point, which is the
+opetopic integer :math:`\\mathbf{0}`.
+"""
+
+DEGEN_ARROW = shape(Degen(Arrow()))
+"""
+Registered shape of the degenerate opetope at the arrow.
+"""
@@ -8,8 +8,10 @@
 
 """
 
-from copy import deepcopy
-from typing import Dict, List, Optional, Set
+import time
+import warnings
+from typing import (AbstractSet, Dict, Iterable, List, Optional, Set, Tuple,
+                    Union)
 
 from opetopy.common import *
 from opetopy import UnnamedOpetope
@@ -20,6 +22,13 @@ class Type(UnnamedOpetopicSet.Type):
     """
     Similar to :class:`opetopy.UnnamedOpetopicSet.Type` except information
     about the universality of faces is also stored.
+
+    .. deprecated::
+        The rules of this module no longer produce such types: universality is
+        recorded in the universality index of sequents (see
+        :class:`opetopy.UnnamedOpetopicSet.Sequent`), and queried with
+        :func:`opetopy.UnnamedOpetopicCategory.isTargetUniversal` and
+        :func:`opetopy.UnnamedOpetopicCategory.isSourceUniversal`.
     """
 
     sourceUniversal: Set[UnnamedOpetope.Address]
@@ -31,6 +40,11 @@ class Type(UnnamedOpetopicSet.Type):
         Inits the type as in :class:`opetopy.UnnamedOpetopicSet.Type.__init__`,
         and sets all faces (sources and target) as non universal.
         """
+        warnings.warn(
+            "UnnamedOpetopicCategory.Type is deprecated, universality is "
+            "recorded in the universality index of sequents",
+            DeprecationWarning,
+            stacklevel=2)
         super().__init__(source, target)
         self.sourceUniversal = set()
         self.targetUniversal = False
@@ -39,33 +53,8 @@ class Type(UnnamedOpetopicSet.Type):
         return str(self)
 
     def __str__(self) -> str:
-        srcstr = str()
-        if self.source.degeneracy is None:
-            if self.source.nodes is None:
-                raise RuntimeError("[Pasting diagram, to string] Both the "
-                                   "degeneracy and node dict of the pasting "
-                                   "diagram are None. In valid derivations, "
-                                   "this should not happen")
-            if self.source.shape == UnnamedOpetope.point().source:
-                srcstr = "⧫"
-            else:
-                lines = []  # type: List[str]
-                for addr in self.source.nodes.keys():
-                    if self.isSourceUniversal(addr):
-                        lines += [
-                            str(addr) + " ← ∀" + str(self.source.nodes[addr])
-                        ]
-                    else:
-                        lines += [
-                            str(addr) + " ← " + str(self.source.nodes[addr])
-                        ]
-                srcstr = "{" + ", ".join(lines) + "}"
-        else:
-            srcstr = "{{" + str(self.source.degeneracy) + "}}"
-        if self.isTargetUniversal():
-            return srcstr + " → ∀" + str(self.target)
-        else:
-            return srcstr + " → " + str(self.target)
+        return self.toStr(frozenset(self.sourceUniversal),
+                          self.targetUniversal)
 
     def isSourceUniversal(self, addr: UnnamedOpetope.Address) -> bool:
         """
@@ -80,31 +69,117 @@ class Type(UnnamedOpetopicSet.Type):
         return self.targetUniversal
 
 
-def isTargetUniversal(t: UnnamedOpetopicSet.Type) -> bool:
+def isTargetUniversal(seq: Union[UnnamedOpetopicSet.Sequent,
+                                 UnnamedOpetopicSet.Type],
+                      name: Optional[str] = None) -> bool:
     """
-    This convenient function allows to know if an instance of
-    :class:`opetopy.UnnamedOpetopicSet.Type` is target universal, regardless of
-    wether or not it is an actual instance of
-    :class:`opetopy.UnnamedOpetopicCategory.Type`.
+    Tells wether the cell whose name is ``name`` is target universal in
+    sequent ``seq``.
+
+    .. deprecated::
+        If ``seq`` is a :class:`opetopy.UnnamedOpetopicSet.Type` (and ``name``
+        is omitted), tells wether it is an instance of
+        :class:`opetopy.UnnamedOpetopicCategory.Type` that is target
+        universal, as in former versions.
     """
-    if isinstance(t, Type):
-        return t.isTargetUniversal()
-    else:
-        return False
+    if isinstance(seq, UnnamedOpetopicSet.Type):
+        warnings.warn(
+            "isTargetUniversal(type) is deprecated, use "
+            "isTargetUniversal(seq, name) instead",
+            DeprecationWarning,
+            stacklevel=2)
+        return isinstance(seq, Type) and seq.isTargetUniversal()
+    return name in seq.targetUniversal
+
+
+def isSourceUniversal(seq: Union[UnnamedOpetopicSet.Sequent,
+                                 UnnamedOpetopicSet.Type],
+                      name: Union[str, UnnamedOpetope.Address],
+                      addr: Optional[UnnamedOpetope.Address] = None) -> bool:
+    """
+    Tells wether the cell whose name is ``name`` is source universal at
+    source address ``addr`` in sequent ``seq``.
+
+    .. deprecated::
+        If ``seq`` is a :class:`opetopy.UnnamedOpetopicSet.Type`, the second
+        argument is the address, and tells wether ``seq`` is an instance of
+        :class:`opetopy.UnnamedOpetopicCategory.Type` that is source universal
+        at that address, as in former versions.
+    """
+    if isinstance(seq, UnnamedOpetopicSet.Type):
+        warnings.warn(
+            "isSourceUniversal(type, addr) is deprecated, use "
+            "isSourceUniversal(seq, name, addr) instead",
+            DeprecationWarning,
+            stacklevel=2)
+        return isinstance(seq, Type) and \
+            isinstance(name, UnnamedOpetope.Address) and \
+            seq.isSourceUniversal(name)
+    elif not isinstance(name, str):
+        raise TypeError("Expected the name of a cell, got {name}".format(
+            name=repr(name)))
+    return addr in seq.sourceUniversal.get(name, frozenset())
+
+
+def _registerFillers(seq: UnnamedOpetopicSet.Sequent,
+                     names: Iterable[str]) -> None:
+    """
+    Registers the target universal cells whose names are in ``names`` in the
+    filler cache of ``seq`` (see
+    :class:`opetopy.UnnamedOpetopicSet.Sequent`), unless a filler of the same
+    pasting diagram is already known. The cache is persistent, and is
+    replaced by an updated version that shares most of its structure.
+    """
+    fillers = seq.fillers
+    for name in names:
+        key = seq.context[name].type.source.key()
+        if key not in fillers:
+            fillers = fillers.set(key, name)
+    seq.fillers = fillers
 
 
-def isSourceUniversal(t: UnnamedOpetopicSet.Type,
-                      addr: UnnamedOpetope.Address) -> bool:
+def filler(seq: UnnamedOpetopicSet.Sequent,
+           P: UnnamedOpetopicSet.PastingDiagram) -> Optional[str]:
     """
-    This convenient function allows to know if an instance of
-    :class:`opetopy.UnnamedOpetopicSet.Type` is source universal at a given
-    address, regardless of wether or not it is an actual instance of
-    :class:`opetopy.UnnamedOpetopicCategory.Type`.
+    Returns the name of a target universal cell of sequent ``seq`` whose
+    source pasting diagram is ``P``, or ``None`` if there are none. The
+    filler cache of ``seq`` is looked up first, and the cells of source
+    ``P`` are searched otherwise.
     """
-    if isinstance(t, Type):
-        return t.isSourceUniversal(addr)
-    else:
-        return False
+    key = P.key()
+    res = seq.fillers.get(key)
+    if res is None:
+        names = [
+            name for name in seq.context.cellsWithSourceKey(key)
+            if name in seq.targetUniversal
+        ]
+        if len(names) > 0:
+            res = min(names)
+    return res
+
+
+def _markUniversal(seq: UnnamedOpetopicSet.Sequent,
+                   name: str,
+                   target: bool = False,
+                   sources: Iterable[UnnamedOpetope.Address] = ()) \
+        -> UnnamedOpetopicSet.Sequent:
+    """
+    Returns a copy of sequent ``seq`` in which the cell whose name is
+    ``name`` is marked target universal if ``target`` is set, and source
+    universal at all addresses in ``sources``. The context is shared, and
+    the universality index is persistent, so only the path to ``name`` in it
+    is copied.
+    """
+    res = seq.copy()
+    if target:
+        res.targetUniversal = seq.targetUniversal.insert(name)
+        _registerFillers(res, [name])
+    sources = frozenset(sources)
+    if len(sources) > 0:
+        res.sourceUniversal = seq.sourceUniversal.set(
+            name,
+            seq.sourceUniversal.get(name, frozenset()) | sources)
+    return res
 
 
 def tfill(seq: UnnamedOpetopicSet.Sequent, targetName: str,
@@ -127,10 +202,9 @@ def tfill(seq: UnnamedOpetopicSet.Sequent, targetName: str,
 
     # Source of alpha
     P = seq.pastingDiagram
-    tPshapeProof = UnnamedOpetope.ProofTree(P.shapeTarget().toDict())
 
     # Start deriving
-    res = deepcopy(seq)
+    res = seq.copy()
     res.pastingDiagram = None
 
     # Derive t
@@ -145,6 +219,7 @@ def tfill(seq: UnnamedOpetopicSet.Sequent, targetName: str,
             u = seq.context.target(
                 P.source(UnnamedOpetope.address([], P.shape.dimension - 1)))
         # Derive Q, source of t
+        tPshapeProof = P.sharedShape.targetShape().proof
         if P.shapeTarget().isDegenerate:
             Q = UnnamedOpetopicSet.pastingDiagram(tPshapeProof,
                                                   seq.context.target(u))
@@ -154,10 +229,9 @@ def tfill(seq: UnnamedOpetopicSet.Sequent, targetName: str,
                 nodes[UnnamedOpetope.address([], P.shape.dimension - 2)] = \
                     P.degeneracyVariable()
             else:
-                readdress = P.shapeProof.eval().context
-                for l in P.shape.leafAddresses():
-                    p, q = l.edgeDecomposition()
-                    nodes[readdress(l)] = seq.context.source(P[p], q)
+                readdress = P.shapeSequent.context
+                for l, y in P.leafSources(seq.context).items():
+                    nodes[readdress(l)] = y
             Q = UnnamedOpetopicSet.pastingDiagram(tPshapeProof, nodes)
         if Q.shape.isDegenerate:
             res = UnnamedOpetopicSet.degen(res, Q.degeneracyVariable())
@@ -176,13 +250,29 @@ def tfill(seq: UnnamedOpetopicSet.Sequent, targetName: str,
     res = UnnamedOpetopicSet.shift(res, targetName, fillerName)
 
     # Mark t as universal in the type of alpha
-    rawFillerType = res.context[fillerName].type
-    fillerType = Type(rawFillerType.source, rawFillerType.target)
-    fillerType.targetUniversal = True
-    res.context[fillerName].type = fillerType
+    return _markUniversal(res, fillerName, target=True)
 
-    # Done
-    return res
+
+def composite(seq: UnnamedOpetopicSet.Sequent, targetName: str,
+              fillerName: str) -> Tuple[UnnamedOpetopicSet.Sequent, str, str]:
+    """
+    Returns a sequent in which the pasting diagram typed by ``seq`` has a
+    target universal filler, along with the names of the filler's target and
+    of the filler. If such a filler is already known (see
+    :func:`opetopy.UnnamedOpetopicCategory.filler`), the context is left
+    unchanged. Otherwise, :func:`opetopy.UnnamedOpetopicCategory.tfill` is
+    applied, with names ``targetName`` and ``fillerName``.
+    """
+    if seq.pastingDiagram is None:
+        raise DerivationError(
+            "Kan filling, target",
+            "Argument sequent expecting to type a pasting diagram")
+    alpha = filler(seq, seq.pastingDiagram)
+    if alpha is None:
+        return tfill(seq, targetName, fillerName), targetName, fillerName
+    res = seq.copy()
+    res.pastingDiagram = None
+    return res, seq.context.target(alpha), alpha
 
 
 def tuniv(seq: UnnamedOpetopicSet.Sequent, tuCell: str, cell: str,
@@ -204,10 +294,10 @@ def tuniv(seq: UnnamedOpetopicSet.Sequent, tuCell: str, cell: str,
     if seq.pastingDiagram is not None:
         raise DerivationError("Apply target univ. prop.",
                               "Sequent cannot type a pasting diagram")
-    elif not isTargetUniversal(typealpha):
+    elif not isTargetUniversal(seq, tuCell):
         raise DerivationError("Apply target univ. prop.",
                               "First cell is expected to be target universal")
-    elif typebeta.source != P:
+    elif typebeta.source.key() != P.key():
         raise DerivationError(
             "Apply target univ. prop.",
             "Cells are expected to have the same source pasting diagram")
@@ -219,7 +309,7 @@ def tuniv(seq: UnnamedOpetopicSet.Sequent, tuCell: str, cell: str,
     # Derive the factorization cell
     n = targetalpha.shape.dimension
     res = UnnamedOpetopicSet.graft(
-        deepcopy(seq),
+        seq,
         UnnamedOpetopicSet.pastingDiagram(
             UnnamedOpetope.Shift(targetalpha.shapeProof),
             {UnnamedOpetope.address([], n): targetalpha.name}))
@@ -239,14 +329,22 @@ def tuniv(seq: UnnamedOpetopicSet.Sequent, tuCell: str, cell: str,
     res = UnnamedOpetopicSet.shift(res, cell, fillerName)
 
     # Mark the filler as target universal and source universal at the facto.
-    rawFillerType = res.context[fillerName].type
-    fillerType = Type(rawFillerType.source, rawFillerType.target)
-    fillerType.targetUniversal = True
-    fillerType.sourceUniversal.add(UnnamedOpetope.address([], n + 1))
-    res.context[fillerName].type = fillerType
+    return _markUniversal(res,
+                          fillerName,
+                          target=True,
+                          sources=[UnnamedOpetope.address([], n + 1)])
 
-    # Done
-    return res
+
+def tunivCandidates(seq: UnnamedOpetopicSet.Sequent,
+                    tuCell: str) -> List[str]:
+    """
+    Returns the sorted list of the names of the cells over which the target
+    universal property of cell ``tuCell`` can be applied (see
+    :func:`opetopy.UnnamedOpetopicCategory.tuniv`), i.e. the other cells
+    having the same source pasting diagram.
+    """
+    P = seq.context[tuCell].type.source
+    return sorted(seq.context.cellsWithSource(P) - {tuCell})
 
 
 def suniv(seq: UnnamedOpetopicSet.Sequent, suCellName: str, cellName: str,
@@ -348,14 +446,36 @@ def suniv(seq: UnnamedOpetopicSet.Sequent, suCellName: str, cellName: str,
     res = UnnamedOpetopicSet.shift(res, cellName, fillerName)
 
     # Mark A as source universal at xi and target universal
-    rawFillerType = res.context[fillerName].type
-    fillerType = Type(rawFillerType.source, rawFillerType.target)
-    fillerType.targetUniversal = True
-    fillerType.sourceUniversal.add(addr.shift())
-    res.context[fillerName].type = fillerType
+    return _markUniversal(res,
+                          fillerName,
+                          target=True,
+                          sources=[addr.shift()])
 
-    # Done
-    return res
+
+def sunivCandidates(seq: UnnamedOpetopicSet.Sequent, suCell: str,
+                    addr: UnnamedOpetope.Address) -> List[str]:
+    """
+    Returns the sorted list of the names of the cells over which the source
+    universal property of cell ``suCell`` at address ``addr`` can be applied
+    (see :func:`opetopy.UnnamedOpetopicCategory.suniv`), i.e. the other cells
+    having the same target, and a source pasting diagram of the same shape
+    that agrees with that of ``suCell`` except maybe at ``addr``.
+    """
+    P = seq.context[suCell].type.source
+    u = seq.context[suCell].type.target
+    if u is None or P.nodes is None or addr not in P.nodes.keys():
+        return []
+    shapeId, names = P.key()
+    i = sorted(P.nodes.keys()).index(addr)
+    res = []  # type: List[str]
+    for cell, a in seq.context.cofaces(u.name):
+        if a is not None or cell == suCell:
+            continue
+        cellShapeId, cellNames = seq.context[cell].type.source.key()
+        if cellShapeId == shapeId and \
+                cellNames[:i] + cellNames[i + 1:] == names[:i] + names[i + 1:]:
+            res.append(cell)
+    return sorted(res)
 
 
 def tclose(seq: UnnamedOpetopicSet.Sequent,
@@ -382,12 +502,7 @@ def tclose(seq: UnnamedOpetopicSet.Sequent,
 
     # If P is degenerate, make u target universal
     if P.shape.isDegenerate:
-        res = deepcopy(seq)
-        rawTargetType = res.context[u.name].type
-        targetType = Type(rawTargetType.source, rawTargetType.target)
-        targetType.targetUniversal = True
-        res.context[u.name].type = targetType
-        return res
+        return _markUniversal(seq, u.name, target=True)
 
     # Get non target universal source address (if any)
     if P.nodes is None:
@@ -398,7 +513,7 @@ def tclose(seq: UnnamedOpetopicSet.Sequent,
     else:
         nonTuSource = None  # type: Optional[UnnamedOpetope.Address]
         for addr in P.nodes.keys():
-            if not isTargetUniversal(seq.context[P.source(addr)].type):
+            if not isTargetUniversal(seq, P.source(addr)):
                 if nonTuSource is None:
                     nonTuSource = addr
                 else:
@@ -408,19 +523,14 @@ def tclose(seq: UnnamedOpetopicSet.Sequent,
                         "universal sources: {addr1} and {addr2}".format(
                             addr1=nonTuSource, addr2=addr))
 
-    if isTargetUniversal(seq.context[u.name].type):
+    if isTargetUniversal(seq, u.name):
         if nonTuSource is None:
             raise DerivationError(
                 "Apply target univ. closure",
                 "All faces of source pasting diagram are already target "
                 "universal. You can just remove this rule instance")
         # Make source at nonTuSource target universal
-        res = deepcopy(seq)
-        rawSourceType = res.context[P.source(nonTuSource)].type
-        sourceType = Type(rawSourceType.source, rawSourceType.target)
-        sourceType.targetUniversal = True
-        res.context[P.source(nonTuSource)].type = sourceType
-        return res
+        return _markUniversal(seq, P.source(nonTuSource), target=True)
     else:
         if nonTuSource is not None:
             raise DerivationError(
@@ -428,12 +538,67 @@ def tclose(seq: UnnamedOpetopicSet.Sequent,
                 "Source pasting diagram has at least two non target universal "
                 "faces: target and {addr}".format(addr=nonTuSource))
         # Make u target universal
-        res = deepcopy(seq)
-        rawTargetType = res.context[u.name].type
-        targetType = Type(rawTargetType.source, rawTargetType.target)
-        targetType.targetUniversal = True
-        res.context[u.name].type = targetType
-        return res
+        return _markUniversal(seq, u.name, target=True)
+
+
+def _tcloseFace(seq: UnnamedOpetopicSet.Sequent,
+                targetUniversal: AbstractSet[str],
+                tuCell: str) -> Optional[str]:
+    """
+    Returns the name of the face that the :math:`\\texttt{tclose}` rule would
+    turn target universal when applied on cell ``tuCell``, where
+    ``targetUniversal`` is the set of the names of target universal cells, or
+    ``None`` if the rule does not apply.
+    """
+    P = seq.context[tuCell].type.source
+    u = seq.context[tuCell].type.target
+    if u is None:
+        return None
+    elif P.nodes is None:
+        return None if u.name in targetUniversal else u.name
+    nonTu = [y for y in P.nodes.values() if y not in targetUniversal]
+    if u.name not in targetUniversal:
+        nonTu.append(u.name)
+    return nonTu[0] if len(nonTu) == 1 else None
+
+
+def tclosure(seq: UnnamedOpetopicSet.Sequent) \
+        -> Tuple[UnnamedOpetopicSet.Sequent, List[str]]:
+    """
+    Applies the :math:`\\texttt{tclose}` rule (see
+    :func:`opetopy.UnnamedOpetopicCategory.tclose`) until no more cell can be
+    made target universal. Returns the saturated sequent, along with the list
+    of the names of the target universal cells the rule was applied on, in
+    order (see :func:`opetopy.UnnamedOpetopicCategory.tclosureProof`).
+
+    The rule is first tried on every target universal cell. When a cell
+    becomes target universal, only that cell and its cofaces (see
+    :meth:`opetopy.UnnamedOpetopicSet.Context.cofaces`) are tried again.
+    """
+    if seq.pastingDiagram is not None:
+        raise DerivationError(
+            "Apply target univ. closure",
+            "Sequent expected to not type a pasting diagram")
+    targetUniversal = seq.targetUniversal
+    applications = []  # type: List[str]
+    faces = []  # type: List[str]
+    worklist = sorted(targetUniversal)
+    while len(worklist) > 0:
+        tuCell = worklist.pop()
+        if tuCell not in targetUniversal:
+            continue
+        face = _tcloseFace(seq, targetUniversal, tuCell)
+        if face is None:
+            continue
+        targetUniversal = targetUniversal.insert(face)
+        applications.append(tuCell)
+        faces.append(face)
+        worklist.append(face)
+        worklist += [c for c, _ in seq.context.cofaces(face)]
+    res = seq.copy()
+    res.targetUniversal = targetUniversal
+    _registerFillers(res, faces)
+    return res, applications
 
 
 class TFill(UnnamedOpetopicSet.RuleInstance):
@@ -599,3 +764,138 @@ class TClose(UnnamedOpetopicSet.RuleInstance):
 
     def eval(self) -> UnnamedOpetopicSet.Sequent:
         return tclose(self.proofTree.eval(), self.tuCellName)
+
+
+def tclosureProof(p: UnnamedOpetopicSet.RuleInstance) \
+        -> UnnamedOpetopicSet.RuleInstance:
+    """
+    Extends the proof tree ``p`` with the instances of the
+    :math:`\\texttt{tclose}` rule computed by
+    :func:`opetopy.UnnamedOpetopicCategory.tclosure`.
+    """
+    _, applications = tclosure(p.eval())
+    for tuCell in applications:
+        p = TClose(p, tuCell)
+    return p
+
+
+def complete(p: UnnamedOpetopicSet.RuleInstance,
+             dim: int,
+             maxNodes: int = 2,
+             maxRounds: Optional[int] = 1,
+             maxCells: Optional[int] = None,
+             timeout: Optional[float] = None,
+             prefix: str = "c") \
+        -> Tuple[UnnamedOpetopicSet.RuleInstance, UnnamedOpetopicSet.Sequent]:
+    """
+    Freely completes the finite opetopic set typed by the conclusion of proof
+    tree ``p`` into an opetopic category, up to dimension ``dim``, and returns
+    the proof tree extended by the derivation, along with its conclusion. For
+    :math:`n = 1, \\ldots,` ``dim``, in that order,
+
+    1. every pasting diagram of :math:`(n-1)`-cells that is degenerate, or
+       non degenerate with between 2 and ``maxNodes`` nodes (see
+       :func:`opetopy.UnnamedOpetopicSet.pastingDiagrams`), is filled by
+       :func:`opetopy.UnnamedOpetopicCategory.tfill`, unless it already has
+       a target universal filler (see
+       :func:`opetopy.UnnamedOpetopicCategory.filler`). As new
+       :math:`(n-1)`-cells are created, this is repeated until no new pasting
+       diagram appears, or at most ``maxRounds`` times if it is not
+       ``None``;
+    2. if :math:`n <` ``dim``, the target universal property of every target
+       universal :math:`n`-cell is applied over every candidate cell (see
+       :func:`opetopy.UnnamedOpetopicCategory.tunivCandidates`), and
+       likewise for the source universal property (see
+       :func:`opetopy.UnnamedOpetopicCategory.sunivCandidates`).
+
+    Finally, the target universality is saturated (see
+    :func:`opetopy.UnnamedOpetopicCategory.tclosure`). Since the completion
+    is infinite as soon as there are identities, the process also stops as
+    soon as the context would have more than ``maxCells`` cells, or after
+    ``timeout`` seconds (the current step is finished, so that the result
+    is always valid). New cells are named ``{prefix}{i}``, for the smallest
+    integers :math:`i` that are not already used.
+    """
+    seq = p.eval()
+    if seq.pastingDiagram is not None:
+        raise DerivationError(
+            "Free completion",
+            "Sequent expected to not type a pasting diagram")
+    deadline = None if timeout is None else time.monotonic() + timeout
+    counter = [0]
+
+    def fresh() -> str:
+        while prefix + str(counter[0]) in seq.context:
+            counter[0] += 1
+        counter[0] += 1
+        return prefix + str(counter[0] - 1)
+
+    def exhausted() -> bool:
+        return (maxCells is not None and len(seq.context) + 2 > maxCells) \
+            or (deadline is not None and time.monotonic() >= deadline)
+
+    for n in range(1, dim + 1):
+        # Fill pasting diagrams of (n-1)-cells
+        changed = True
+        rounds = 0
+        while changed and not exhausted() and \
+                (maxRounds is None or rounds < maxRounds):
+            changed = False
+            rounds += 1
+            candidates = [
+                P for P in UnnamedOpetopicSet.pastingDiagrams(
+                    seq, n - 1, maxNodes)
+                if P.nodes is not None and len(P.nodes) >= 2
+            ]
+            if n >= 2:
+                candidates += [
+                    UnnamedOpetopicSet.pastingDiagram(
+                        UnnamedOpetope.Degen(seq[y].shapeProof), y)
+                    for y in seq.context.variableNames()
+                    if seq[y].dimension == n - 2
+                ]
+            for P in candidates:
+                if filler(seq, P) is not None:
+                    continue
+                elif exhausted():
+                    break
+                if P.nodes is None:
+                    seq = UnnamedOpetopicSet.degen(seq, P.degeneracyVariable())
+                    p = UnnamedOpetopicSet.Degen(p, P.degeneracyVariable())
+                else:
+                    seq = UnnamedOpetopicSet.graft(seq, P)
+                    p = UnnamedOpetopicSet.Graft(p, P)
+                targetName, fillerName = fresh(), fresh()
+                seq = tfill(seq, targetName, fillerName)
+                p = TFill(p, targetName, fillerName)
+                changed = True
+        # Apply universal properties of n-cells
+        if n < dim:
+            for alpha in sorted(seq.targetUniversal):
+                if seq[alpha].dimension != n:
+                    continue
+                for beta in tunivCandidates(seq, alpha):
+                    if exhausted():
+                        break
+                    factorizationName, fillerName = fresh(), fresh()
+                    seq = tuniv(seq, alpha, beta, factorizationName,
+                                fillerName)
+                    p = TUniv(p, alpha, beta, factorizationName, fillerName)
+            for alpha in sorted(seq.sourceUniversal.keys()):
+                if seq[alpha].dimension != n:
+                    continue
+                for addr in sorted(seq.sourceUniversal[alpha]):
+                    for beta in sunivCandidates(seq, alpha, addr):
+                        if exhausted():
+                            break
+                        factorizationName, fillerName = fresh(), fresh()
+                        seq = suniv(seq, alpha, beta, addr,
+                                    factorizationName, fillerName)
+                        p = SUniv(p, alpha, beta, addr, factorizationName,
+                                  fillerName)
+
+    # Saturate target universality
+    seq, applications = tclosure(seq)
+    for tuCell in applications:
+        p = TClose(p, tuCell)
+    return p, seq
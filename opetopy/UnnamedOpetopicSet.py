@@ -7,13 +7,16 @@
 
 """
 
-from copy import deepcopy
 from operator import attrgetter
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from typing import (AbstractSet, Any, Dict, FrozenSet, Hashable, Iterable,
+                    Iterator, List, Optional, Set, Tuple, TypeVar, Union)
 
 from opetopy.common import *
 from opetopy import UnnamedOpetope
 
+_K = TypeVar('_K', bound=Hashable)
+_E = TypeVar('_E', bound=Hashable)
+
 
 class Variable:
     """
@@ -21,11 +24,21 @@ class Variable:
     (:class:`opetopy.UnnamedOpetope.Preopetope`) representing its shape. To construct
     a variable, however, not only does the shape need to be specified, but its
     whole proof tree.
+
+    The shape is registered (see :func:`opetopy.UnnamedOpetope.shape`), so
+    that all variables of a given shape share a single evaluated shape, while
+    ``shapeProof`` is the proof tree provided at creation.
     """
 
     name: str
     shapeProof: UnnamedOpetope.RuleInstance
-    shapeSequent: UnnamedOpetope.Sequent  # For optimization purposes
+    sharedShape: UnnamedOpetope.Shape
+
+    def __copy__(self) -> 'Variable':
+        return self
+
+    def __deepcopy__(self, memo) -> 'Variable':
+        return self
 
     def __eq__(self, other) -> bool:
         """
@@ -40,7 +53,7 @@ class Variable:
                  shapeProof: UnnamedOpetope.RuleInstance) -> None:
         self.name = name
         self.shapeProof = shapeProof
-        self.shapeSequent = shapeProof.eval()
+        self.sharedShape = UnnamedOpetope.shape(shapeProof)
 
     def __ne__(self, other) -> bool:
         return not (self == other)
@@ -67,7 +80,14 @@ class Variable:
         (:class:`opetopy.UnnamedOpetope.RuleInstance`) that was provided
         at its creation.
         """
-        return self.shapeSequent.source
+        return self.sharedShape.source
+
+    @property
+    def shapeSequent(self) -> UnnamedOpetope.Sequent:
+        """
+        Returns the evaluated proof tree of the shape of the variable.
+        """
+        return self.sharedShape.sequent
 
     def shapeTarget(self) -> UnnamedOpetope.Preopetope:
         """
@@ -76,7 +96,7 @@ class Variable:
         (:class:`opetopy.UnnamedOpetope.RuleInstance`) that was provided
         at its creation.
         """
-        return self.shapeSequent.target
+        return self.sharedShape.target
 
     def toTex(self) -> str:
         """
@@ -100,18 +120,29 @@ class PastingDiagram:
     * if :math:`\\omega` is degenerate, say :math:`\\omega = \\{\\{\\phi`, a
       variable of shape :math:`\\phi`; this case is implemented in
       :class:`opetopy.UnnamedOpetopicSet.DegeneratePastingDiagram`.
+
+    Pasting diagrams are immutable once created, and are shared (rather than
+    copied) by the sequents and types that refer to them.
     """
 
+    _key: Optional[Tuple[int, Tuple[str, ...]]]
     degeneracy: Optional[str]
+    leaves: Optional[Dict[UnnamedOpetope.Address, str]]
     nodes: Optional[Dict[UnnamedOpetope.Address, str]]
-    shapeSequent: UnnamedOpetope.Sequent  # For optimization purposes
     shapeProof: UnnamedOpetope.RuleInstance
+    sharedShape: UnnamedOpetope.Shape
+
+    def __copy__(self) -> 'PastingDiagram':
+        return self
+
+    def __deepcopy__(self, memo) -> 'PastingDiagram':
+        return self
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, PastingDiagram):
             raise NotImplementedError
         else:
-            return self.shape == other.shape and \
+            return self.sharedShape is other.sharedShape and \
                 self.degeneracy == other.degeneracy and \
                 self.nodes == other.nodes
 
@@ -140,22 +171,7 @@ class PastingDiagram:
         return str(self)
 
     def __str__(self) -> str:
-        if self.degeneracy is None:
-            if self.nodes is None:
-                raise RuntimeError("[Pasting diagram, to string] Both the "
-                                   "degeneracy and node dict of the pasting "
-                                   "diagram are None. In valid derivations, "
-                                   "this should not happen")
-            if self.shape == UnnamedOpetope.point().source:
-                return "⧫"
-            else:
-                lines = [
-                    str(addr) + " ← " + str(self.nodes[addr])
-                    for addr in self.nodes.keys()
-                ]
-                return "{" + ", ".join(lines) + "}"
-        else:
-            return "{{" + str(self.degeneracy) + "}}"
+        return self.toStr()
 
     def degeneracyVariable(self) -> str:
         """
@@ -175,9 +191,11 @@ class PastingDiagram:
         Creates a degenerate pasting diagram.
         """
         res = PastingDiagram()
+        res._key = None
+        res.leaves = None
         res.nodes = None
         res.shapeProof = shapeProof
-        res.shapeSequent = shapeProof.eval()
+        res.sharedShape = UnnamedOpetope.shape(shapeProof)
         if not res.shape.isDegenerate:
             raise DerivationError("Degenerate pasting diagram, creation",
                                   "Provided shape is not degenerate")
@@ -189,25 +207,65 @@ class PastingDiagram:
         res.degeneracy = degeneracy
         return res
 
+    def key(self) -> Tuple[int, Tuple[str, ...]]:
+        """
+        Returns a hashable key identifying the pasting diagram, made of the id
+        of its shape (see :class:`opetopy.UnnamedOpetope.Shape`) and of the
+        names of its nodes, sorted by address (or of its degeneracy variable,
+        if it is degenerate). Two pasting diagrams are equal if and only if
+        they have the same key. The key is computed once.
+        """
+        if self._key is None:
+            if self.nodes is None:
+                names = (self.degeneracyVariable(), )  # type: Tuple[str, ...]
+            else:
+                names = tuple(self.nodes[a] for a in sorted(self.nodes.keys()))
+            self._key = (self.sharedShape.id, names)
+        return self._key
+
+    def leafSources(self,
+                    ctx: 'Context') -> Dict[UnnamedOpetope.Address, str]:
+        """
+        Returns a ``dict`` mapping every leaf address :math:`[p[q]]` of the
+        shape of the (non degenerate) pasting diagram to the variable name
+        decorating that leaf, i.e. the source at :math:`[q]` of the node at
+        :math:`[p]`, as given by context ``ctx``. If the pasting diagram was
+        created by :class:`opetopy.UnnamedOpetopicSet.PastingDiagramBuilder`,
+        this mapping has been computed along the way and is returned as is.
+        """
+        if self.leaves is not None:
+            return self.leaves
+        elif self.nodes is None:
+            raise DerivationError("Non degenerate pasting diagram, get leaves",
+                                  "Pasting diagram is degenerate")
+        res = {}  # type: Dict[UnnamedOpetope.Address, str]
+        for l in self.shape.leafAddresses():
+            p, q = l.edgeDecomposition()
+            res[l] = ctx.source(self.nodes[p], q)
+        return res
+
     @staticmethod
     def point():
         """
         Creates the trivial pasting diagram with shape the point
         """
         return PastingDiagram.nonDegeneratePastingDiagram(
-            UnnamedOpetope.Point(), {})
+            UnnamedOpetope.POINT.proof, {})
 
     @staticmethod
     def nonDegeneratePastingDiagram(
             shapeProof: UnnamedOpetope.RuleInstance,
             nodes: Dict[UnnamedOpetope.Address, str]) -> 'PastingDiagram':
         """
-        Creates a non degenerate pasting diagram.
+        Creates a non degenerate pasting diagram. The node mapping ``nodes``
+        is copied.
         """
         res = PastingDiagram()
+        res._key = None
         res.degeneracy = None
+        res.leaves = None
         res.shapeProof = shapeProof
-        res.shapeSequent = shapeProof.eval()
+        res.sharedShape = UnnamedOpetope.shape(shapeProof)
         if res.shape.isDegenerate:
             raise DerivationError("Non degenerate pasting diagram, creation",
                                   "Provided shape is degenerate")
@@ -216,7 +274,7 @@ class PastingDiagram:
                 "Non degenerate pasting diagram, creation",
                 "Node mapping domain doesn't match with the set of addresses "
                 "of the shape")
-        res.nodes = nodes
+        res.nodes = dict(nodes)
         return res
 
     @property
@@ -227,7 +285,14 @@ class PastingDiagram:
         (:class:`opetopy.UnnamedOpetope.RuleInstance`) that was provided
         at its creation.
         """
-        return self.shapeSequent.source
+        return self.sharedShape.source
+
+    @property
+    def shapeSequent(self) -> UnnamedOpetope.Sequent:
+        """
+        Returns the evaluated proof tree of the shape of the pasting diagram.
+        """
+        return self.sharedShape.sequent
 
     def shapeTarget(self) -> UnnamedOpetope.Preopetope:
         """
@@ -236,7 +301,7 @@ class PastingDiagram:
         (:class:`opetopy.UnnamedOpetope.RuleInstance`) that was provided
         at its creation.
         """
-        return self.shapeSequent.target
+        return self.sharedShape.target
 
     def source(self, addr: UnnamedOpetope.Address) -> str:
         """
@@ -254,6 +319,30 @@ class PastingDiagram:
         else:
             return self.nodes[addr]
 
+    def toStr(self,
+              universal: FrozenSet[UnnamedOpetope.Address] = frozenset()) \
+            -> str:
+        """
+        Converts the pasting diagram to a string, where the sources at the
+        addresses in ``universal`` are marked as universal (``∀``).
+        """
+        if self.degeneracy is None:
+            if self.nodes is None:
+                raise RuntimeError("[Pasting diagram, to string] Both the "
+                                   "degeneracy and node dict of the pasting "
+                                   "diagram are None. In valid derivations, "
+                                   "this should not happen")
+            if self.sharedShape is UnnamedOpetope.POINT:
+                return "⧫"
+            else:
+                lines = [
+                    str(addr) + (" ← ∀" if addr in universal else " ← ") +
+                    str(self.nodes[addr]) for addr in self.nodes.keys()
+                ]
+                return "{" + ", ".join(lines) + "}"
+        else:
+            return "{{" + str(self.degeneracy) + "}}"
+
     def toTex(self) -> str:
         if self.degeneracy is None:
             if self.nodes is None:
@@ -261,7 +350,7 @@ class PastingDiagram:
                                    "degeneracy and node dict of the pasting "
                                    "diagram are None. In valid derivations, "
                                    "this should not happen")
-            if self.shape == UnnamedOpetope.point().source:
+            if self.sharedShape is UnnamedOpetope.POINT:
                 return "\\optZero"
             else:
                 lines = [
@@ -296,12 +385,12 @@ class Type:
     def __init__(self, source: PastingDiagram,
                  target: Optional[Variable]) -> None:
         if target is None:
-            if source.shape != UnnamedOpetope.Point().eval().source:
+            if source.sharedShape is not UnnamedOpetope.POINT:
                 raise DerivationError(
                     "Type, creation",
                     "Source pasting diagram is not a point, but target is "
                     "unspecified")
-        elif source.shapeTarget() != target.shape:
+        elif source.sharedShape.targetId != target.sharedShape.id:
             raise DerivationError(
                 "Type, creation",
                 "Target variable {var} has shape {shape}, should have "
@@ -323,11 +412,23 @@ class Type:
                                           tgt=repr(self.target))
 
     def __str__(self) -> str:
+        return self.toStr()
+
+    def toStr(self,
+              sourceUniversal: FrozenSet[UnnamedOpetope.Address] = frozenset(),
+              targetUniversal: bool = False) -> str:
+        """
+        Converts the type to a string, where the sources at the addresses in
+        ``sourceUniversal``, and the target if ``targetUniversal`` is set, are
+        marked as universal (``∀``).
+        """
         if self.target is None:
-            return str(self.source)
+            return self.source.toStr(sourceUniversal)
         else:
-            return "{src} → {tgt}".format(src=str(self.source),
-                                          tgt=str(self.target))
+            return "{src} → {univ}{tgt}".format(
+                src=self.source.toStr(sourceUniversal),
+                univ="∀" if targetUniversal else "",
+                tgt=str(self.target))
 
     def toTex(self) -> str:
         if self.target is None:
@@ -352,7 +453,7 @@ class Typing:
     variable: Variable
 
     def __init__(self, variable: Variable, type: Type) -> None:
-        if variable.shape != type.source.shape:
+        if variable.sharedShape is not type.source.sharedShape:
             raise DerivationError(
                 "Typing, creation",
                 "Variable {var} cannot have type {type} as shapes do not "
@@ -373,13 +474,67 @@ class Typing:
                                        type=self.type.toTex())
 
 
-class Context(Set[Typing]):
+def _indexAdd(index: PersistentDict[_K, PersistentSet[_E]], key: _K,
+              elem: _E) -> PersistentDict[_K, PersistentSet[_E]]:
+    """
+    Returns a copy of the index ``index``, in which element ``elem`` is added
+    to the bucket of key ``key``.
+    """
+    return index.set(key, index.get(key, _EMPTY_BUCKET).insert(elem))
+
+
+def _indexDiscard(index: PersistentDict[_K, PersistentSet[_E]], key: _K,
+                  elem: _E) -> PersistentDict[_K, PersistentSet[_E]]:
+    """
+    Returns a copy of the index ``index``, in which element ``elem`` is
+    removed from the bucket of key ``key``, and the bucket is removed if it
+    becomes empty.
+    """
+    bucket = index.get(key, _EMPTY_BUCKET)
+    if elem not in bucket:
+        return index
+    elif len(bucket) == 1:
+        return index.remove(key)
+    return index.set(key, bucket.remove(elem))
+
+
+_EMPTY_BUCKET = PersistentSet()  # type: PersistentSet[Any]
+"""
+Bucket of the keys that have none in the indices of
+:class:`opetopy.UnnamedOpetopicSet.Context`.
+"""
+
+
+class Context(AbstractSet[Typing]):
     """
     A context is a set of tyings (see :class:`opetopy.UnnamedOpetopicSet.Typing`).
+
+    The typings are stored in a persistent mapping (see
+    :class:`opetopy.common.PersistentDict`) indexed by variable name, so that
+    lookups are constant time. The context also maintains an incidence index,
+    mapping each variable name to its cofaces (see
+    :meth:`opetopy.UnnamedOpetopicSet.Context.cofaces`), a source index,
+    mapping the key of a pasting diagram to the variables having it as source
+    (see :meth:`opetopy.UnnamedOpetopicSet.Context.cellsWithSource`), and a
+    shape index, mapping a shape id to the variables having that shape (see
+    :meth:`opetopy.UnnamedOpetopicSet.Context.cellsOfShape`). These indices
+    are persistent mappings of :class:`opetopy.common.PersistentSet`.
+
+    Typings are never modified once added, and all the structures above are
+    persistent, so that copies of a context share them: copying a context is
+    constant time, and adding a typing only copies the paths to the updated
+    entries.
     """
+
+    _cofaces: PersistentDict[str, PersistentSet[Tuple[
+        str, Optional[UnnamedOpetope.Address]]]]
+    _names: PersistentDict[str, Typing]
+    _shapes: PersistentDict[int, PersistentSet[str]]
+    _sources: PersistentDict[Tuple[int, Tuple[str, ...]], PersistentSet[str]]
+
     def __add__(self, typing: Typing) -> 'Context':
         """
-        Adds a variable typing to a deep copy of the context context, if the
+        Adds a variable typing to a copy of the context context, if the
         typed variable isn't already typed in the context.
         """
         if typing.variable in self:
@@ -388,31 +543,53 @@ class Context(Set[Typing]):
                 "Variable {var} is already typed in this context",
                 var=str(typing.variable))
         else:
-            res = deepcopy(self)
+            res = self.copy()
             res.add(typing)
             return res
 
     def __contains__(self, var) -> bool:
         """
-        Tests wether the variable ``var`` is typed in this context.
+        Tests wether the variable ``var`` is typed in this context. If ``var``
+        is a ``str``, tests wether a variable with that name is, and if it is
+        a :class:`opetopy.UnnamedOpetopicSet.Typing`, wether it is in the
+        context.
         """
-        if not isinstance(var, Variable):
+        if isinstance(var, str):
+            return var in self._names
+        elif isinstance(var, Typing):
+            return self._names.get(var.variable.name) is var
+        elif not isinstance(var, Variable):
             raise NotImplementedError
-        for typing in self:
-            if var == typing.variable:
-                return True
-        return False
+        return var.name in self._names
 
     def __getitem__(self, name: str) -> Typing:
         """
         Returns typing whose variable name is ``name``.
         """
-        for t in self:
-            if t.variable.name == name:
-                return t
-        raise DerivationError("Context, get typing",
-                              "Variable {name} not typed in context",
-                              name=name)
+        res = self._names.get(name)
+        if res is None:
+            raise DerivationError("Context, get typing",
+                                  "Variable {name} not typed in context",
+                                  name=name)
+        return res
+
+    def __init__(self, typings: Iterable[Typing] = ()) -> None:
+        """
+        Creates a context containing the typings ``typings`` (empty by
+        default).
+        """
+        self._cofaces = PersistentDict()
+        self._names = PersistentDict()
+        self._shapes = PersistentDict()
+        self._sources = PersistentDict()
+        for typing in typings:
+            self.add(typing)
+
+    def __iter__(self) -> Iterator[Typing]:
+        return iter(self._names.values())
+
+    def __len__(self) -> int:
+        return len(self._names)
 
     def __repr__(self) -> str:
         return str(self)
@@ -420,6 +597,112 @@ class Context(Set[Typing]):
     def __str__(self) -> str:
         return ", ".join([str(self[v]) for v in self.variableNames()])
 
+    @staticmethod
+    def _incidences(typing: Typing) \
+            -> List[Tuple[str, Optional[UnnamedOpetope.Address]]]:
+        """
+        Returns the list of (face name, address) tuples of a typing, where the
+        address is ``None`` for the target.
+        """
+        res = []  # type: List[Tuple[str, Optional[UnnamedOpetope.Address]]]
+        if typing.type.source.nodes is not None:
+            res += [(y, a) for a, y in typing.type.source.nodes.items()]
+        if typing.type.target is not None:
+            res.append((typing.type.target.name, None))
+        return res
+
+    def add(self, typing: Typing) -> None:
+        """
+        Adds a typing to the context **in place**, and updates the indices.
+        Copies of the context are not affected. No check is performed, use
+        :meth:`opetopy.UnnamedOpetopicSet.Context.__add__` instead.
+        """
+        name = typing.variable.name
+        self._names = self._names.set(name, typing)
+        for face, addr in Context._incidences(typing):
+            self._cofaces = _indexAdd(self._cofaces, face, (name, addr))
+        self._sources = _indexAdd(self._sources, typing.type.source.key(),
+                                  name)
+        self._shapes = _indexAdd(self._shapes, typing.variable.sharedShape.id,
+                                 name)
+
+    def cellsOfShape(self, shapeId: int) -> AbstractSet[str]:
+        """
+        Returns the set of the names of the variables whose shape has id
+        ``shapeId`` (see :class:`opetopy.UnnamedOpetope.Shape`). The set is
+        persistent, and is not affected by later updates of the context.
+        """
+        return self._shapes.get(shapeId, _EMPTY_BUCKET)
+
+    def cellsWithSource(self, P: PastingDiagram) -> AbstractSet[str]:
+        """
+        Returns the set of the names of the variables whose source pasting
+        diagram is ``P``. The set is persistent, and is not affected by later
+        updates of the context.
+        """
+        return self.cellsWithSourceKey(P.key())
+
+    def cellsWithSourceKey(self, key: Tuple[int, Tuple[str, ...]]) \
+            -> AbstractSet[str]:
+        """
+        Same as :meth:`opetopy.UnnamedOpetopicSet.Context.cellsWithSource`,
+        but the source pasting diagram is given by its key (see
+        :meth:`opetopy.UnnamedOpetopicSet.PastingDiagram.key`), so that it
+        does not have to be built.
+        """
+        return self._sources.get(key, _EMPTY_BUCKET)
+
+    def cofaces(
+            self, name: str
+    ) -> AbstractSet[Tuple[str, Optional[UnnamedOpetope.Address]]]:
+        """
+        Returns the set of cofaces of the variable whose name is ``name``,
+        as tuples ``(coface, addr)``, where ``coface`` is the name of a
+        variable having the former as source at address ``addr``, or as
+        target if ``addr`` is ``None``. The set is persistent, and is not
+        affected by later updates of the context.
+        """
+        return self._cofaces.get(name, _EMPTY_BUCKET)
+
+    def copy(self) -> 'Context':
+        """
+        Returns a copy of the context, in constant time: the typings and the
+        indices are persistent, and shared by the copy.
+        """
+        res = Context()
+        res._cofaces = self._cofaces
+        res._names = self._names
+        res._shapes = self._shapes
+        res._sources = self._sources
+        return res
+
+    def discard(self, typing: Typing) -> None:
+        """
+        Removes a typing from the context **in place**, if present, and
+        updates the indices. Copies of the context are not affected.
+        """
+        if typing in self:
+            name = typing.variable.name
+            self._names = self._names.remove(name)
+            for face, addr in Context._incidences(typing):
+                self._cofaces = _indexDiscard(self._cofaces, face,
+                                              (name, addr))
+            self._sources = _indexDiscard(self._sources,
+                                          typing.type.source.key(), name)
+            self._shapes = _indexDiscard(self._shapes,
+                                         typing.variable.sharedShape.id, name)
+
+    def retype(self, name: str, type: Type) -> 'Context':
+        """
+        Returns a copy of the context in which the variable whose name is
+        ``name`` has type ``type`` instead. The typing of the variable in the
+        current context is left untouched.
+        """
+        res = self.copy()
+        res.discard(self[name])
+        res.add(Typing(self[name].variable, type))
+        return res
+
     def source(self, name: str, addr: UnnamedOpetope.Address) -> str:
         """
         Returns the source at address ``addr`` of the variable whose name is
@@ -431,9 +714,9 @@ class Context(Set[Typing]):
         """
         Returns the target of the variable whose name is ``name``.
         """
-        res = self[name].type.target
-        if self[name].type.source.shape == \
-                UnnamedOpetope.Point().eval().source:
+        type = self[name].type
+        res = type.target
+        if type.source.sharedShape is UnnamedOpetope.POINT:
             raise DerivationError(
                 "Context, target of variable",
                 "Variable {var} is a point, and do not have a target",
@@ -466,10 +749,33 @@ class Sequent:
     * a context (:class:`opetopy.UnnamedOpetopicSet.Context`);
     * optionally, a pasting diagram
       (:class:`opetopy.UnnamedOpetopicSet`.PastingDiagram).
+
+    Sequents are lightweight records: the inference rules never modify their
+    premises, and conclusions share the context and pasting diagram of their
+    premise whenever these are unchanged.
+
+    A sequent also carries a universality index, used by the rules of
+    :mod:`opetopy.UnnamedOpetopicCategory`: ``targetUniversal`` is the set of
+    the names of the target universal cells, and ``sourceUniversal`` maps the
+    name of a cell to the set of addresses at which it is source universal.
+    Both are persistent (see :class:`opetopy.common.PersistentSet` and
+    :class:`opetopy.common.PersistentDict`), so that flagging a cell does not
+    copy them.
+    Finally, ``fillers`` maps the key (see
+    :meth:`opetopy.UnnamedOpetopicSet.PastingDiagram.key`) of a pasting
+    diagram to the name of a target universal cell having it as source, so
+    that composites are only computed once. It is persistent as well.
+
+    The rules of this module pass this index on unchanged. Like the context,
+    it is shared by conclusions, and is replaced rather than modified on
+    update.
     """
 
     context: Context
+    fillers: PersistentDict[Tuple[int, Tuple[str, ...]], str]
     pastingDiagram: Optional[PastingDiagram]
+    sourceUniversal: PersistentDict[str, FrozenSet[UnnamedOpetope.Address]]
+    targetUniversal: PersistentSet[str]
 
     def __getitem__(self, name: str) -> Variable:
         """
@@ -482,10 +788,14 @@ class Sequent:
 
     def __init__(self) -> None:
         """
-        Creates a sequent with an empty context, and no pasting diagram.
+        Creates a sequent with an empty context, no pasting diagram, and no
+        universal cell.
         """
         self.context = Context()
+        self.fillers = PersistentDict()
         self.pastingDiagram = None
+        self.sourceUniversal = PersistentDict()
+        self.targetUniversal = PersistentSet()
 
     def __repr__(self) -> str:
         return str(self)
@@ -496,10 +806,26 @@ class Sequent:
             pd = str(self.pastingDiagram)
         res = "ctx ="
         for v in self.context.variableNames():
-            res += "\n    " + str(self.context[v])
+            res += "\n    " + str(self[v]) + " : " + \
+                self.context[v].type.toStr(
+                    self.sourceUniversal.get(v, frozenset()),
+                    v in self.targetUniversal)
         res += "\npd =\n    " + pd
         return res
 
+    def copy(self) -> 'Sequent':
+        """
+        Returns a shallow copy of the sequent: the context, pasting diagram
+        and universality index are shared.
+        """
+        res = Sequent()
+        res.context = self.context
+        res.fillers = self.fillers
+        res.pastingDiagram = self.pastingDiagram
+        res.sourceUniversal = self.sourceUniversal
+        res.targetUniversal = self.targetUniversal
+        return res
+
     def toTex(self) -> str:
         pd = ""
         if self.pastingDiagram is not None:
@@ -525,7 +851,7 @@ def point(seq: Sequent, name: Union[str, List[str]]) -> Sequent:
         if seq.pastingDiagram is not None:
             raise DerivationError("point rule",
                                   "Sequent cannot have a pasting diagram")
-        var = Variable(name, UnnamedOpetope.Point())
+        var = Variable(name, UnnamedOpetope.POINT.proof)
         if var in seq.context:
             raise DerivationError(
                 "point rule",
@@ -533,8 +859,8 @@ def point(seq: Sequent, name: Union[str, List[str]]) -> Sequent:
                 "{ctx}",
                 name=name,
                 ctx=str(seq.context))
-        res = deepcopy(seq)
-        res.context = res.context + Typing(var,
+        res = seq.copy()
+        res.context = seq.context + Typing(var,
                                            Type(PastingDiagram.point(), None))
         return res
     else:
@@ -550,30 +876,33 @@ def degen(seq: Sequent, name: str) -> Sequent:
     if seq.pastingDiagram is not None:
         raise DerivationError("degen rule",
                               "Sequent cannot have a pasting diagram")
-    res = deepcopy(seq)
+    res = seq.copy()
     res.pastingDiagram = PastingDiagram.degeneratePastingDiagram(
         UnnamedOpetope.Degen(seq.context[name].variable.shapeProof), name)
     return res
 
 
-def graft(seq: Sequent, pd: PastingDiagram) -> Sequent:
+def _checkGraft(ctx: Context, pd: PastingDiagram, scope: str) -> None:
     """
-    The :math:`\\textbf{OptSet${}^?$}` :math:`\\texttt{graft}` rule.
+    Checks that the non degenerate pasting diagram ``pd`` is well-formed in
+    context ``ctx``, i.e. that its nodes have the expected shapes and satisfy
+    axiom [Inner]. This is the side condition of the
+    :math:`\\texttt{graft}` rule.
     """
     if pd.nodes is None:
         raise DerivationError(
-            "graft rule", "Parameter pasting diagram cannot be degenerate")
+            scope, "Parameter pasting diagram cannot be degenerate")
     # Shape checking
     omega = pd.shape
     for addr in pd.nodes.keys():
-        psi = seq[pd.nodes[addr]].shape
-        if psi != omega.source(addr):
+        var = ctx[pd.nodes[addr]].variable
+        if var.sharedShape.id != pd.sharedShape.sourceIds[addr]:
             raise DerivationError(
-                "graft rule",
+                scope,
                 "Variable {var} has incompatible shape {psi}, should have "
                 "{should}",
-                var=seq[pd.nodes[addr]].name,
-                psi=repr(psi),
+                var=var.name,
+                psi=repr(var.shape),
                 should=repr(omega.source(addr)))
     # [Inner] axiom
     for pj in pd.nodes.keys():
@@ -581,50 +910,49 @@ def graft(seq: Sequent, pd: PastingDiagram) -> Sequent:
             pi, q = pj.edgeDecomposition()
             xi = pd.nodes[pi]
             xj = pd.nodes[pj]
-            if seq.context.target(xj) != seq.context.source(xi, q):
+            if ctx.target(xj) != ctx.source(xi, q):
                 raise DerivationError(
-                    "graft rule",
+                    scope,
                     "Parameter pasting diagram doesn't satisfy axiom [Inner]: "
                     "variables {xi} and {xj} don't agree on the decoration of "
                     "edge {edge}",
                     xi=repr(xi),
                     xj=repr(xj),
                     edge=repr(pj))
-    res = deepcopy(seq)
-    res.pastingDiagram = deepcopy(pd)
-    return res
 
 
-def shift(seq: Sequent, targetName: str, name: str) -> Sequent:
+def _checkShift(ctx: Context, P: PastingDiagram, targetName: str,
+                scope: str) -> Variable:
     """
-    The :math:`\\textbf{OptSet${}^?$}` :math:`\\texttt{shift}` rule.
+    Checks that a cell with source pasting diagram ``P`` and target the
+    variable whose name is ``targetName`` can be added to context ``ctx``,
+    i.e. that the shapes match and axioms [Degen], or [Glob1] and [Glob2],
+    are satisfied. This is the side condition of the
+    :math:`\\texttt{shift}` rule. Returns the target variable.
     """
-    if seq.pastingDiagram is None:
-        raise DerivationError("shift rule",
-                              "Sequent must have a pasting diagram")
-    P = seq.pastingDiagram
     omega = P.shape
-    readdress = P.shapeProof.eval().context
+    readdress = P.shapeSequent.context
     n = omega.dimension
-    x = seq.context[targetName].variable
-    a = seq.context[targetName].type.target
-    Q = seq.context[targetName].type.source
-    if x.shape != P.shapeTarget():
+    x = ctx[targetName].variable
+    a = ctx[targetName].type.target
+    Q = ctx[targetName].type.source
+    if x.sharedShape.id != P.sharedShape.targetId:
         raise DerivationError(
-            "shift rule",
+            scope,
             "Target variable {var} has shape {shape} should have {should}",
             var=repr(x),
             shape=repr(x.shape),
             should=repr(P.shapeTarget()))
     if omega.isDegenerate:
         if a is None:  # x is a point
-            raise RuntimeError("[shift rule] Variable {x} has a degenerate "
+            raise RuntimeError("[{scope}] Variable {x} has a degenerate "
                                "shape but no target. In valid derivations, "
-                               "this should not happen")
+                               "this should not happen".format(scope=scope,
+                                                               x=repr(x)))
         # [Degen] axiom
         if Q.nodes != {UnnamedOpetope.Address.epsilon(n - 2): a.name}:
             raise DerivationError(
-                "shift rule",
+                scope,
                 "Target variable {var}'s source is expected to be globular at "
                 "{var}'s target",
                 var=repr(x))
@@ -632,41 +960,328 @@ def shift(seq: Sequent, targetName: str, name: str) -> Sequent:
         # [Glob1] axiom
         r = P[UnnamedOpetope.Address.epsilon(n - 1)]
         if a is None:  # x is a point
-            if seq.context[r].type.target is not None:  # r must be a point
+            if ctx[r].type.target is not None:  # r must be a point
                 raise DerivationError(
-                    "shift rule",
+                    scope,
                     "Axiom [Glob1] is not satisfied: variable {x} is a point, "
                     "should have target {should}",
                     x=repr(x),
-                    should=repr(seq.context[r].type.target))
+                    should=repr(ctx[r].type.target))
         else:
-            b = seq.context.target(r)
+            b = ctx.target(r)
             if b != a.name:
                 raise DerivationError(
-                    "shift rule",
+                    scope,
                     "Axiom [Glob1] is not satisfied: variable {x} has target "
                     "{a}, should have {should}",
                     x=repr(x),
                     a=a.name,
                     should=repr(b))
         # [Glob2] axiom
-        for l in omega.leafAddresses():
-            p, q = l.edgeDecomposition()
-            sP = seq.context.source(P[p], q)
-            sx = seq.context.source(x.name, readdress(l))
+        for l, sP in P.leafSources(ctx).items():
+            sx = ctx.source(x.name, readdress(l))
             if sP != sx:
                 raise DerivationError(
-                    "shift rule",
+                    scope,
                     "Axiom [Glob2] is not satisfied: variable {x} has {addr} "
                     "source {sx}, should have {should}",
                     x=repr(x),
                     addr=repr(readdress(l)),
                     sx=repr(sx),
                     should=repr(sP))
-    res = Sequent()
+    return x
+
+
+def graft(seq: Sequent, pd: PastingDiagram) -> Sequent:
+    """
+    The :math:`\\textbf{OptSet${}^?$}` :math:`\\texttt{graft}` rule.
+    """
+    _checkGraft(seq.context, pd, "graft rule")
+    res = seq.copy()
+    res.pastingDiagram = pd
+    return res
+
+
+def shift(seq: Sequent, targetName: str, name: str) -> Sequent:
+    """
+    The :math:`\\textbf{OptSet${}^?$}` :math:`\\texttt{shift}` rule.
+    """
+    if seq.pastingDiagram is None:
+        raise DerivationError("shift rule",
+                              "Sequent must have a pasting diagram")
+    x = _checkShift(seq.context, seq.pastingDiagram, targetName, "shift rule")
+    res = seq.copy()
     res.context = seq.context + Typing(
         Variable(name, seq.pastingDiagram.shapeProof),
-        Type(deepcopy(seq.pastingDiagram), x))
+        Type(seq.pastingDiagram, x))
+    res.pastingDiagram = None
+    return res
+
+
+def addcells(seq: Sequent,
+             cells: List[Tuple[str, PastingDiagram, Optional[str]]]) \
+        -> Sequent:
+    """
+    Adds many cells at once to the context of a sequent that does not type a
+    pasting diagram. Each cell is described by a tuple ``(name, pd, target)``
+    where ``pd`` is the source pasting diagram, and ``target`` is the name of
+    the target variable, or ``None`` if the cell is a point (in which case
+    ``pd`` must be :meth:`opetopy.UnnamedOpetopicSet.PastingDiagram.point`).
+
+    The cells may refer to one another, and are processed in dependency order,
+    i.e. by increasing dimension. Each cell is checked exactly as the
+    :math:`\\texttt{point}` rule, or the :math:`\\texttt{degen}` or
+    :math:`\\texttt{graft}` rule followed by the :math:`\\texttt{shift}`
+    rule, would, but the context is only copied once.
+    """
+    if seq.pastingDiagram is not None:
+        raise DerivationError("addcells rule",
+                              "Sequent cannot have a pasting diagram")
+    ctx = seq.context.copy()
+    for name, pd, target in sorted(cells, key=lambda c: c[1].shape.dimension):
+        var = Variable(name, pd.shapeProof)
+        if var in ctx:
+            raise DerivationError(
+                "addcells rule",
+                "Variable {var} is already typed in this context",
+                var=name)
+        if target is None:
+            if pd.sharedShape is not UnnamedOpetope.POINT:
+                raise DerivationError(
+                    "addcells rule",
+                    "Cell {var} has no target, hence should be a point",
+                    var=name)
+            ctx.add(Typing(var, Type(pd, None)))
+        else:
+            if pd.degeneracy is not None:
+                if pd.shape.degeneracy != ctx[pd.degeneracy].variable.shape:
+                    raise DerivationError(
+                        "addcells rule",
+                        "Degenerate source pasting diagram of cell {var} "
+                        "does not have the shape of its degeneracy {deg}",
+                        var=name,
+                        deg=pd.degeneracy)
+            else:
+                _checkGraft(ctx, pd, "addcells rule")
+            x = _checkShift(ctx, pd, target, "addcells rule")
+            ctx.add(Typing(var, Type(pd, x)))
+    res = seq.copy()
+    res.context = ctx
+    return res
+
+
+def _insertCells(ctx: Context,
+                 cells: List[Tuple[str, PastingDiagram, Optional[str]]]) \
+        -> None:
+    """
+    Adds cells, described as in :func:`opetopy.UnnamedOpetopicSet.addcells`,
+    to context ``ctx`` **in place**, without any check.
+    """
+    for name, pd, target in cells:
+        if target is None:
+            ctx.add(Typing(Variable(name, pd.shapeProof), Type(pd, None)))
+        else:
+            ctx.add(
+                Typing(Variable(name, pd.shapeProof),
+                       Type(pd, ctx[target].variable)))
+
+
+def nerveCells(objects: List[str], morphisms: Dict[str, Tuple[str, str]],
+               identities: Dict[str, str],
+               composition: Dict[Tuple[str, str], str],
+               dim: int,
+               maxNodes: int = 2) \
+        -> Iterator[List[Tuple[str, PastingDiagram, Optional[str]]]]:
+    """
+    Generates the opetopic nerve of a finite category, dimension by dimension,
+    up to dimension ``dim``. The category is given by
+
+    * a list of object names ``objects``;
+    * a ``dict`` ``morphisms`` mapping morphism names to their (source,
+      target) object names;
+    * a ``dict`` ``identities`` mapping every object to its identity
+      morphism;
+    * a composition table ``composition`` mapping every pair :math:`(g, f)` of
+      composable morphisms (i.e. such that the target of :math:`f` is the
+      source of :math:`g`) to :math:`g \\circ f`.
+
+    For every :math:`n`, the :math:`n`-th yielded item is the list of
+    :math:`n`-cells of the nerve, described as in
+    :func:`opetopy.UnnamedOpetopicSet.addcells`. Since there are infinitely
+    many cells as soon as :math:`n \\geq 2`, only the cells whose non
+    degenerate source pasting diagram has at most ``maxNodes`` nodes are
+    generated. A :math:`2`-cell exists if the composite of its source is its
+    target, and a higher cell exists (uniquely) as soon as its source and
+    target are parallel. Cells of dimension :math:`n \\geq 2` are named
+    ``c{n}_{i}``.
+
+    Only the cells of the last two generated dimensions are kept, so that
+    memory stays bounded by the size of two consecutive dimensions (see
+    :func:`opetopy.UnnamedOpetopicSet.nerve` to build the whole nerve).
+    """
+    scope = "Nerve of a category"
+    ctx = Context()
+    seq = Sequent()
+    seq.context = ctx
+    levels = []  # type: List[List[Tuple[str, PastingDiagram, Optional[str]]]]
+    byTarget = {}  # type: Dict[str, List[str]]
+    for n in range(dim + 1):
+        cells = []  # type: List[Tuple[str, PastingDiagram, Optional[str]]]
+        if n == 0:
+            cells = [(x, PastingDiagram.point(), None) for x in objects]
+        elif n == 1:
+            for f, (x, y) in morphisms.items():
+                pd = PastingDiagram.nonDegeneratePastingDiagram(
+                    UnnamedOpetope.ARROW.proof,
+                    {UnnamedOpetope.Address.epsilon(0): x})
+                _checkShift(ctx, pd, y, scope)
+                cells.append((f, pd, y))
+        else:
+            candidates = []  # type: List[Tuple[PastingDiagram, List[str]]]
+            # Degenerate source pasting diagrams
+            for y, _, _ in levels[n - 2]:
+                pd = PastingDiagram.degeneratePastingDiagram(
+                    UnnamedOpetope.Degen(seq[y].shapeProof), y)
+                if n == 2:
+                    if identities.get(y) is None:
+                        raise DerivationError(
+                            scope,
+                            "Object {x} does not have an identity",
+                            x=y)
+                    candidates.append((pd, [identities[y]]))
+                else:
+                    candidates.append((pd, byTarget.get(y, [])))
+            # Non degenerate source pasting diagrams, up to maxNodes nodes
+            seen = set()  # type: Set[frozenset]
+            stack = [
+                PastingDiagramBuilder(seq, x) for x, _, _ in levels[n - 1]
+            ]
+            while len(stack) > 0:
+                b = stack.pop()
+                key = frozenset(b.nodes.items())
+                if key in seen:
+                    continue
+                seen.add(key)
+                if len(b.nodes) < maxNodes:
+                    for l, y in b.leaves.items():
+                        for z in byTarget.get(y, []):
+                            stack.append(b.copy().graft(l, z))
+                pd = b.pastingDiagram()
+                root = pd[UnnamedOpetope.Address.epsilon(n - 1)]
+                if n == 2:
+                    addr = UnnamedOpetope.Address.epsilon(1)
+                    comp = root
+                    while addr + UnnamedOpetope.Address.epsilon(0) in b.nodes:
+                        addr = addr + UnnamedOpetope.Address.epsilon(0)
+                        if (comp, b.nodes[addr]) not in composition:
+                            raise DerivationError(
+                                scope,
+                                "Composite of {g} and {f} is not specified",
+                                g=comp,
+                                f=b.nodes[addr])
+                        comp = composition[(comp, b.nodes[addr])]
+                    candidates.append((pd, [comp]))
+                else:
+                    candidates.append((pd, byTarget.get(ctx.target(root), [])))
+            # Fill
+            for pd, targets in candidates:
+                for x in targets:
+                    try:
+                        _checkShift(ctx, pd, x, scope)
+                    except DerivationError:
+                        if n == 2:
+                            raise
+                        continue
+                    cells.append(("c{n}_{i}".format(n=n, i=len(cells)), pd, x))
+        _insertCells(ctx, cells)
+        if n >= 2:
+            for y, _, _ in levels[n - 2]:
+                ctx.discard(ctx[y])
+            levels[n - 2] = []
+        levels.append(cells)
+        byTarget = {}
+        for x, _, t in cells:
+            if t is not None:
+                byTarget.setdefault(t, []).append(x)
+        yield cells
+
+
+def nerve(objects: List[str], morphisms: Dict[str, Tuple[str, str]],
+          identities: Dict[str, str], composition: Dict[Tuple[str, str], str],
+          dim: int,
+          maxNodes: int = 2) -> Sequent:
+    """
+    Returns a sequent whose context is the opetopic nerve of a finite
+    category, up to dimension ``dim``, and restricted to cells whose non
+    degenerate source pasting diagram has at most ``maxNodes`` nodes. See
+    :func:`opetopy.UnnamedOpetopicSet.nerveCells` for the arguments.
+    """
+    res = Sequent()
+    for cells in nerveCells(objects, morphisms, identities, composition, dim,
+                            maxNodes):
+        _insertCells(res.context, cells)
+    return res
+
+
+def representableCells(shapeProof: UnnamedOpetope.RuleInstance,
+                       name: str = "x",
+                       dim: Optional[int] = None) \
+        -> List[Tuple[str, PastingDiagram, Optional[str]]]:
+    """
+    Returns the cells of the representable opetopic set :math:`O[\\omega]`,
+    where :math:`\\omega` is the opetope derived by proof tree
+    ``shapeProof``, as a list of tuples ``(name, pd, target)`` (see
+    :func:`opetopy.UnnamedOpetopicSet.addcells`), by increasing dimension. If
+    ``dim`` is specified, only the faces of dimension at most ``dim`` are
+    returned.
+
+    The top cell is named ``name``, and every other face is named after the
+    path of source (``s`` followed by an address), degeneracy (``d``) and
+    target (``t``) steps leading to it from the top cell, e.g. ``x.s[].t``.
+    The faces are read from the face poset of the shape (see
+    :meth:`opetopy.UnnamedOpetope.Shape.faces`), which is computed once per
+    shape, from the face posets of its sources and target. Consequently,
+    faces of the same shape share a single registered
+    :class:`opetopy.UnnamedOpetope.Shape`, and the cells are produced in one
+    pass.
+    """
+    faces = UnnamedOpetope.shape(shapeProof).faces()
+    names = [".".join((name, ) + path) for path in faces.paths]
+    res = []  # type: List[Tuple[str, PastingDiagram, Optional[str]]]
+    for i in sorted(range(len(faces)),
+                    key=lambda i: faces.shapes[i].source.dimension):
+        omega = faces.shapes[i]
+        if dim is not None and omega.source.dimension > dim:
+            break
+        d, t = faces.degeneracy[i], faces.target[i]
+        if t is None:
+            res.append((names[i], PastingDiagram.point(), None))
+        elif d is not None:
+            res.append((names[i],
+                        PastingDiagram.degeneratePastingDiagram(
+                            omega.proof, names[d]), names[t]))
+        else:
+            res.append((names[i],
+                        PastingDiagram.nonDegeneratePastingDiagram(
+                            omega.proof,
+                            {a: names[y]
+                             for a, y in faces.sources[i].items()}),
+                        names[t]))
+    return res
+
+
+def representable(shapeProof: UnnamedOpetope.RuleInstance,
+                  name: str = "x",
+                  dim: Optional[int] = None) -> Sequent:
+    """
+    Returns a sequent whose context is the representable opetopic set
+    :math:`O[\\omega]`, where :math:`\\omega` is the opetope derived by proof
+    tree ``shapeProof``, or its faces of dimension at most ``dim`` if
+    specified. See :func:`opetopy.UnnamedOpetopicSet.representableCells` for
+    the arguments.
+    """
+    res = Sequent()
+    _insertCells(res.context, representableCells(shapeProof, name, dim))
     return res
 
 
@@ -847,6 +1462,61 @@ class Shift(RuleInstance):
         return shift(self.proofTree.eval(), self.targetName, self.name)
 
 
+class AddCells(RuleInstance):
+    """
+    A class representing an instance of the :math:`\\texttt{addcells}` rule
+    in a proof tree (see :func:`opetopy.UnnamedOpetopicSet.addcells`).
+    """
+
+    cells: List[Tuple[str, PastingDiagram, Optional[str]]]
+    proofTree: Optional[RuleInstance]
+
+    def __init__(self, p: Optional[RuleInstance],
+                 cells: List[Tuple[str, PastingDiagram, Optional[str]]]) \
+            -> None:
+        self.cells = cells
+        self.proofTree = p
+
+    def __repr__(self) -> str:
+        if self.proofTree is None:
+            prepr = ""
+        else:
+            prepr = repr(self.proofTree)
+        return "AddCells(" + prepr + "," + \
+            ",".join([c[0] for c in self.cells]) + ")"
+
+    def __str__(self) -> str:
+        if self.proofTree is None:
+            pstr = ""
+        else:
+            pstr = str(self.proofTree)
+        return "AddCells(" + pstr + ", " + \
+            ", ".join([c[0] for c in self.cells]) + ")"
+
+    def _toTex(self) -> str:
+        """
+        Converts the proof tree in TeX code. This method should not be called
+        directly, use :meth:`UnnamedOpetopicSet.RuleInstance.toTex`
+        instead.
+        """
+        if self.proofTree is None:
+            ptex = "\\AxiomC{}"
+        else:
+            ptex = self.proofTree._toTex()
+        return ptex + "\n\t\\RightLabel{\\texttt{addcells-$" + \
+            ", ".join([c[0] for c in self.cells]) + \
+            "$}}\n\t\\UnaryInfC{$" + self.eval().toTex() + "$}"
+
+    def eval(self) -> Sequent:
+        """
+        Evaluates the proof tree.
+        """
+        if self.proofTree is None:
+            return addcells(Sequent(), self.cells)
+        else:
+            return addcells(self.proofTree.eval(), self.cells)
+
+
 def pastingDiagram(shapeProof: UnnamedOpetope.RuleInstance,
                    args: Union[Dict[UnnamedOpetope.Address, str], str]) \
         -> PastingDiagram:
@@ -856,7 +1526,7 @@ def pastingDiagram(shapeProof: UnnamedOpetope.RuleInstance,
     :meth:`UnnamedOpetopicSet.PastingDiagram.nonDegeneratePastingDiagram`.
     It calls either depending on the shape opetope.
     """
-    shape = shapeProof.eval().source
+    shape = UnnamedOpetope.shape(shapeProof).source
     if shape.isDegenerate:
         if isinstance(args, str):
             return PastingDiagram.degeneratePastingDiagram(shapeProof, args)
@@ -873,3 +1543,369 @@ def pastingDiagram(shapeProof: UnnamedOpetope.RuleInstance,
                 "Pasting diagram creation",
                 "Second argument is expected to be a address-to-variable-name "
                 "mapping, since shape is non degenerate")
+
+
+class PastingDiagramBuilder:
+    """
+    Incrementally builds a non degenerate pasting diagram over the context of
+    a sequent, starting from a root variable, and grafting variables on leaves
+    one at a time. Every new node is only checked against the node it is
+    grafted on (this is the [Inner] axiom, which also guarantees shape
+    compatibility), so that building a pasting diagram with :math:`k` nodes
+    performs :math:`k` local checks. The leaf decorations needed by the
+    :math:`\\texttt{shift}` rule are maintained along the way (see
+    :meth:`opetopy.UnnamedOpetopicSet.PastingDiagram.leafSources`).
+
+    Example: the following builds the pasting diagram
+    :math:`\\{[] \\leftarrow f, [*] \\leftarrow g\\}` of two composable
+    arrows :math:`f : y \\longrightarrow z` and :math:`g : x
+    \\longrightarrow y`::
+
+      PastingDiagramBuilder(seq, "f").graft(address(['*']), "g")
+
+    """
+
+    leaves: Dict[UnnamedOpetope.Address, str]
+    nodes: Dict[UnnamedOpetope.Address, str]
+    sequent: Sequent
+    shapeProof: UnnamedOpetope.RuleInstance
+
+    def __init__(self, seq: Sequent, root: str) -> None:
+        """
+        Starts a pasting diagram consisting of the single node ``root``.
+        """
+        x = seq[root]
+        addr = UnnamedOpetope.Address.epsilon(x.dimension)
+        self.sequent = seq
+        self.shapeProof = UnnamedOpetope.Shift(x.shapeProof)
+        self.nodes = {addr: root}
+        self.leaves = {}
+        self._addLeaves(addr, root)
+
+    def _addLeaves(self, addr: UnnamedOpetope.Address, name: str) -> None:
+        """
+        Adds the leaves of the node ``name`` grafted at address ``addr``.
+        """
+        src = self.sequent.context[name].type.source
+        if src.nodes is not None:
+            for q, y in src.nodes.items():
+                self.leaves[addr + q] = y
+
+    def copy(self) -> 'PastingDiagramBuilder':
+        """
+        Returns a copy of the builder, that can be extended independently.
+        """
+        res = PastingDiagramBuilder.__new__(PastingDiagramBuilder)
+        res.leaves = dict(self.leaves)
+        res.nodes = dict(self.nodes)
+        res.sequent = self.sequent
+        res.shapeProof = self.shapeProof
+        return res
+
+    def graft(self, addr: UnnamedOpetope.Address,
+              name: str) -> 'PastingDiagramBuilder':
+        """
+        Grafts variable ``name`` on the leaf at address ``addr``, and returns
+        the builder.
+        """
+        if addr not in self.leaves.keys():
+            raise DerivationError(
+                "Pasting diagram builder, graft",
+                "Address {addr} is not a leaf of the pasting diagram",
+                addr=repr(addr))
+        xi = self.sequent.context.target(name)
+        if xi != self.leaves[addr]:
+            raise DerivationError(
+                "Pasting diagram builder, graft",
+                "Pasting diagram doesn't satisfy axiom [Inner]: variable "
+                "{var} has target {xi}, but the leaf {addr} is decorated by "
+                "{should}",
+                var=name,
+                xi=xi,
+                addr=repr(addr),
+                should=self.leaves[addr])
+        self.shapeProof = UnnamedOpetope.Graft(self.shapeProof,
+                                               self.sequent[name].shapeProof,
+                                               addr)
+        self.nodes[addr] = name
+        del self.leaves[addr]
+        self._addLeaves(addr, name)
+        return self
+
+    def pastingDiagram(self) -> PastingDiagram:
+        """
+        Returns the pasting diagram built so far. Its shape is evaluated only
+        once, and shared with every pasting diagram of the same shape.
+        """
+        res = PastingDiagram.nonDegeneratePastingDiagram(
+            self.shapeProof, self.nodes)
+        res.leaves = dict(self.leaves)
+        return res
+
+    def toSequent(self) -> Sequent:
+        """
+        Returns the conclusion of the :math:`\\texttt{graft}` rule applied to
+        the underlying sequent and the pasting diagram built so far, without
+        checking the latter again.
+        """
+        res = self.sequent.copy()
+        res.pastingDiagram = self.pastingDiagram()
+        return res
+
+
+def pastingDiagrams(seq: Sequent, dim: int,
+                    maxNodes: int = 2) -> Iterator[PastingDiagram]:
+    """
+    Lazily generates all the non degenerate pasting diagrams of
+    :math:`n`-cells (where :math:`n` is ``dim``) of the context of sequent
+    ``seq`` having at most ``maxNodes`` nodes, each exactly once. They are
+    built with :class:`opetopy.UnnamedOpetopicSet.PastingDiagramBuilder`,
+    grafting on every leaf the cells whose target decorates it, as given by
+    the incidence index of the context.
+    """
+    ctx = seq.context
+    seen = set()  # type: Set[FrozenSet[Tuple[UnnamedOpetope.Address, str]]]
+    for root in ctx.variableNames():
+        if seq[root].dimension != dim:
+            continue
+        stack = [PastingDiagramBuilder(seq, root)]
+        while len(stack) > 0:
+            b = stack.pop()
+            key = frozenset(b.nodes.items())
+            if key in seen:
+                continue
+            seen.add(key)
+            if len(b.nodes) < maxNodes:
+                for l in sorted(b.leaves.keys(), reverse=True):
+                    for z in sorted(
+                        [c for c, a in ctx.cofaces(b.leaves[l]) if a is None],
+                            reverse=True):
+                        stack.append(b.copy().graft(l, z))
+            yield b.pastingDiagram()
+
+
+def matchPastingDiagrams(
+        seq: Sequent,
+        shapeProof: UnnamedOpetope.RuleInstance) -> Iterator[PastingDiagram]:
+    """
+    Lazily generates all the pasting diagrams of the context of sequent
+    ``seq`` whose shape is derived by proof tree ``shapeProof``, each exactly
+    once. The nodes are assigned by backtracking, in lexicographical order of
+    addresses, so that the parent of a node is always assigned first. The
+    root is chosen among the variables of the expected shape (see
+    :meth:`opetopy.UnnamedOpetopicSet.Context.cellsOfShape`), and every other
+    node among the variables whose target decorates the corresponding edge of
+    its parent (see :meth:`opetopy.UnnamedOpetopicSet.Context.cofaces`), and
+    having the expected shape, so that axiom [Inner] holds by construction.
+    """
+    ctx = seq.context
+    omega = UnnamedOpetope.shape(shapeProof)
+    if omega.degeneracyId is not None:
+        for y in sorted(ctx.cellsOfShape(omega.degeneracyId)):
+            yield PastingDiagram.degeneratePastingDiagram(omega.proof, y)
+        return
+    addrs = sorted(omega.source.nodes.keys())
+    nodes = {}  # type: Dict[UnnamedOpetope.Address, str]
+
+    def match(i: int) -> Iterator[PastingDiagram]:
+        if i == len(addrs):
+            yield PastingDiagram.nonDegeneratePastingDiagram(
+                omega.proof, nodes)
+            return
+        addr = addrs[i]
+        sid = omega.sourceIds[addr]
+        if i == 0:
+            candidates = ctx.cellsOfShape(sid)
+        else:
+            p, q = addr.edgeDecomposition()
+            candidates = frozenset(
+                c for c, a in ctx.cofaces(ctx.source(nodes[p], q))
+                if a is None and ctx[c].variable.sharedShape.id == sid)
+        for x in sorted(candidates):
+            nodes[addr] = x
+            yield from match(i + 1)
+        nodes.pop(addr, None)
+
+    yield from match(0)
+
+
+def _faces(ctx: Context, name: str) -> List[str]:
+    """
+    Returns the names of the faces (sources, degeneracy and target) of the
+    variable whose name is ``name``.
+    """
+    type = ctx[name].type
+    res = list(type.source.key()[1])
+    if type.target is not None:
+        res.append(type.target.name)
+    return res
+
+
+def morphisms(X: Sequent, Y: Sequent) -> Iterator[Dict[str, str]]:
+    """
+    Lazily generates all the morphisms from the opetopic set given by the
+    context of sequent ``X`` to that of sequent ``Y``, as ``dict`` mapping
+    variable names of ``X`` to variable names of ``Y``. A morphism maps every
+    variable to a variable of the same shape, and commutes with sources,
+    degeneracies and targets.
+
+    The variables of ``X`` are assigned by backtracking, every variable right
+    after its faces. Only points are chosen freely: once the faces of a
+    variable are assigned, the source pasting diagram and the target of its
+    image are known, so the candidates are the variables of ``Y`` having that
+    source (found with one lookup in the source index of the context of
+    ``Y``) and that target.
+    """
+    ctxX = X.context
+    ctxY = Y.context
+    # Order the variables of X so that each comes right after its faces
+    order = []  # type: List[str]
+    placed = set()  # type: Set[str]
+    for root in ctxX.variableNames():
+        stack = [(root, False)]
+        while len(stack) > 0:
+            x, expanded = stack.pop()
+            if x in placed:
+                continue
+            elif expanded:
+                placed.add(x)
+                order.append(x)
+            else:
+                stack.append((x, True))
+                stack += [(y, False) for y in reversed(_faces(ctxX, x))]
+    if len(order) == 0:
+        yield {}
+        return
+    points = sorted(ctxY.cellsOfShape(UnnamedOpetope.POINT.id))
+    res = {}  # type: Dict[str, str]
+
+    def candidates(x: str) -> List[str]:
+        type = ctxX[x].type
+        if type.target is None:
+            return points
+        sid, names = type.source.key()
+        target = res[type.target.name]
+        cells = ctxY.cellsWithSourceKey((sid, tuple(res[y] for y in names)))
+        return sorted(c for c in cells if ctxY.target(c) == target)
+
+    iterators = [iter(candidates(order[0]))]
+    while len(iterators) > 0:
+        x = order[len(iterators) - 1]
+        y = next(iterators[-1], None)
+        if y is None:
+            res.pop(x, None)
+            iterators.pop()
+        elif len(iterators) == len(order):
+            res[x] = y
+            yield dict(res)
+        else:
+            res[x] = y
+            iterators.append(iter(candidates(order[len(iterators)])))
+
+
+def countMorphisms(X: Sequent, Y: Sequent) -> int:
+    """
+    Returns the number of morphisms from the opetopic set given by the
+    context of sequent ``X`` to that of sequent ``Y`` (see
+    :func:`opetopy.UnnamedOpetopicSet.morphisms`).
+    """
+    return sum(1 for _ in morphisms(X, Y))
+
+
+def morphismExists(X: Sequent, Y: Sequent) -> bool:
+    """
+    Tells wether there is a morphism from the opetopic set given by the
+    context of sequent ``X`` to that of sequent ``Y`` (see
+    :func:`opetopy.UnnamedOpetopicSet.morphisms`). The search stops at the
+    first morphism found.
+    """
+    return next(morphisms(X, Y), None) is not None
+
+
+def canonicalForm(seq: Sequent) -> Tuple[Any, Dict[str, int]]:
+    """
+    Computes a canonical labelling of the opetopic set given by the context
+    of sequent ``seq`` (see :func:`opetopy.common.canonicalLabelling`).
+    Returns a tuple consisting of a hashable certificate, and of a ``dict``
+    mapping variable names to their label. Two sequents have the same
+    certificate if and only if their contexts are isomorphic opetopic sets,
+    by an isomorphism preserving the universality index and the pasting
+    diagram of the sequents.
+
+    A variable is initially coloured by its shape, its universality flags,
+    and its addresses in the pasting diagram of the sequent, and colours are
+    then refined along the faces and cofaces of variables. The certificate
+    lists, for every label, the initial colour of the variable and the labels
+    of its faces. Since shapes are identified by their id (see
+    :class:`opetopy.UnnamedOpetope.Shape`), certificates should only be
+    compared within the same process.
+    """
+    ctx = seq.context
+    names = ctx.variableNames()
+    faces = {x: _faces(ctx, x) for x in names}
+    cofaces = {x: [] for x in names}  # type: Dict[str, List[Tuple[str, int]]]
+    for x in names:
+        for i, y in enumerate(faces[x]):
+            cofaces[y].append((x, i))
+    roles = {}  # type: Dict[str, List[str]]
+    if seq.pastingDiagram is not None:
+        if seq.pastingDiagram.nodes is not None:
+            for a, y in seq.pastingDiagram.nodes.items():
+                roles.setdefault(y, []).append(str(a))
+        else:
+            roles[seq.pastingDiagram.degeneracyVariable()] = ["_"]
+    colours = {
+        x: (ctx[x].variable.sharedShape.id, x in seq.targetUniversal,
+            tuple(sorted(str(a) for a in seq.sourceUniversal.get(x, ()))),
+            tuple(sorted(roles.get(x, []))))
+        for x in names
+    }  # type: Dict[str, Tuple[int, bool, Tuple[str, ...], Tuple[str, ...]]]
+
+    def signature(c: Dict[str, int], x: str) -> Any:
+        return (tuple(c[y] for y in faces[x]),
+                tuple(sorted((c[z], i) for z, i in cofaces[x])))
+
+    def neighbours(x: str) -> List[str]:
+        return faces[x] + [z for z, i in cofaces[x]]
+
+    def certificate(l: Dict[str, int]) -> Any:
+        return tuple(
+            sorted((l[x], colours[x], tuple(l[y] for y in faces[x]))
+                   for x in names))
+
+    return canonicalLabelling(names, colours.__getitem__, signature,
+                              neighbours, certificate)
+
+
+def certificate(seq: Sequent) -> Any:
+    """
+    Returns the certificate of the canonical form of sequent ``seq`` (see
+    :func:`opetopy.UnnamedOpetopicSet.canonicalForm`). It is hashable, so
+    that sequents can be deduplicated up to isomorphism with a ``set`` or a
+    ``dict``.
+    """
+    return canonicalForm(seq)[0]
+
+
+def isomorphism(X: Sequent, Y: Sequent) -> Optional[Dict[str, str]]:
+    """
+    Returns an isomorphism between the opetopic sets given by the contexts of
+    sequents ``X`` and ``Y``, as a ``dict`` mapping variable names of ``X``
+    to variable names of ``Y``, or ``None`` if they are not isomorphic (see
+    :func:`opetopy.UnnamedOpetopicSet.canonicalForm`).
+    """
+    certX, labelsX = canonicalForm(X)
+    certY, labelsY = canonicalForm(Y)
+    if certX != certY:
+        return None
+    names = {l: y for y, l in labelsY.items()}
+    return {x: names[l] for x, l in labelsX.items()}
+
+
+def isomorphic(X: Sequent, Y: Sequent) -> bool:
+    """
+    Tells wether the opetopic sets given by the contexts of sequents ``X``
+    and ``Y`` are isomorphic (see
+    :func:`opetopy.UnnamedOpetopicSet.canonicalForm`).
+    """
+    return certificate(X) == certificate(Y)
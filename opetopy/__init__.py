@@ -4,6 +4,7 @@
 # from . import NamedOpetope
 # from . import NamedOpetopicSet
 # from . import NamedOpetopicSetM
+# from . import Translation
 # from . import UnnamedOpetope
 # from . import UnnamedOpetopicCategory
 # from . import UnnamedOpetopicSet
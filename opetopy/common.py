@@ -7,7 +7,12 @@
 
 """
 
-from typing import Any
+from typing import (AbstractSet, Any, Callable, Dict, Generic, Hashable,
+                    Iterable, Iterator, List, Mapping, Optional, Set, Tuple,
+                    TypeVar)
+
+_V = TypeVar('_V', bound=Hashable)
+_W = TypeVar('_W')
 
 
 class AbstractRuleInstance:
@@ -43,3 +48,512 @@ class DerivationError(Exception):
 
     def __str__(self):
         return "[{scope}] {msg}".format(scope=self.scope, msg=self.message)
+
+
+class PersistentDict(Mapping[_V, _W]):
+    """
+    An immutable mapping, implemented as a hash trie whose nodes are ``dict``
+    indexed by :math:`5` bits of the hash of the keys. Updates
+    (:meth:`opetopy.common.PersistentDict.set` and
+    :meth:`opetopy.common.PersistentDict.remove`) return a new mapping, that
+    only copies the nodes on the path to the updated key, and shares all the
+    others with the original mapping. Keeping several versions of a mapping
+    thus costs no more than the changes between them.
+
+    In a node, a key is stored as a leaf ``(hash, key, value)``, and keys whose
+    hashes are equal are stored in a ``list`` of such leaves. Being a
+    ``Mapping``, it compares equal to a ``dict`` with the same items.
+    """
+
+    _root: Dict[int, Any]
+    _size: int
+
+    def __contains__(self, key: object) -> bool:
+        return self._lookup(key) is not None
+
+    def __getitem__(self, key: _V) -> _W:
+        leaf = self._lookup(key)
+        if leaf is None:
+            raise KeyError(key)
+        return leaf[2]
+
+    def __init__(self) -> None:
+        self._root = {}
+        self._size = 0
+
+    def __iter__(self) -> Iterator[_V]:
+        for leaf in self._leaves():
+            yield leaf[1]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _lookup(self, key: object) -> Optional[Tuple[int, _V, _W]]:
+        """
+        Returns the leaf of key ``key``, or ``None`` if it is not in the
+        mapping.
+        """
+        h = hash(key) & _HASH_MASK
+        node = self._root  # type: Any
+        shift = 0
+        while True:
+            node = node.get((h >> shift) & 31)
+            if node is None:
+                return None
+            elif isinstance(node, tuple):
+                return node if _sameKey(node, h, key) else None
+            elif isinstance(node, list):
+                for leaf in node:
+                    if _sameKey(leaf, h, key):
+                        return leaf
+                return None
+            shift += 5
+
+    def get(self, key: _V, default: Any = None) -> Any:
+        """
+        Returns the value of key ``key``, or ``default`` if it is not in the
+        mapping.
+        """
+        leaf = self._lookup(key)
+        return default if leaf is None else leaf[2]
+
+    def _leaves(self) -> Iterator[Tuple[int, _V, _W]]:
+        """
+        Iterates over the leaves of the trie.
+        """
+        todo = [self._root]  # type: List[Any]
+        while len(todo) > 0:
+            for e in todo.pop().values():
+                if isinstance(e, tuple):
+                    yield e
+                elif isinstance(e, list):
+                    yield from e
+                else:
+                    todo.append(e)
+
+    def remove(self, key: _V) -> 'PersistentDict[_V, _W]':
+        """
+        Returns a mapping without key ``key``, that must be in the mapping.
+        """
+        h = hash(key) & _HASH_MASK
+
+        def rec(node: Dict[int, Any], shift: int) -> Dict[int, Any]:
+            i = (h >> shift) & 31
+            e = node[i]
+            res = dict(node)
+            if isinstance(e, tuple):
+                if not _sameKey(e, h, key):
+                    raise KeyError(key)
+                del res[i]
+            elif isinstance(e, list):
+                lst = [leaf for leaf in e if not _sameKey(leaf, h, key)]
+                if len(lst) == len(e):
+                    raise KeyError(key)
+                res[i] = lst[0] if len(lst) == 1 else lst
+            else:
+                child = rec(e, shift + 5)
+                if len(child) == 0:
+                    del res[i]
+                elif len(child) == 1 and \
+                        not isinstance(next(iter(child.values())), dict):
+                    # A lone leaf or list of leaves is pulled up
+                    res[i] = next(iter(child.values()))
+                else:
+                    res[i] = child
+            return res
+
+        try:
+            root = rec(self._root, 0)
+        except KeyError:
+            raise KeyError(key)
+        res = PersistentDict()  # type: PersistentDict[_V, _W]
+        res._root = root
+        res._size = self._size - 1
+        return res
+
+    def set(self, key: _V, value: _W) -> 'PersistentDict[_V, _W]':
+        """
+        Returns a mapping where key ``key`` has value ``value``, and that
+        otherwise coincides with this one.
+        """
+        new = (hash(key) & _HASH_MASK, key, value)
+        added = True
+
+        def merge(a: Any, b: Any, shift: int) -> Dict[int, Any]:
+            # Makes a node containing two entries (leaves or lists of leaves)
+            # of different hashes
+            ha = a[0] if isinstance(a, tuple) else a[0][0]
+            hb = b[0] if isinstance(b, tuple) else b[0][0]
+            ia, ib = (ha >> shift) & 31, (hb >> shift) & 31
+            if ia == ib:
+                return {ia: merge(a, b, shift + 5)}
+            return {ia: a, ib: b}
+
+        def rec(node: Dict[int, Any], shift: int) -> Dict[int, Any]:
+            nonlocal added
+            i = (new[0] >> shift) & 31
+            e = node.get(i)
+            res = dict(node)
+            if e is None:
+                res[i] = new
+            elif isinstance(e, tuple):
+                if _sameKey(e, new[0], key):
+                    added = False
+                    res[i] = new
+                elif e[0] == new[0]:
+                    res[i] = [e, new]
+                else:
+                    res[i] = merge(e, new, shift + 5)
+            elif isinstance(e, list):
+                if e[0][0] == new[0]:
+                    lst = [
+                        leaf for leaf in e if not _sameKey(leaf, new[0], key)
+                    ]
+                    added = len(lst) == len(e)
+                    res[i] = lst + [new]
+                else:
+                    res[i] = merge(e, new, shift + 5)
+            else:
+                res[i] = rec(e, shift + 5)
+            return res
+
+        res = PersistentDict()  # type: PersistentDict[_V, _W]
+        res._root = rec(self._root, 0)
+        res._size = self._size + (1 if added else 0)
+        return res
+
+
+class PersistentSet(AbstractSet[_V]):
+    """
+    An immutable set, implemented as a :class:`opetopy.common.PersistentDict`
+    whose values are ignored: :meth:`opetopy.common.PersistentSet.insert` and
+    :meth:`opetopy.common.PersistentSet.remove` return a new set sharing most
+    of its structure with the original one.
+    """
+
+    _items: PersistentDict[_V, bool]
+
+    def __contains__(self, elem: object) -> bool:
+        return elem in self._items
+
+    def __init__(self, elems: Iterable[_V] = ()) -> None:
+        self._items = PersistentDict()
+        for e in elems:
+            self._items = self._items.set(e, True)
+
+    def __iter__(self) -> Iterator[_V]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __repr__(self) -> str:
+        return "PersistentSet({elems})".format(elems=set(self))
+
+    def insert(self, elem: _V) -> 'PersistentSet[_V]':
+        """
+        Returns a set containing ``elem`` and the elements of this one.
+        """
+        if elem in self._items:
+            return self
+        res = PersistentSet()  # type: PersistentSet[_V]
+        res._items = self._items.set(elem, True)
+        return res
+
+    def remove(self, elem: _V) -> 'PersistentSet[_V]':
+        """
+        Returns a set containing the elements of this one but ``elem``, that
+        must be in this one.
+        """
+        res = PersistentSet()  # type: PersistentSet[_V]
+        res._items = self._items.remove(elem)
+        return res
+
+
+_HASH_MASK = (1 << 64) - 1
+"""
+Mask applied to hashes in :class:`opetopy.common.PersistentDict`, so that
+they are non negative.
+"""
+
+
+def _sameKey(leaf: Tuple[int, Any, Any], h: int, key: Any) -> bool:
+    """
+    Tells whether the leaf ``leaf`` of a
+    :class:`opetopy.common.PersistentDict` is that of key ``key``, of masked
+    hash ``h``. As in a ``dict``, keys are only compared if their hashes are
+    equal, so that keys of different types need not be comparable.
+    """
+    return leaf[0] == h and (leaf[1] is key or leaf[1] == key)
+
+
+def _split(colours: Dict[_V, int], cells: Dict[int, List[_V]], c: int,
+           work: Set[int], signature: Callable[[Dict[_V, int], _V], Any],
+           affected: Optional[Set[_V]] = None) -> None:
+    """
+    Splits **in place** the cell of colour ``c`` of the colouring
+    ``colours``, whose cells (the lists of the vertices of each colour) are
+    ``cells``. The colour of a vertex is the position of its cell in the
+    ordered partition, so the new cells are ordered, and the first one keeps
+    colour ``c``. If ``affected`` is given, only the signatures of the
+    vertices of ``affected`` are computed, and the other vertices come first.
+    Otherwise, the cell is split by the signatures of all its vertices.
+
+    The new cells whose vertices have to be processed by
+    :func:`opetopy.common._refine` are added to ``work``: all of them if the
+    cell was already in ``work``, and all but a largest one otherwise.
+    """
+    parts = {}  # type: Dict[Any, List[_V]]
+    if affected is None:
+        changed = cells[c]
+    else:
+        changed = [v for v in cells[c] if v in affected]
+        if len(changed) < len(cells[c]):
+            parts[(0, )] = [v for v in cells[c] if v not in affected]
+    for v in changed:
+        parts.setdefault((1, signature(colours, v)), []).append(v)
+    if len(parts) == 1:
+        return
+    keys = sorted(parts.keys())
+    largest = max(range(len(keys)), key=lambda i: len(parts[keys[i]]))
+    queued = c in work
+    for i, k in enumerate(keys):
+        cells[c] = parts[k]
+        for v in parts[k]:
+            colours[v] = c
+        if queued or i != largest:
+            work.add(c)
+        c += len(parts[k])
+
+
+def _refine(colours: Dict[_V, int], cells: Dict[int, List[_V]],
+            work: Set[int], signature: Callable[[Dict[_V, int], _V], Any],
+            neighbours: Callable[[_V], Iterable[_V]]) -> None:
+    """
+    Refines **in place** the colouring ``colours`` (see
+    :func:`opetopy.common._split`), until vertices of the same colour have
+    the same signature. Refinement is incremental: ``work`` is the set of the
+    colours of the cells whose vertices changed colour, and only the cells of
+    their neighbours are split again, separating the neighbours from the
+    rest of their cell. Cells are processed by increasing colour, so that the
+    result only depends on the colouring and the signature and neighbour
+    functions, and not on the vertices themselves.
+    """
+    while len(work) > 0:
+        s = min(work)
+        work.remove(s)
+        affected = {}  # type: Dict[int, Set[_V]]
+        for v in cells[s]:
+            for u in neighbours(v):
+                affected.setdefault(colours[u], set()).add(u)
+        for c in sorted(affected.keys()):
+            if len(cells[c]) > 1:
+                _split(colours, cells, c, work, signature, affected[c])
+
+
+def _match(first: Dict[int, List[_V]],
+           cells: Dict[int, List[_V]]) -> Optional[Dict[_V, _V]]:
+    """
+    Returns a permutation of the vertices mapping every singleton cell of
+    ``first`` to the cell of the same colour of ``cells``, and completed by
+    closing its chains into cycles, as a ``dict`` restricted to its non fixed
+    points. Returns ``None`` if the cells of the two partitions do not have
+    the same sizes.
+    """
+    if len(first) != len(cells):
+        return None
+    res = {}  # type: Dict[_V, _V]
+    for c, cell in first.items():
+        other = cells.get(c)
+        if other is None or len(other) != len(cell):
+            return None
+        elif len(cell) == 1 and cell[0] != other[0]:
+            res[cell[0]] = other[0]
+    inverse = {w: v for v, w in res.items()}
+    for w in inverse.keys():
+        if w not in res:
+            v = inverse[w]
+            while v in inverse:
+                v = inverse[v]
+            res[w] = v
+    return res
+
+
+class _SearchNode(Generic[_V]):
+    """
+    A node of the search tree of :func:`opetopy.common.canonicalLabelling`.
+    Its orbits are those of its target cell under the automorphisms that fix
+    its prefix, as a union-find structure, and ``first`` is the refined
+    partition of its first child.
+    """
+
+    cell: List[_V]
+    cells: Dict[int, List[_V]]
+    colours: Dict[_V, int]
+    explored: List[_V]
+    first: Optional[Dict[int, List[_V]]]
+    fixed: Set[_V]
+    orbits: Dict[_V, _V]
+    prefix: List[_V]
+    seen: int
+
+    def __init__(self, prefix: List[_V], colours: Dict[_V, int],
+                 cells: Dict[int, List[_V]], cell: List[_V]) -> None:
+        self.cell = cell
+        self.cells = cells
+        self.colours = colours
+        self.explored = []
+        self.first = None
+        self.fixed = set(prefix)
+        self.orbits = {}
+        self.prefix = prefix
+        self.seen = 0
+
+    def find(self, v: _V) -> _V:
+        """
+        Returns the representative of the orbit of ``v``.
+        """
+        while self.orbits.get(v, v) != v:
+            self.orbits[v] = self.orbits.get(self.orbits[v], self.orbits[v])
+            v = self.orbits[v]
+        return v
+
+    def next(self, automorphisms: List[Dict[_V, _V]]) -> Optional[_V]:
+        """
+        Returns the first vertex of the target cell whose orbit has not been
+        explored yet, or ``None`` if there is none. The automorphisms found
+        since the last call, given by their non fixed points, are merged into
+        the orbits if they fix the prefix.
+        """
+        if len(self.explored) == 0:
+            return self.cell[0]
+        for g in automorphisms[self.seen:]:
+            if g.keys().isdisjoint(self.fixed):
+                for v, w in g.items():
+                    self.orbits[self.find(v)] = self.find(w)
+        self.seen = len(automorphisms)
+        explored = {self.find(u) for u in self.explored}
+        for v in self.cell:
+            if self.find(v) not in explored:
+                return v
+        return None
+
+
+def canonicalLabelling(vertices: List[_V], invariant: Callable[[_V], Any],
+                       signature: Callable[[Dict[_V, int], _V], Any],
+                       neighbours: Callable[[_V], Iterable[_V]],
+                       certificate: Callable[[Dict[_V, int]], Any]) \
+        -> Tuple[Any, Dict[_V, int]]:
+    """
+    Computes a canonical labelling of a structure whose elements are
+    ``vertices``, by individualisation and refinement. The structure is
+    described by four functions, that must be invariant under isomorphism:
+
+    * ``invariant`` maps a vertex to its initial colour;
+    * ``signature`` maps a colouring and a vertex to the data used to refine
+      the colour of the vertex (typically, the colours of its neighbours);
+    * ``neighbours`` maps a vertex to the vertices whose signature depends on
+      its colour;
+    * ``certificate`` maps a labelling (a bijection from the vertices to
+      :math:`\\{0, \\ldots, n-1\\}`) to the relabelled structure.
+
+    Returns a tuple consisting of the smallest certificate over the search
+    tree, and of a labelling realising it. Two isomorphic structures have the
+    same certificate, so isomorphism tests amount to comparing (or hashing)
+    certificates. Refinement only processes the cells that changed (see
+    :func:`opetopy.common._refine`), so individualising a vertex only costs
+    the neighbourhoods it affects.
+
+    Whenever two leaves of the search tree have the same certificate, the
+    automorphism they induce is recorded, and used to prune the branches it
+    maps onto explored ones. The search then backjumps to the node where the
+    current path leaves the path of the best leaf. Before searching below a
+    vertex, the permutation matching the first child of the node with the new
+    one (see :func:`opetopy.common._match`) is tried, so that automorphisms
+    exchanging twins, or isomorphic components, are found without reaching a
+    leaf. Automorphisms are kept restricted to the vertices they move, and
+    every node merges each of them into its orbits only once.
+    """
+    inv = {v: invariant(v) for v in vertices}
+    parts = {}  # type: Dict[Any, List[_V]]
+    for v in vertices:
+        parts.setdefault(inv[v], []).append(v)
+    colours = {}  # type: Dict[_V, int]
+    cells = {}  # type: Dict[int, List[_V]]
+    for k in sorted(parts.keys()):
+        c = len(colours)
+        cells[c] = parts[k]
+        for v in parts[k]:
+            colours[v] = c
+    best = None  # type: Any
+    bestLabels = {}  # type: Dict[_V, int]
+    bestInverse = {}  # type: Dict[int, _V]
+    bestPath = []  # type: List[_V]
+    # Automorphisms, restricted to the vertices they do not fix
+    automorphisms = []  # type: List[Dict[_V, _V]]
+    stack = []  # type: List[_SearchNode[_V]]
+
+    def visit(colours: Dict[_V, int], cells: Dict[int, List[_V]],
+              prefix: List[_V], c: int) -> None:
+        nonlocal best, bestLabels, bestInverse, bestPath
+        # The target cell is the first non singleton one, and cells before
+        # colour c are singletons
+        while c < len(vertices) and len(cells[c]) == 1:
+            c += 1
+        if c < len(vertices):
+            stack.append(_SearchNode(prefix, colours, cells, cells[c]))
+            return
+        cert = certificate(colours)
+        if best is None or cert < best:
+            best, bestLabels = cert, colours
+            bestInverse = {i: v for v, i in colours.items()}
+            bestPath = prefix
+        elif cert == best:
+            gamma = {v: bestInverse[colours[v]] for v in vertices}
+            gamma = {v: w for v, w in gamma.items() if v != w}
+            if len(gamma) > 0:
+                automorphisms.append(gamma)
+            # The rest of the branch is the image of explored ones by gamma,
+            # so backjump to where the current path leaves the best one
+            d = 0
+            while d < min(len(prefix), len(bestPath)) and \
+                    prefix[d] == bestPath[d]:
+                d += 1
+            while len(stack) > 0 and len(stack[-1].prefix) > d:
+                stack.pop()
+
+    work = set(cells.keys())
+    for c in sorted(cells.keys()):
+        _split(colours, cells, c, work, signature)
+    _refine(colours, cells, work, signature, neighbours)
+    visit(colours, cells, [], 0)
+    while len(stack) > 0:
+        node = stack[-1]
+        w = node.next(automorphisms)
+        if w is None:
+            stack.pop()
+            continue
+        node.explored.append(w)
+        # Individualising w: it keeps the colour of its cell, and the rest of
+        # the cell gets the next one
+        c = node.colours[w]
+        colours = dict(node.colours)
+        cells = dict(node.cells)
+        cells[c] = [w]
+        cells[c + 1] = [u for u in node.cell if u != w]
+        for u in cells[c + 1]:
+            colours[u] = c + 1
+        _refine(colours, cells, {c}, signature, neighbours)
+        if node.first is None:
+            node.first = cells
+        else:
+            # Before searching below w, try the permutation matching the
+            # singletons of the first child with those of this one
+            gamma = _match(node.first, cells)
+            if gamma is not None and certificate(
+                    {v: bestLabels[gamma.get(v, v)]
+                     for v in vertices}) == best:
+                automorphisms.append(gamma)
+                continue
+        visit(colours, cells, node.prefix + [w], c)
+    return best, bestLabels
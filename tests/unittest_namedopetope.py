@@ -1,3 +1,6 @@
+from copy import copy, deepcopy
+import gc
+import pickle
 import unittest
 
 import sys
@@ -30,6 +33,18 @@ class Test_NamedOpetope_Variable(unittest.TestCase):
             NamedOpetope.Variable("x", -1)
         NamedOpetope.Variable("x", 0)
 
+    def test___new__(self):
+        self.assertIs(NamedOpetope.Variable("a", 0), self.a0)
+        self.assertIs(NamedOpetope.Variable("a", 1), self.a1)
+        self.assertIsNot(self.a0, self.a1)
+        self.assertIs(copy(self.a0), self.a0)
+        self.assertIs(deepcopy(self.a0), self.a0)
+        self.assertIs(pickle.loads(pickle.dumps(self.c1)), self.c1)
+        table = NamedOpetope.Variable._table
+        NamedOpetope.Variable("unused", 3)
+        gc.collect()
+        self.assertNotIn(("unused", 3), table)
+
 
 class Test_NamedOpetope_Term(unittest.TestCase):
 
@@ -176,6 +191,23 @@ class Test_NamedOpetope_Type(unittest.TestCase):
         with self.assertRaises(DerivationError):
             NamedOpetope.Type([])
 
+    def test_cons(self):
+        t = NamedOpetope.Type.cons(NamedOpetope.Term(self.alpha), self.t2)
+        self.assertEqual(t.dimension, 3)
+        self.assertIs(t.tail, self.t2)
+        self.assertEqual(t.terms, self.t3.terms)
+        with self.assertRaises(DerivationError):
+            NamedOpetope.Type.cons(NamedOpetope.Term(self.alpha), self.t1)
+
+    def test_suffix(self):
+        self.assertIs(self.t3.suffix(0), self.t3)
+        self.assertEqual(self.t3.suffix(1).terms, self.t2.terms)
+        self.assertEqual(self.t3.suffix(2).terms, self.t1.terms)
+        self.assertEqual(self.t3.suffix(3).terms, self.t0.terms)
+        self.assertIs(self.t3.suffix(2), self.t3.tail.tail)
+        with self.assertRaises(DerivationError):
+            self.t3.suffix(4)
+
     def test_variables(self):
         self.assertEqual(self.t3.variables(0), {self.a})
         self.assertEqual(self.t3.variables(1), {self.f})
@@ -269,6 +301,29 @@ class Test_NamedOpetope_Context(unittest.TestCase):
         self.assertNotIn(self.term4.variable, self.ctx4)
         self.assertIn(self.term4.variable, self.ctx5)
 
+    def test___getitem__(self):
+        self.assertEqual(self.ctx5["a"], NamedOpetope.Variable("a", 0))
+        self.assertEqual(self.ctx5["A"], NamedOpetope.Variable("A", 3))
+        with self.assertRaises(DerivationError):
+            self.ctx4["A"]
+
+    def test___or__(self):
+        ctx = NamedOpetope.Context() + NamedOpetope.Typing(
+            NamedOpetope.Term(NamedOpetope.Variable("b", 0)), self.typing1)
+        union = self.ctx3 | ctx
+        self.assertEqual(len(union), 3)
+        self.assertIn(NamedOpetope.Variable("b", 0), union)
+        self.assertIn(self.term2.variable, union)
+        self.assertNotIn(NamedOpetope.Variable("b", 0), self.ctx3)
+        self.assertEqual(len(self.ctx3 | self.ctx5), 4)
+
+    def test_copy(self):
+        ctx = self.ctx2.copy()
+        ctx.add(NamedOpetope.Typing(self.term2, self.typing2))
+        self.assertIn(self.term2.variable, ctx)
+        self.assertNotIn(self.term2.variable, self.ctx2)
+        self.assertEqual(len(self.ctx2), 1)
+
     def test_source(self):
         with self.assertRaises(DerivationError):
             self.ctx5.source(NamedOpetope.Variable("A", 3), -1)
@@ -336,6 +391,7 @@ class Test_NamedOpetope_EquationalTheory(unittest.TestCase):
 
     def test___or__(self):
         self.assertFalse((self.th1 | self.th1).equal(self.a0, self.b0))
+        self.assertEqual(len((self.th4 | self.th2).classes), 2)
         self.assertFalse((self.th1 | self.th2).equal(self.a0, self.c0))
         self.assertTrue((self.th2 | self.th2).equal(self.a0, self.b0))
         self.assertTrue(
@@ -406,7 +462,16 @@ class Test_NamedOpetope_EquationalTheory(unittest.TestCase):
                               self.e0}))
         self.assertEqual(self.th6.classOf(self.a1), set({self.a1}))
 
+    def test_copy(self):
+        th = self.th3.copy()
+        th._merge(self.a0, self.c0)
+        self.assertTrue(th.equal(self.b0, self.d0))
+        self.assertFalse(self.th3.equal(self.b0, self.d0))
+        self.assertEqual(len(self.th3.classes), 2)
+        self.assertEqual(self.th3.classOf(self.a0), {self.a0, self.b0})
+
     def test_equal(self):
+        self.assertTrue(self.th1.equal(self.a0, self.a0))
         self.assertTrue(self.th2.equal(self.a0, self.b0))
         self.assertTrue(self.th2.equal(self.b0, self.a0))
         self.assertFalse(self.th2.equal(self.a0, self.a1))
@@ -579,6 +644,16 @@ class Test_NamedOpetope_Sequent(unittest.TestCase):
         res = self.sequent.substitute(
             self.fgh1, NamedOpetope.Term(self.b1, True), self.f)
         self.assertTrue(self.sequent.equal(res[0], self.gh))
+        # Degenerate substitution at the root, whose target is implicit
+        res = self.sequent.substitute(
+            self.fgh1, NamedOpetope.Term(self.c2, True), self.h)
+        self.assertTrue(self.sequent.equal(res[0], self.fg))
+        self.assertIs(res[1], None)
+        res = self.sequent.substitute(
+            NamedOpetope.Term(self.f), NamedOpetope.Term(self.a2, True),
+            self.f)
+        self.assertEqual(res[0], NamedOpetope.Term(self.a2, True))
+        self.assertIs(res[1], None)
 
 
 class Test_NamedOpetope_InferenceRules(unittest.TestCase):
@@ -605,11 +680,117 @@ class Test_NamedOpetope_InferenceRules(unittest.TestCase):
         with self.assertRaises(DerivationError):
             NamedOpetope.degen(s)
 
+    def test_canonicalForm(self):
+        def classic(names):
+            a, b, c, f, g, h, i, alpha, beta, A = names
+            Graft, Point, Shift = \
+                NamedOpetope.Graft, NamedOpetope.Point, NamedOpetope.Shift
+            beta = Shift(
+                Graft(Shift(Point(c), h), Shift(Point(a), i), c), beta)
+            alpha = Shift(
+                Graft(Shift(Point(b), g), Shift(Point(a), f), b), alpha)
+            return Shift(Graft(beta, alpha, i), A).eval()
+
+        s = classic("abcfghiαβA")
+        t = classic("pqrklmnxyz")
+        self.assertEqual(s.certificate(), t.certificate())
+        self.assertTrue(s.isomorphic(t))
+        self.assertEqual(len({s.certificate(), t.certificate()}), 1)
+        labels = s.canonicalForm()[1]
+        self.assertEqual(len(set(labels.values())), 10)
+        # Variables equal modulo the theory have the same label
+        for cls in s.theory.classes:
+            self.assertEqual(len({labels[v] for v in cls}), 1)
+        self.assertFalse(
+            NamedOpetope.OpetopicInteger(3).eval().isomorphic(
+                NamedOpetope.OpetopicInteger(2).eval()))
+        self.assertTrue(
+            NamedOpetope.OpetopicInteger(3).eval().isomorphic(
+                NamedOpetope.OpetopicInteger(3, "x", "y", "Z").eval()))
+        # The typing of a sequent is taken into account, but not by OCMTs
+        p = NamedOpetope.point("x")
+        d = NamedOpetope.degen(p)
+        self.assertFalse(p.isomorphic(d))
+        self.assertTrue(
+            NamedOpetope.OCMT(p.theory, p.context).isomorphic(
+                NamedOpetope.OCMT(d.theory, d.context)))
+
     def test_degenshift(self):
         pass
 
     def test_graft(self):
-        pass
+        Graft, Point, Shift = \
+            NamedOpetope.Graft, NamedOpetope.Point, NamedOpetope.Shift
+        beta = Shift(
+            Graft(Shift(Point("c"), "h"), Shift(Point("a"), "i"), "c"), "β")
+        alpha = Shift(
+            Graft(Shift(Point("b"), "g"), Shift(Point("a"), "f"), "b"), "α")
+        gamma = Shift(
+            Graft(Shift(Point("c"), "h"), Shift(Point("a"), "k"), "c"), "γ")
+        x = Shift(Graft(gamma, Shift(Shift(Point("a"), "i"), "δ"), "k"), "X")
+        # The source of the conclusion is computed in the union of the
+        # premisses, as α is grafted on the source of δ
+        s = NamedOpetope.graft(
+            Shift(Graft(beta, alpha, "i"), "A").eval(), x.eval(), "β")
+        self.assertEqual(str(s.typing),
+                         "A(β ← X) : γ(k ← δ(i ← α)) ⊷ h(c ← g(b ← f)) ⊷ "
+                         "a ⊷ ∅")
+
+    def test_ProofTree(self):
+        Degen, DegenFill, Graft, Point, Shift = \
+            NamedOpetope.Degen, NamedOpetope.DegenFill, NamedOpetope.Graft, \
+            NamedOpetope.Point, NamedOpetope.Shift
+        beta = Shift(
+            Graft(Shift(Point("c"), "h"), Shift(Point("a"), "i"), "c"), "β")
+        alpha = Shift(
+            Graft(Shift(Point("b"), "g"), Shift(Point("a"), "f"), "b"), "α")
+        proofs = [
+            Point("x"),
+            NamedOpetope.Arrow(),
+            NamedOpetope.OpetopicInteger(0),
+            NamedOpetope.OpetopicInteger(4),
+            Degen(NamedOpetope.Arrow()),
+            Graft(Shift(Point("c"), "h"), Shift(Point("a"), "i"), "c"),
+            Shift(Graft(beta, alpha, "i"), "A"),
+            # Degenerate grafting, adding an equation to the theory
+            Shift(
+                Graft(NamedOpetope.OpetopicInteger(2),
+                      DegenFill(Point("a_1"), "B"), "f_1"), "Z"),
+            Shift(
+                Graft(NamedOpetope.OpetopicInteger(2),
+                      DegenFill(Point("a_2"), "B"), "f_2"), "Z")
+        ]
+        for p in proofs:
+            self.assertEqual(repr(NamedOpetope.ProofTree(p.eval())), repr(p))
+        self.assertEqual(str(proofs[-2].eval().typing),
+                         "Z : A(f_1 ← B) ⊷ f_2 ⊷ a_2 ⊷ ∅")
+        s = proofs[-1].eval()
+        self.assertEqual(len(s.theory.classes), 1)
+        self.assertEqual(len(NamedOpetope.ProofTree(s).eval().theory.classes),
+                         1)
+        # The sequent must be derivable
+        s = NamedOpetope.OpetopicInteger(2).eval()
+        s.context = s.context.extend([
+            NamedOpetope.Typing(
+                NamedOpetope.Term(NamedOpetope.Variable("y", 0)),
+                NamedOpetope.Type([NamedOpetope.Term()]))
+        ])
+        with self.assertRaises(DerivationError):
+            NamedOpetope.ProofTree(s)
+        NamedOpetope.ProofTree(s, False)
+        # and its types must be those of the derivation
+        s = NamedOpetope.OpetopicInteger(2).eval()
+        a1, A = s.context["a_1"], s.context["A"]
+        typing = NamedOpetope.Typing(
+            NamedOpetope.Term(A),
+            NamedOpetope.Type([s.source(A, 1), NamedOpetope.Term(a1),
+                               NamedOpetope.Term()]))
+        self.assertEqual(str(typing), "A : f_1(a_1 ← f_2) ⊷ a_1 ⊷ ∅")
+        s.context = NamedOpetope.Context(
+            typing if t.term.variable == A else t for t in s.context)
+        s.typing = typing
+        with self.assertRaises(DerivationError):
+            NamedOpetope.ProofTree(s)
 
 
 if __name__ == "__main__":
@@ -59,6 +59,16 @@ class Test_NamedOpetopicSet_InferenceRules(unittest.TestCase):
         self.assertEqual(len(d.context), len(a.context) + len(c.context))
         self.assertEqual(len(d.theory.classes),
                          len(a.theory.classes) + len(c.theory.classes))
+        self.assertEqual(len(a.context), 12)
+        self.assertEqual(len(c.context), 15)
+        self.assertEqual(d.context.variables(),
+                         a.context.variables() | c.context.variables())
+        self.assertTrue(d.theory.equal(
+            NamedOpetope.Variable("a_1", 0),
+            NamedOpetope.Variable("tf_2", 0)))
+        self.assertTrue(d.theory.equal(
+            NamedOpetope.Variable("b_1", 0),
+            NamedOpetope.Variable("tg_2", 0)))
 
     def test_glue(self):
         a = NamedOpetopicSet.Repr(NamedOpetope.OpetopicInteger(3)).eval()
@@ -66,7 +76,12 @@ class Test_NamedOpetopicSet_InferenceRules(unittest.TestCase):
             NamedOpetopicSet.glue(a, "a_1", "f_1")
         with self.assertRaises(DerivationError):
             NamedOpetopicSet.glue(a, "f_1", "f_2")
-        a = NamedOpetopicSet.glue(a, "a_1", "a_2")
+        b = NamedOpetopicSet.glue(a, "a_1", "a_2")
+        self.assertIs(b.context, a.context)
+        self.assertEqual(len(a.theory.classes), 3)
+        self.assertFalse(a.theory.equal(
+            NamedOpetope.Variable("a_1", 0), NamedOpetope.Variable("a_2", 0)))
+        a = b
         a = NamedOpetopicSet.glue(a, "a_1", "a_3")
         a = NamedOpetopicSet.glue(a, "a_1", "ttA")
         a = NamedOpetopicSet.glue(a, "f_1", "f_2")
@@ -74,6 +89,27 @@ class Test_NamedOpetopicSet_InferenceRules(unittest.TestCase):
         a = NamedOpetopicSet.glue(a, "f_1", "tA")
         self.assertEqual(len(a.theory.classes), 2)
 
+    def test_gluemany(self):
+        a = NamedOpetopicSet.Repr(NamedOpetope.OpetopicInteger(3)).eval()
+        with self.assertRaises(DerivationError) as cm:
+            NamedOpetopicSet.gluemany(
+                a, [("a_1", "f_1"), ("f_1", "f_2"), ("a_1", "a_2"),
+                    ("a_1", "x")])
+        self.assertIn("3 identification(s)", cm.exception.message)
+        self.assertEqual(len(a.theory.classes), 3)
+        b = NamedOpetopicSet.gluemany(
+            a, [("f_1", "f_2"), ("f_1", "f_3"), ("f_1", "tA"), ("a_1", "a_2"),
+                ("a_1", "a_3"), ("a_1", "ttA")])
+        self.assertEqual(len(b.theory.classes), 2)
+        self.assertIs(b.context, a.context)
+        c = NamedOpetopicSet.GlueMany(
+            NamedOpetopicSet.Repr(NamedOpetope.OpetopicInteger(3)),
+            [("a_1", "a_2"), ("a_1", "a_3"), ("a_1", "ttA")]).eval()
+        d = NamedOpetopicSet.glue(
+            NamedOpetopicSet.glue(NamedOpetopicSet.glue(a, "a_1", "a_2"),
+                                  "a_1", "a_3"), "a_1", "ttA")
+        self.assertEqual(len(c.theory.classes), len(d.theory.classes))
+
     def test_zero(self):
         pass
 
@@ -56,6 +56,19 @@ class Test_NamedOpetopicSetM_InferenceRules(unittest.TestCase):
         self.assertTrue(isinstance(s, NamedOpetope.OCMT))
         self.assertEqual(len(s.context), 3)
         self.assertEqual(len(s.theory.classes), 0)
+        p = NamedOpetopicSetM.pd(s, "f")
+        s = NamedOpetopicSetM.shift(p, "α")
+        self.assertEqual(len(s.context), 6)
+        self.assertTrue(s.theory.equal(
+            NamedOpetope.Variable("ttα", 0), NamedOpetope.Variable("tf", 0)))
+        self.assertEqual(len(p.context), 3)
+        self.assertEqual(len(p.theory.classes), 0)
+        self.assertEqual(len(NamedOpetopicSetM.shift(p, "α").context), 6)
+        s = NamedOpetopicSetM.DegenFill(
+            NamedOpetopicSetM.Point("x"), "x", "A").eval()
+        self.assertEqual(len(s.context), 4)
+        self.assertTrue(s.theory.equal(
+            NamedOpetope.Variable("ttA", 0), NamedOpetope.Variable("x", 0)))
 
     def test_zero(self):
         pass
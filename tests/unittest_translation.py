@@ -0,0 +1,139 @@
+import unittest
+
+import sys
+sys.path.insert(0, "../")
+
+from opetopy.common import DerivationError
+
+from opetopy import NamedOpetope
+from opetopy import Translation
+from opetopy import UnnamedOpetope
+
+
+class Test_Translation(unittest.TestCase):
+
+    def setUp(self):
+        beta = NamedOpetope.Shift(
+            NamedOpetope.Graft(
+                NamedOpetope.Shift(NamedOpetope.Point("c"), "h"),
+                NamedOpetope.Shift(NamedOpetope.Point("a"), "i"), "c"), "β")
+        alpha = NamedOpetope.Shift(
+            NamedOpetope.Graft(
+                NamedOpetope.Shift(NamedOpetope.Point("b"), "g"),
+                NamedOpetope.Shift(NamedOpetope.Point("a"), "f"), "b"), "α")
+        self.classic = NamedOpetope.Shift(
+            NamedOpetope.Graft(beta, alpha, "i"), "A")
+        self.unnamedClassic = UnnamedOpetope.Graft(
+            UnnamedOpetope.Shift(UnnamedOpetope.OpetopicInteger(2)),
+            UnnamedOpetope.OpetopicInteger(2),
+            UnnamedOpetope.address([['*']]))
+
+    def test_NameSupply(self):
+        names = Translation.NameSupply("y", ["y1"])
+        self.assertEqual([names(), names(), names()], ["y0", "y2", "y3"])
+
+    def test_toNamed(self):
+        seq = Translation.toNamed(self.unnamedClassic, "X")
+        self.assertEqual(str(seq.typing.term), "X")
+        self.assertEqual(len(seq.context), 10)
+        self.assertEqual(len(seq.theory.classes), 0)
+        self.assertTrue(seq.isomorphic(self.classic.eval()))
+        self.assertEqual(
+            str(seq.source(seq.context["X"], 1)),
+            "X.s[](X.s[].s[*] ← X.s[[*]])")
+        for n in range(4):
+            seq = Translation.toNamed(UnnamedOpetope.OpetopicInteger(n))
+            self.assertTrue(
+                seq.isomorphic(NamedOpetope.OpetopicInteger(n).eval()))
+        # The translation is derivable
+        p = NamedOpetope.ProofTree(Translation.toNamed(self.unnamedClassic))
+        self.assertTrue(p.eval().isomorphic(self.classic.eval()))
+        # Even when degenerate faces are grafted, the variables of the
+        # collapsed faces being then equal modulo the theory
+        Degen, Graft, Shift = \
+            UnnamedOpetope.Degen, UnnamedOpetope.Graft, UnnamedOpetope.Shift
+        address = UnnamedOpetope.address
+        for i, addr in enumerate([['*'], []]):
+            seq = Translation.toNamed(
+                Graft(Shift(UnnamedOpetope.OpetopicInteger(2)),
+                      UnnamedOpetope.OpetopicInteger(0), address([addr], 2)))
+            self.assertEqual(len(seq.theory.classes), 1 - i)
+            p = NamedOpetope.Shift(
+                NamedOpetope.Graft(
+                    NamedOpetope.OpetopicInteger(2),
+                    NamedOpetope.DegenFill(
+                        NamedOpetope.Point("a_" + str(2 - i)), "B"),
+                    "f_" + str(2 - i)), "Z")
+            self.assertTrue(seq.isomorphic(p.eval()))
+            self.assertTrue(
+                NamedOpetope.ProofTree(seq).eval().isomorphic(p.eval()))
+        # All the points of a collapsed source are equal
+        p = UnnamedOpetope.Shift(UnnamedOpetope.OpetopicInteger(3))
+        for addr in [[], ['*'], ['*', '*']]:
+            p = Graft(p, UnnamedOpetope.OpetopicInteger(0),
+                      address([addr], 2))
+        seq = Translation.toNamed(p)
+        self.assertEqual([len(c) for c in seq.theory.classes], [3])
+        self.assertTrue(NamedOpetope.ProofTree(seq).eval().isomorphic(seq))
+        child = Graft(
+            Graft(Graft(Shift(UnnamedOpetope.OpetopicInteger(3)),
+                        UnnamedOpetope.OpetopicInteger(1), address([[]], 2)),
+                  UnnamedOpetope.OpetopicInteger(2), address([['*']])),
+            UnnamedOpetope.OpetopicInteger(0), address([['*', '*']]))
+        ps = [
+            UnnamedOpetope.Degen(UnnamedOpetope.OpetopicInteger(0)), child,
+            Graft(Shift(Shift(UnnamedOpetope.OpetopicInteger(3))), child,
+                  address([[]], 3)),
+            Graft(Shift(child), Degen(UnnamedOpetope.Arrow()),
+                  address([[[]]], 3))
+        ]
+        for p in ps:
+            omega, _ = Translation.toUnnamed(
+                NamedOpetope.ProofTree(Translation.toNamed(p)))
+            self.assertIs(omega, UnnamedOpetope.shape(p))
+        seq = Translation.toNamed(
+            UnnamedOpetope.Degen(UnnamedOpetope.Arrow()))
+        self.assertEqual(str(seq.typing.type),
+                         "_x.d ⊷ x.d ⊷ x.d.s* ⊷ ∅")
+        # Batched translation
+        seqs = Translation.toNamedAll(
+            [UnnamedOpetope.Arrow(),
+             UnnamedOpetope.shape(UnnamedOpetope.Arrow()).source])
+        self.assertEqual([str(s.typing) for s in seqs],
+                         ["x0 : x0.s* ⊷ ∅", "x1 : x1.s* ⊷ ∅"])
+
+    def test_toUnnamed(self):
+        omega, names = Translation.toUnnamed(self.classic)
+        self.assertIs(omega, UnnamedOpetope.shape(self.unnamedClassic))
+        self.assertEqual(
+            {str(a): str(v) for a, v in names.items()},
+            {"[]": "β", "[[*]]": "α"})
+        omega, names = Translation.toUnnamed(
+            NamedOpetope.Graft(
+                NamedOpetope.Shift(NamedOpetope.Point("c"), "h"),
+                NamedOpetope.Shift(NamedOpetope.Point("a"), "i"), "c"))
+        self.assertIs(omega, UnnamedOpetope.OPETOPIC_INTEGERS[2])
+        self.assertEqual(names[UnnamedOpetope.address(['*'])].name, "i")
+        omega, names = Translation.toUnnamed(NamedOpetope.Point("a"))
+        self.assertIs(omega, UnnamedOpetope.POINT)
+        self.assertEqual(names, {})
+        # Degenerate grafting, whose equation is taken into account
+        p = NamedOpetope.Shift(
+            NamedOpetope.Graft(
+                NamedOpetope.OpetopicInteger(2),
+                NamedOpetope.DegenFill(NamedOpetope.Point("a_2"), "B"),
+                "f_2"), "Z")
+        omega, names = Translation.toUnnamed(p)
+        self.assertTrue(Translation.toNamed(omega).isomorphic(p.eval()))
+        # Round trips and batched translation
+        ps = [
+            UnnamedOpetope.Degen(UnnamedOpetope.OpetopicInteger(3)),
+            UnnamedOpetope.Shift(self.unnamedClassic), self.unnamedClassic
+        ]
+        res = Translation.toUnnamedAll(Translation.toNamedAll(ps))
+        for p, (omega, _) in zip(ps, res):
+            self.assertIs(omega, UnnamedOpetope.shape(p))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity = 2)
@@ -1,4 +1,7 @@
+from copy import copy, deepcopy
+import pickle
 import unittest
+import weakref
 
 import sys
 sys.path.insert(0, "../")
@@ -468,6 +471,16 @@ class Test_UnnamedOpetope_Preopetope(unittest.TestCase):
         self.assertEqual(UnnamedOpetope.Preopetope.substitution(
             i4, UnnamedOpetope.Address.fromList(['*', '*'], 1), ctx, i2),
             i5)
+        # Substituting a node by a degenerate preopetope removes it
+        i1 = UnnamedOpetope.OpetopicInteger(1).eval().source
+        d = UnnamedOpetope.OpetopicInteger(0).eval().source
+        for addr in [
+                UnnamedOpetope.Address.epsilon(1),
+                UnnamedOpetope.Address.fromList(['*'], 1)
+        ]:
+            self.assertEqual(
+                UnnamedOpetope.Preopetope.substitution(
+                    i2, addr, UnnamedOpetope.Context(2), d), i1)
 
     def test_toDict(self):
         for i in range(5):
@@ -552,6 +565,135 @@ class Test_UnnamedOpetope_Utils(unittest.TestCase):
     def setUp(self):
         pass
 
+    def test_shape(self):
+        a = UnnamedOpetope.shape(UnnamedOpetope.Arrow())
+        self.assertIs(a, UnnamedOpetope.shape(UnnamedOpetope.Arrow()))
+        self.assertEqual(a.source, UnnamedOpetope.Arrow().eval().source)
+        self.assertEqual(a.target, UnnamedOpetope.Point().eval().source)
+        self.assertIs(copy(a), a)
+        self.assertIs(deepcopy(a), a)
+        self.assertIs(pickle.loads(pickle.dumps(a)), a)
+        i2 = UnnamedOpetope.shape(UnnamedOpetope.OpetopicInteger(2))
+        self.assertIsNot(a, i2)
+        self.assertEqual(i2.targetId, a.id)
+        self.assertEqual(
+            i2.sourceIds, {
+                UnnamedOpetope.address([], 1): a.id,
+                UnnamedOpetope.address(['*']): a.id
+            })
+        self.assertIsNone(i2.degeneracyId)
+        self.assertEqual(UnnamedOpetope.DEGEN_ARROW.degeneracyId, a.id)
+        # Two different proof trees of the same opetope share their shape
+        self.assertIs(
+            UnnamedOpetope.shape(UnnamedOpetope.ProofTree(
+                UnnamedOpetope.OpetopicInteger(2).eval().source.toDict())),
+            i2)
+        with self.assertRaises(DerivationError):
+            UnnamedOpetope.shape(UnnamedOpetope.Graft(
+                UnnamedOpetope.Arrow(), UnnamedOpetope.Point(),
+                UnnamedOpetope.address('*')))
+        # Proof trees are looked up by their last rule and the shapes of its
+        # premises, and are not kept alive by the registry
+        s = UnnamedOpetope.shape(
+            UnnamedOpetope.Shift(UnnamedOpetope.OpetopicInteger(2)))
+        proof = UnnamedOpetope.Shift(UnnamedOpetope.OpetopicInteger(2))
+        proof.eval = None
+        self.assertIs(UnnamedOpetope.shape(proof), s)
+        ref = weakref.ref(proof)
+        del proof
+        self.assertIsNone(ref())
+
+    def test_shapeTarget(self):
+        U = UnnamedOpetope
+        self.assertIs(U.ARROW.targetShape(), U.POINT)
+        self.assertIs(U.OPETOPIC_INTEGERS[3].targetShape(), U.ARROW)
+        self.assertIs(U.DEGEN_ARROW.targetShape(), U.OPETOPIC_INTEGERS[1])
+        with self.assertRaises(DerivationError):
+            U.POINT.targetShape()
+        for p in [
+                U.Shift(U.OpetopicInteger(11)),
+                U.Graft(U.Shift(U.OpetopicInteger(9)), U.OpetopicInteger(9),
+                        U.address([['*']]))
+        ]:
+            s = U.shape(p)
+            t = s.targetShape()
+            self.assertEqual(t.source, s.target)
+            self.assertEqual(t.id, s.targetId)
+            self.assertIs(s.targetShape(), t)
+
+    def test_shapeSources(self):
+        U = UnnamedOpetope
+        self.assertIs(U.ARROW.sourceShape(U.address('*')), U.POINT)
+        self.assertIs(U.OPETOPIC_INTEGERS[3].sourceShape(U.address(['*'])),
+                      U.ARROW)
+        self.assertIs(U.DEGEN_ARROW.degeneracyShape(), U.ARROW)
+        with self.assertRaises(DerivationError):
+            U.ARROW.sourceShape(U.address([], 1))
+        with self.assertRaises(DerivationError):
+            U.ARROW.degeneracyShape()
+        s = U.shape(
+            U.Graft(U.Shift(U.OpetopicInteger(2)), U.OpetopicInteger(0),
+                    U.address([['*']])))
+        self.assertIs(s.sourceShape(U.address([['*']])), U.DEGEN_POINT)
+        self.assertIs(s.sourceShape(U.address([], 2)),
+                      U.OPETOPIC_INTEGERS[2])
+
+    def test_faces(self):
+        U = UnnamedOpetope
+        classic = U.Graft(U.Shift(U.OpetopicInteger(2)),
+                          U.OpetopicInteger(2), U.address([['*']]))
+        f = U.faces(classic)
+        self.assertIs(f, U.shape(classic).faces())
+        self.assertIs(U.faces(classic.eval()), f)
+        self.assertIs(U.faces(classic.eval().source), f)
+        self.assertEqual(len(f), 13)
+        self.assertEqual([len(f.codimension(k)) for k in range(4)],
+                         [1, 3, 5, 4])
+        self.assertEqual(f.dimension(), 3)
+        # Iterated targets
+        self.assertEqual(f.targetAt(0), 0)
+        t = f.targetAt(1)
+        self.assertIs(f.shapes[t], U.shape(classic).targetShape())
+        self.assertEqual(f.targetAt(2), f.target[t])
+        self.assertEqual(f.targetAt(3), f.targetAt(2, t))
+        self.assertEqual(f.paths[f.targetAt(2)], ('s[]', 't'))
+        with self.assertRaises(DerivationError):
+            f.targetAt(4)
+        # Sources, and the face poset
+        s = f.source(U.address([], 2))
+        self.assertEqual(f.paths[s], ('s[]', ))
+        self.assertEqual(f.immediateFaces(s), f.codimension(1, s))
+        self.assertEqual(len(f.faces(s)), 7)
+        self.assertEqual(len(f.codimension(2, s)), 3)
+        self.assertTrue(f.isFace(f.targetAt(3), s))
+        self.assertFalse(f.isFace(t, s))
+        self.assertEqual(len(f.faces()), 13)
+        with self.assertRaises(DerivationError):
+            f.source(U.address([['*', '*']]))
+        # Degenerate opetopes
+        f = U.faces(U.OpetopicInteger(0))
+        self.assertEqual(f.paths[f.degeneracy[0]], ('d', ))
+        self.assertEqual(f.source(U.address('*'), f.targetAt(1)),
+                         f.degeneracy[0])
+        self.assertEqual(f.targetAt(2), f.degeneracy[0])
+
+    def test_shapeConstants(self):
+        self.assertEqual(UnnamedOpetope.POINT.id, 0)
+        self.assertIs(UnnamedOpetope.shape(UnnamedOpetope.Point()),
+                      UnnamedOpetope.POINT)
+        self.assertIs(UnnamedOpetope.shape(UnnamedOpetope.Arrow()),
+                      UnnamedOpetope.ARROW)
+        for n in range(len(UnnamedOpetope.OPETOPIC_INTEGERS)):
+            self.assertIs(
+                UnnamedOpetope.shape(UnnamedOpetope.OpetopicInteger(n)),
+                UnnamedOpetope.OPETOPIC_INTEGERS[n])
+        self.assertIs(UnnamedOpetope.DEGEN_POINT,
+                      UnnamedOpetope.OPETOPIC_INTEGERS[0])
+        self.assertEqual(UnnamedOpetope.DEGEN_ARROW.source,
+                         UnnamedOpetope.OpetopicTree(None).eval().source)
+        self.assertEqual(UnnamedOpetope.ARROW.targetId,
+                         UnnamedOpetope.POINT.id)
+
     def test_address(self):
         self.assertEqual(
             UnnamedOpetope.address('*'),
@@ -0,0 +1,245 @@
+import unittest
+
+import sys
+sys.path.insert(0, "../")
+
+from opetopy.common import DerivationError, PersistentDict
+
+from opetopy import UnnamedOpetope
+from opetopy import UnnamedOpetopicCategory
+from opetopy import UnnamedOpetopicSet
+
+
+class Test_UnnamedOpetopicCategory_InferenceRules(unittest.TestCase):
+
+    def setUp(self):
+        self.seq = UnnamedOpetopicSet.point(UnnamedOpetopicSet.Sequent(),
+                                            "a")
+        self.seq = UnnamedOpetopicSet.graft(
+            self.seq,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "a"}))
+        self.seq = UnnamedOpetopicCategory.tfill(self.seq, "b", "f")
+        self.seq = UnnamedOpetopicSet.graft(
+            self.seq,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "b"}))
+        self.seq = UnnamedOpetopicCategory.tfill(self.seq, "c", "g")
+
+    def composite(self, seq: UnnamedOpetopicSet.Sequent) \
+            -> UnnamedOpetopicSet.Sequent:
+        """
+        Convenient function to fill the composite of ``f`` and ``g``
+        """
+        seq = UnnamedOpetopicSet.graft(
+            seq,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.OpetopicInteger(2), {
+                    UnnamedOpetope.address([], 1): "g",
+                    UnnamedOpetope.address(['*']): "f"
+                }))
+        return UnnamedOpetopicCategory.tfill(seq, "h", "α")
+
+    def test_universality(self):
+        self.assertEqual(self.seq.targetUniversal, {"f", "g"})
+        self.assertEqual(self.seq.sourceUniversal, {})
+        self.assertTrue(
+            UnnamedOpetopicCategory.isTargetUniversal(self.seq, "f"))
+        self.assertFalse(
+            UnnamedOpetopicCategory.isTargetUniversal(self.seq, "a"))
+        self.assertFalse(
+            UnnamedOpetopicCategory.isSourceUniversal(
+                self.seq, "f", UnnamedOpetope.address('*')))
+        # Flags are passed on by the rules of OptSet?, and the typings are
+        # left untouched
+        s = self.composite(self.seq)
+        self.assertEqual(s.targetUniversal, {"f", "g", "α"})
+        self.assertIs(s.context["f"], self.seq.context["f"])
+        self.assertEqual(self.seq.targetUniversal, {"f", "g"})
+        self.assertIn("∀h", str(s))
+        # Deprecated type-based API
+        raw = self.seq.context["f"].type
+        with self.assertWarns(DeprecationWarning):
+            t = UnnamedOpetopicCategory.Type(raw.source, raw.target)
+        t.targetUniversal = True
+        with self.assertWarns(DeprecationWarning):
+            self.assertTrue(UnnamedOpetopicCategory.isTargetUniversal(t))
+        with self.assertWarns(DeprecationWarning):
+            self.assertFalse(UnnamedOpetopicCategory.isTargetUniversal(raw))
+        with self.assertWarns(DeprecationWarning):
+            self.assertFalse(
+                UnnamedOpetopicCategory.isSourceUniversal(
+                    t, UnnamedOpetope.address([], 0)))
+
+    def test_complete(self):
+        proof = UnnamedOpetopicSet.Point(None, ["a", "b", "c"])
+        for x, y, f in [("a", "b", "f"), ("b", "c", "g"), ("a", "c", "i")]:
+            proof = UnnamedOpetopicSet.Graft(
+                proof,
+                UnnamedOpetopicSet.pastingDiagram(
+                    UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): x}))
+            proof = UnnamedOpetopicSet.Shift(proof, y, f)
+        # Composite of f and g, and identities
+        p, s = UnnamedOpetopicCategory.complete(proof, 2)
+        self.assertEqual(len(s.context), 14)
+        self.assertEqual(len(p.eval().context), 14)
+        self.assertEqual(s.context["c1"].type.source.nodes, {
+            UnnamedOpetope.address([], 1): "g",
+            UnnamedOpetope.address(['*']): "f"
+        })
+        self.assertEqual(s.targetUniversal,
+                         {"c1", "c2", "c3", "c4", "c5", "c6", "c7"})
+        # Target universal property of the composite over β
+        proof = UnnamedOpetopicSet.Graft(
+            proof,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.OpetopicInteger(2), {
+                    UnnamedOpetope.address([], 1): "g",
+                    UnnamedOpetope.address(['*']): "f"
+                }))
+        proof = UnnamedOpetopicSet.Shift(proof, "i", "β")
+        p, s = UnnamedOpetopicCategory.complete(proof, 3)
+        self.assertEqual(
+            s.context.cellsWithSource(s.context["c9"].type.source), {"c9"})
+        self.assertEqual(s.context.target("c9"), "β")
+        self.assertTrue(
+            UnnamedOpetopicCategory.isSourceUniversal(
+                s, "c9", UnnamedOpetope.address([], 2)))
+        # Budgets
+        p, s = UnnamedOpetopicCategory.complete(proof,
+                                                3,
+                                                maxRounds=None,
+                                                maxCells=40)
+        self.assertLessEqual(len(s.context), 40)
+        self.assertEqual(len(p.eval().context), len(s.context))
+        p, s = UnnamedOpetopicCategory.complete(proof, 3, timeout=0)
+        self.assertEqual(len(s.context), 7)
+
+    def test_composite(self):
+        P = UnnamedOpetopicSet.pastingDiagram(
+            UnnamedOpetope.OpetopicInteger(2), {
+                UnnamedOpetope.address([], 1): "g",
+                UnnamedOpetope.address(['*']): "f"
+            })
+        self.assertIsNone(UnnamedOpetopicCategory.filler(self.seq, P))
+        s, h, alpha = UnnamedOpetopicCategory.composite(
+            UnnamedOpetopicSet.graft(self.seq, P), "h", "α")
+        self.assertEqual((h, alpha), ("h", "α"))
+        self.assertEqual(UnnamedOpetopicCategory.filler(s, P), "α")
+        self.assertIsNone(UnnamedOpetopicCategory.filler(self.seq, P))
+        # The composite is not computed again
+        t, h, alpha = UnnamedOpetopicCategory.composite(
+            UnnamedOpetopicSet.graft(s, P), "h2", "α2")
+        self.assertEqual((h, alpha), ("h", "α"))
+        self.assertIs(t.context, s.context)
+        self.assertIsNone(t.pastingDiagram)
+
+    def test_tclose(self):
+        s = self.composite(self.seq)
+        t = UnnamedOpetopicCategory.tclose(s, "α")
+        self.assertIs(t.context, s.context)
+        self.assertEqual(t.targetUniversal, {"f", "g", "h", "α"})
+        self.assertNotIn("h", s.targetUniversal)
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicCategory.tclose(t, "α")
+
+    def test_tclosure(self):
+        s, applications = UnnamedOpetopicCategory.tclosure(self.seq)
+        self.assertEqual(applications, [])
+        self.assertEqual(s.targetUniversal, self.seq.targetUniversal)
+        # Compose f and g into h, then h and k into m: closing α makes h
+        # target universal, which in turn allows to close β
+        s = self.composite(self.seq)
+        s = UnnamedOpetopicSet.graft(
+            s,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "c"}))
+        s = UnnamedOpetopicCategory.tfill(s, "d", "k")
+        s = UnnamedOpetopicSet.graft(
+            s,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.OpetopicInteger(2), {
+                    UnnamedOpetope.address([], 1): "k",
+                    UnnamedOpetope.address(['*']): "h"
+                }))
+        s = UnnamedOpetopicCategory.tfill(s, "m", "β")
+        t, applications = UnnamedOpetopicCategory.tclosure(s)
+        self.assertEqual(applications, ["α", "β"])
+        self.assertIs(t.context, s.context)
+        self.assertEqual(t.targetUniversal,
+                         {"f", "g", "h", "k", "m", "α", "β"})
+        self.assertEqual(s.targetUniversal, {"f", "g", "k", "α", "β"})
+        # Proof export
+        proof = UnnamedOpetopicSet.Point(None, "a")
+        proof = UnnamedOpetopicSet.Graft(
+            proof,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "a"}))
+        proof = UnnamedOpetopicCategory.TFill(proof, "b", "f")
+        proof = UnnamedOpetopicSet.Degen(proof, "b")
+        proof = UnnamedOpetopicCategory.TFill(proof, "i", "ι")
+        proof = UnnamedOpetopicCategory.tclosureProof(proof)
+        self.assertIsInstance(proof, UnnamedOpetopicCategory.TClose)
+        self.assertEqual(proof.tuCellName, "ι")
+        self.assertEqual(proof.eval().targetUniversal, {"f", "i", "ι"})
+
+    def test_candidates(self):
+        s = self.composite(self.seq)
+        s = UnnamedOpetopicSet.graft(
+            s,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "a"}))
+        s = UnnamedOpetopicSet.shift(s, "c", "i")
+        s = UnnamedOpetopicSet.graft(
+            s,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.OpetopicInteger(2), {
+                    UnnamedOpetope.address([], 1): "g",
+                    UnnamedOpetope.address(['*']): "f"
+                }))
+        s = UnnamedOpetopicSet.shift(s, "i", "β")
+        self.assertEqual(UnnamedOpetopicCategory.tunivCandidates(s, "α"),
+                         ["β"])
+        self.assertEqual(UnnamedOpetopicCategory.tunivCandidates(s, "f"),
+                         ["h", "i"])
+        s = UnnamedOpetopicCategory.tuniv(s, "α", "β", "ξ", "A")
+        s = UnnamedOpetopicCategory.tuniv(s, "α", "β", "ζ", "B")
+        addr = UnnamedOpetope.address([], 2)
+        self.assertEqual(
+            UnnamedOpetopicCategory.sunivCandidates(s, "A", addr), ["B"])
+        self.assertEqual(
+            UnnamedOpetopicCategory.sunivCandidates(
+                s, "A", UnnamedOpetope.address([[]], 2)), [])
+        s = UnnamedOpetopicCategory.suniv(s, "A", "B", addr, "C", "Ψ")
+        self.assertTrue(UnnamedOpetopicCategory.isTargetUniversal(s, "Ψ"))
+
+    def test_tuniv(self):
+        s = UnnamedOpetopicSet.graft(
+            self.seq,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "a"}))
+        s = UnnamedOpetopicSet.shift(s, "a", "e")
+        s = UnnamedOpetopicSet.degen(s, "a")
+        s = UnnamedOpetopicSet.shift(s, "e", "δ")
+        s = UnnamedOpetopicSet.degen(s, "a")
+        s = UnnamedOpetopicCategory.tfill(s, "i", "ι")
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicCategory.tuniv(s, "δ", "ι", "ξ", "A")
+        # The filler cache is only a fast path
+        t = s.copy()
+        t.fillers = PersistentDict()
+        self.assertEqual(
+            UnnamedOpetopicCategory.filler(t, t.context["ι"].type.source),
+            "ι")
+        t = UnnamedOpetopicCategory.tuniv(t, "ι", "δ", "ξ", "A")
+        self.assertTrue(UnnamedOpetopicCategory.isTargetUniversal(t, "A"))
+        s = UnnamedOpetopicCategory.tuniv(s, "ι", "δ", "ξ", "A")
+        self.assertTrue(UnnamedOpetopicCategory.isTargetUniversal(s, "A"))
+        self.assertTrue(
+            UnnamedOpetopicCategory.isSourceUniversal(
+                s, "A", UnnamedOpetope.address([], 2)))
+        self.assertFalse(UnnamedOpetopicCategory.isTargetUniversal(s, "ξ"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity = 2)
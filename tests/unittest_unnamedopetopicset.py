@@ -1,9 +1,11 @@
+from copy import deepcopy
+import time
 import unittest
 
 import sys
 sys.path.insert(0, "../")
 
-from opetopy.common import DerivationError
+from opetopy.common import DerivationError, PersistentSet
 
 from opetopy import UnnamedOpetope
 from opetopy import UnnamedOpetopicSet
@@ -48,6 +50,17 @@ class Test_UnnamedOpetopicSet_Variable(unittest.TestCase):
         self.assertEqual(self.i3.shape,
                          UnnamedOpetope.OpetopicInteger(3).eval().source)
 
+    def test_sharedShape(self):
+        self.assertIs(self.a.sharedShape, self.b.sharedShape)
+        self.assertIs(self.i1.sharedShape,
+                      UnnamedOpetope.shape(UnnamedOpetope.OpetopicInteger(1)))
+        self.assertIsNot(self.i2.sharedShape, self.i3.sharedShape)
+        self.assertIs(deepcopy(self.c).sharedShape, self.c.sharedShape)
+        # The proof tree is the one provided at creation
+        proof = UnnamedOpetope.Arrow()
+        self.assertIs(
+            UnnamedOpetopicSet.Variable("d", proof).shapeProof, proof)
+
     def test_shapeTarget(self):
         self.assertEqual(self.a.shapeTarget(),
                          UnnamedOpetope.Point().eval().source)
@@ -136,6 +149,36 @@ class Test_UnnamedOpetopicSet_PastingDiagram(unittest.TestCase):
             UnnamedOpetopicSet.PastingDiagram.degeneratePastingDiagram(
                 UnnamedOpetope.OpetopicInteger(1), "d")
 
+    def test_key(self):
+        d = UnnamedOpetopicSet.pastingDiagram(
+            UnnamedOpetope.OpetopicInteger(0), "a")
+        p = UnnamedOpetopicSet.pastingDiagram(
+            UnnamedOpetope.OpetopicInteger(2), {
+                UnnamedOpetope.address([], 1): "a",
+                UnnamedOpetope.address(['*']): "b"
+            })
+        q = UnnamedOpetopicSet.pastingDiagram(
+            UnnamedOpetope.OpetopicInteger(2), {
+                UnnamedOpetope.address(['*']): "b",
+                UnnamedOpetope.address([], 1): "a"
+            })
+        r = UnnamedOpetopicSet.pastingDiagram(
+            UnnamedOpetope.OpetopicInteger(2), {
+                UnnamedOpetope.address([], 1): "b",
+                UnnamedOpetope.address(['*']): "a"
+            })
+        self.assertEqual(d.key(), (UnnamedOpetope.DEGEN_POINT.id, ("a", )))
+        self.assertEqual(p.key(), q.key())
+        self.assertNotEqual(p.key(), r.key())
+        self.assertNotEqual(
+            p.key(),
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.OpetopicInteger(3), {
+                    UnnamedOpetope.address([], 1): "a",
+                    UnnamedOpetope.address(['*']): "b",
+                    UnnamedOpetope.address(['*', '*']): "b"
+                }).key())
+
     def test_point(self):
         UnnamedOpetopicSet.PastingDiagram.point()
 
@@ -255,6 +298,105 @@ class Test_UnnamedOpetopicSet_Context(unittest.TestCase):
             self.ctx["b"]
         self.assertEqual(self.ctx["c"].variable, self.c.variable)
 
+    def test_cellsOfShape(self):
+        ctx = self.ctx + self.b
+        self.assertEqual(ctx.cellsOfShape(UnnamedOpetope.POINT.id), {"p"})
+        self.assertEqual(ctx.cellsOfShape(UnnamedOpetope.DEGEN_POINT.id),
+                         {"a", "b"})
+        self.assertEqual(ctx.cellsOfShape(UnnamedOpetope.ARROW.id), set())
+        ctx.discard(self.b)
+        self.assertEqual(ctx.cellsOfShape(UnnamedOpetope.DEGEN_POINT.id),
+                         {"a"})
+        # Copies are independent, on either side
+        cells = ctx.cellsOfShape(UnnamedOpetope.DEGEN_POINT.id)
+        copy = ctx.copy()
+        ctx.add(self.b)
+        copy.discard(copy["a"])
+        self.assertEqual(ctx.cellsOfShape(UnnamedOpetope.DEGEN_POINT.id),
+                         {"a", "b"})
+        self.assertEqual(copy.cellsOfShape(UnnamedOpetope.DEGEN_POINT.id),
+                         set())
+        # The returned sets are persistent
+        self.assertEqual(cells, {"a"})
+        self.assertFalse(hasattr(cells, "add"))
+
+    def test_cellsWithSource(self):
+        ctx = self.ctx + self.b
+        self.assertEqual(ctx.cellsWithSource(self.a.type.source), {"a", "b"})
+        self.assertEqual(ctx.cellsWithSource(self.c.type.source), {"c"})
+        self.assertEqual(ctx.cellsWithSourceKey(self.c.type.source.key()),
+                         {"c"})
+        self.assertEqual(
+            ctx.cellsWithSource(
+                UnnamedOpetopicSet.PastingDiagram.degeneratePastingDiagram(
+                    UnnamedOpetope.OpetopicInteger(0), "q")), set())
+        cells = ctx.cellsWithSource(self.a.type.source)
+        ctx.discard(self.a)
+        self.assertEqual(ctx.cellsWithSource(self.a.type.source), {"b"})
+        self.assertEqual(self.ctx.cellsWithSource(self.a.type.source), {"a"})
+        # The returned sets are persistent
+        self.assertEqual(cells, {"a", "b"})
+        self.assertFalse(hasattr(cells, "add"))
+
+    def test_cofaces(self):
+        self.assertEqual(self.ctx.cofaces("p"), {("a", None)})
+        self.assertEqual(self.ctx.cofaces("x"),
+                         {("c", UnnamedOpetope.Address.epsilon(1))})
+        self.assertEqual(self.ctx.cofaces("z"), {("c", None)})
+        self.assertEqual(self.ctx.cofaces("c"), set())
+        cofaces = self.ctx.cofaces("p")
+        ctx = self.ctx + self.b
+        self.assertEqual(ctx.cofaces("p"), {("a", None), ("b", None)})
+        self.assertEqual(self.ctx.cofaces("p"), {("a", None)})
+        # The returned sets are persistent
+        self.assertEqual(cofaces, {("a", None)})
+        self.assertFalse(hasattr(cofaces, "add"))
+        ctx.discard(ctx["c"])
+        self.assertEqual(ctx.cofaces("x"), set())
+        self.assertEqual(self.ctx.cofaces("x"),
+                         {("c", UnnamedOpetope.Address.epsilon(1))})
+
+    def test_cofacesIncomparable(self):
+        # Addresses cannot be compared to None, so persistent sets must only
+        # compare elements of the same hash, even when they share a slot
+        class Key:
+            def __init__(self, h):
+                self.h = h
+
+            def __eq__(self, other):
+                if not isinstance(other, Key):
+                    raise NotImplementedError
+                return self.h == other.h
+
+            def __hash__(self):
+                return self.h
+
+        s = PersistentSet().insert(Key(0)).insert(32)
+        self.assertEqual(len(s), 2)
+        self.assertIn(32, s)
+        self.assertNotIn(64, s)
+        self.assertEqual(len(s.remove(32)), 1)
+        self.assertIn(Key(0), s.remove(32))
+
+    def test_copy(self):
+        ctx = self.ctx.copy()
+        self.assertEqual(ctx, self.ctx)
+        ctx.add(self.b)
+        self.assertIn(self.b.variable, ctx)
+        self.assertNotIn(self.b.variable, self.ctx)
+        self.assertIs(ctx["a"], self.ctx["a"])
+        self.assertIn(self.ctx["a"], ctx)
+        self.assertNotIn(self.b, self.ctx)
+
+    def test_retype(self):
+        t = self.ctx["a"].type
+        ctx = self.ctx.retype("a", self.b.type)
+        self.assertEqual(len(ctx), len(self.ctx))
+        self.assertIs(ctx["a"].type, self.b.type)
+        self.assertIs(self.ctx["a"].type, t)
+        with self.assertRaises(DerivationError):
+            self.ctx.retype("b", self.b.type)
+
     def test_source(self):
         self.assertEqual(
             self.ctx.source("c", UnnamedOpetope.Address.epsilon(1)),
@@ -332,7 +474,10 @@ class Test_UnnamedOpetopicSet_InferenceRules(unittest.TestCase):
             UnnamedOpetopicSet.shift(s, "ab", "A")
         with self.assertRaises(DerivationError):
             UnnamedOpetopicSet.shift(s, "bc", "A")
-        UnnamedOpetopicSet.shift(s, "ac", "A")
+        t = UnnamedOpetopicSet.shift(s, "ac", "A")
+        self.assertNotIn(t["A"], s.context)
+        self.assertIsNone(t.pastingDiagram)
+        self.assertIs(t.context["A"].type.source, s.pastingDiagram)
 
     def test_graft(self):
         with self.assertRaises(DerivationError):
@@ -359,14 +504,343 @@ class Test_UnnamedOpetopicSet_InferenceRules(unittest.TestCase):
                         UnnamedOpetope.Address.epsilon(0).shift(): "ab"
                     }))
         # Correct grafting: ab on top of bc
-        UnnamedOpetopicSet.graft(
+        pd = UnnamedOpetopicSet.PastingDiagram.nonDegeneratePastingDiagram(
+            UnnamedOpetope.OpetopicInteger(2), {
+                UnnamedOpetope.Address.epsilon(1): "bc",
+                UnnamedOpetope.Address.epsilon(0).shift(): "ab"
+            })
+        s = UnnamedOpetopicSet.graft(self.seq, pd)
+        self.assertIs(s.context, self.seq.context)
+        self.assertIs(s.pastingDiagram, pd)
+        self.assertIsNone(self.seq.pastingDiagram)
+
+    def test_addcells(self):
+        def arrow(src: str) -> UnnamedOpetopicSet.PastingDiagram:
+            return UnnamedOpetopicSet.PastingDiagram.\
+                nonDegeneratePastingDiagram(
+                    UnnamedOpetope.Arrow(),
+                    {UnnamedOpetope.Address.epsilon(0): src})
+
+        pd = UnnamedOpetopicSet.PastingDiagram.nonDegeneratePastingDiagram(
+            UnnamedOpetope.OpetopicInteger(2), {
+                UnnamedOpetope.Address.epsilon(1): "bc",
+                UnnamedOpetope.Address.epsilon(0).shift(): "ab"
+            })
+        point = UnnamedOpetopicSet.PastingDiagram.point()
+        cells = [("A", pd, "ac"), ("ab", arrow("a"), "b"),
+                 ("bc", arrow("b"), "c"), ("ac", arrow("a"), "c"),
+                 ("a", point, None), ("b", point, None), ("c", point, None)]
+        s = UnnamedOpetopicSet.addcells(UnnamedOpetopicSet.Sequent(), cells)
+        self.assertEqual(s.context.variableNames(),
+                         ["a", "b", "c", "ab", "ac", "bc", "A"])
+        self.assertIs(s.context["A"].type.source, pd)
+        self.assertEqual(s.context.target("A"), "ac")
+        r = UnnamedOpetopicSet.AddCells(None, cells)
+        self.assertEqual(r.eval().context.variableNames(),
+                         s.context.variableNames())
+        r.toTex()
+        # Cells already in the context
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicSet.addcells(self.seq, cells)
+        # Incorrect target
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicSet.addcells(self.seq, [("A", pd, "cd")])
+        # Point with a target, and non point without one
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicSet.addcells(self.seq, [("e", point, "a")])
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicSet.addcells(self.seq, [("e", arrow("a"), None)])
+        # Unknown source
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicSet.addcells(self.seq, [("e", arrow("z"), "a")])
+        s = UnnamedOpetopicSet.addcells(self.seq, [("A", pd, "ac")])
+        self.assertNotIn(s["A"], self.seq.context)
+
+    def test_canonicalForm(self):
+        # Same opetopic set, with other names and another typing order
+        seq = UnnamedOpetopicSet.Sequent()
+        seq.context = UnnamedOpetopicSet.Context() + \
+            UnnamedOpetopicSet.Typing(self.d, self.type_point) + \
+            UnnamedOpetopicSet.Typing(self.c, self.type_point) + \
+            UnnamedOpetopicSet.Typing(self.b, self.type_point) + \
+            UnnamedOpetopicSet.Typing(self.a, self.type_point) + \
+            UnnamedOpetopicSet.Typing(
+                UnnamedOpetopicSet.Variable("x", UnnamedOpetope.Arrow()),
+                self.type_arrow("c", self.b)) + \
+            UnnamedOpetopicSet.Typing(
+                UnnamedOpetopicSet.Variable("y", UnnamedOpetope.Arrow()),
+                self.type_arrow("d", self.b)) + \
+            UnnamedOpetopicSet.Typing(
+                UnnamedOpetopicSet.Variable("z", UnnamedOpetope.Arrow()),
+                self.type_arrow("b", self.a)) + \
+            UnnamedOpetopicSet.Typing(
+                UnnamedOpetopicSet.Variable("w", UnnamedOpetope.Arrow()),
+                self.type_arrow("a", self.b))
+        self.assertFalse(UnnamedOpetopicSet.isomorphic(seq, self.seq))
+        seq.context = seq.context.retype("w", self.type_arrow("d", self.c))
+        self.assertEqual(UnnamedOpetopicSet.certificate(seq),
+                         UnnamedOpetopicSet.certificate(self.seq))
+        self.assertEqual(
+            UnnamedOpetopicSet.isomorphism(self.seq, seq), {
+                "a": "d",
+                "b": "c",
+                "c": "b",
+                "d": "a",
+                "ab": "w",
+                "ac": "y",
+                "bc": "x",
+                "cd": "z"
+            })
+        certificate, labels = UnnamedOpetopicSet.canonicalForm(self.seq)
+        self.assertEqual(sorted(labels.values()), list(range(8)))
+        # The pasting diagram is taken into account
+        s = UnnamedOpetopicSet.graft(
             self.seq,
-            UnnamedOpetopicSet.PastingDiagram.nonDegeneratePastingDiagram(
-                UnnamedOpetope.OpetopicInteger(2),
-                {
-                    UnnamedOpetope.Address.epsilon(1): "bc",
-                    UnnamedOpetope.Address.epsilon(0).shift(): "ab"
-                }))
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "a"}))
+        t = UnnamedOpetopicSet.graft(
+            self.seq,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "b"}))
+        self.assertNotEqual(UnnamedOpetopicSet.certificate(s), certificate)
+        self.assertFalse(UnnamedOpetopicSet.isomorphic(s, t))
+        # Automorphisms: all labellings of isolated points are equivalent
+        points = [
+            UnnamedOpetopicSet.point(UnnamedOpetopicSet.Sequent(),
+                                     [str(i) for i in range(n, n + 30)])
+            for n in range(3)
+        ]
+        self.assertEqual(
+            len({UnnamedOpetopicSet.certificate(p)
+                 for p in points}), 1)
+        self.assertIsNone(
+            UnnamedOpetopicSet.isomorphism(points[0],
+                                           UnnamedOpetopicSet.Sequent()))
+
+    def test_canonicalFormSymmetric(self):
+        def arrow(src):
+            return UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(),
+                {UnnamedOpetope.Address.epsilon(0): src})
+
+        point = UnnamedOpetopicSet.PastingDiagram.point()
+
+        def parallel(names):
+            return UnnamedOpetopicSet.addcells(
+                UnnamedOpetopicSet.Sequent(),
+                [("a", point, None), ("b", point, None)] +
+                [(x, arrow("a"), "b") for x in names])
+
+        def triangles(names):
+            cells = []
+            for x in names:
+                pd = UnnamedOpetopicSet.PastingDiagram.\
+                    nonDegeneratePastingDiagram(
+                        UnnamedOpetope.OpetopicInteger(2), {
+                            UnnamedOpetope.Address.epsilon(1): x + "bc",
+                            UnnamedOpetope.Address.epsilon(0).shift():
+                            x + "ab"
+                        })
+                cells += [(x + "A", pd, x + "ac"),
+                          (x + "ab", arrow(x + "a"), x + "b"),
+                          (x + "bc", arrow(x + "b"), x + "c"),
+                          (x + "ac", arrow(x + "a"), x + "c"),
+                          (x + "a", point, None), (x + "b", point, None),
+                          (x + "c", point, None)]
+            return UnnamedOpetopicSet.addcells(UnnamedOpetopicSet.Sequent(),
+                                               cells)
+
+        # 160 parallel arrows, and 60 disjoint copies of O[i2] (420 cells),
+        # whose automorphism groups are huge
+        for build, n in [(parallel, 160), (triangles, 60)]:
+            names = [str(i) for i in range(n)]
+            start = time.perf_counter()
+            certificate = UnnamedOpetopicSet.certificate(build(names))
+            self.assertLess(time.perf_counter() - start, 2)
+            self.assertEqual(
+                UnnamedOpetopicSet.certificate(build(names[::-1])),
+                certificate)
+            self.assertNotEqual(
+                UnnamedOpetopicSet.certificate(build(names[1:])),
+                certificate)
+
+    def test_morphisms(self):
+        arrow = UnnamedOpetopicSet.point(UnnamedOpetopicSet.Sequent(),
+                                         ["x", "y", "z"])
+        arrow = UnnamedOpetopicSet.graft(
+            arrow,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "x"}))
+        arrow = UnnamedOpetopicSet.shift(arrow, "y", "f")
+        self.assertEqual(UnnamedOpetopicSet.countMorphisms(arrow, self.seq),
+                         16)
+        self.assertIn({
+            "x": "a",
+            "y": "b",
+            "z": "d",
+            "f": "ab"
+        }, list(UnnamedOpetopicSet.morphisms(arrow, self.seq)))
+        pair = UnnamedOpetopicSet.graft(
+            arrow,
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.Arrow(), {UnnamedOpetope.address('*'): "y"}))
+        pair = UnnamedOpetopicSet.shift(pair, "z", "g")
+        self.assertEqual(UnnamedOpetopicSet.countMorphisms(pair, self.seq), 3)
+        self.assertTrue(UnnamedOpetopicSet.morphismExists(pair, self.seq))
+        self.assertFalse(UnnamedOpetopicSet.morphismExists(self.seq, pair))
+        self.assertEqual(
+            list(
+                UnnamedOpetopicSet.morphisms(UnnamedOpetopicSet.Sequent(),
+                                             self.seq)), [{}])
+        # Endomorphisms of the nerve of the walking arrow: the identity, and
+        # the two constant morphisms
+        s = UnnamedOpetopicSet.nerve(["x", "y"], {
+            "ix": ("x", "x"),
+            "iy": ("y", "y"),
+            "f": ("x", "y")
+        }, {
+            "x": "ix",
+            "y": "iy"
+        }, {
+            ("ix", "ix"): "ix",
+            ("iy", "iy"): "iy",
+            ("f", "ix"): "f",
+            ("iy", "f"): "f"
+        }, 3)
+        ms = list(UnnamedOpetopicSet.morphisms(s, s))
+        self.assertEqual(len(ms), 3)
+        self.assertIn({v: v for v in s.context.variableNames()}, ms)
+
+    def test_nerve(self):
+        objects = ["x", "y"]
+        morphisms = {"ix": ("x", "x"), "iy": ("y", "y"), "f": ("x", "y")}
+        identities = {"x": "ix", "y": "iy"}
+        composition = {
+            ("ix", "ix"): "ix",
+            ("iy", "iy"): "iy",
+            ("f", "ix"): "f",
+            ("iy", "f"): "f"
+        }
+        cells = list(
+            UnnamedOpetopicSet.nerveCells(objects, morphisms, identities,
+                                          composition, 3))
+        self.assertEqual([len(c) for c in cells], [2, 3, 9, 35])
+        twoCells = [(str(pd), t) for _, pd, t in cells[2]]
+        self.assertIn(("{{x}}", "ix"), twoCells)
+        self.assertIn(("{[] ← iy, [*] ← f}", "f"), twoCells)
+        self.assertNotIn(("{[] ← iy, [*] ← f}", "iy"), twoCells)
+        s = UnnamedOpetopicSet.nerve(objects, morphisms, identities,
+                                     composition, 3)
+        self.assertEqual(len(s.context), 49)
+        # The nerve is a valid opetopic set
+        UnnamedOpetopicSet.addcells(UnnamedOpetopicSet.Sequent(),
+                                    [c for cs in cells for c in cs])
+        # Incomplete composition table
+        del composition[("iy", "f")]
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicSet.nerve(objects, morphisms, identities,
+                                     composition, 2)
+
+    def test_pastingDiagrams(self):
+        pds = list(UnnamedOpetopicSet.pastingDiagrams(self.seq, 1))
+        self.assertEqual(len(pds), 7)
+        self.assertEqual(len(set(P.key() for P in pds)), 7)
+        self.assertIn(
+            UnnamedOpetopicSet.pastingDiagram(
+                UnnamedOpetope.OpetopicInteger(2), {
+                    UnnamedOpetope.address([], 1): "cd",
+                    UnnamedOpetope.address(['*']): "bc"
+                }), pds)
+        self.assertEqual(
+            len(list(UnnamedOpetopicSet.pastingDiagrams(self.seq, 1, 3))), 8)
+        self.assertEqual(
+            len(list(UnnamedOpetopicSet.pastingDiagrams(self.seq, 0))), 4)
+
+    def test_matchPastingDiagrams(self):
+        match = lambda shapeProof: list(
+            UnnamedOpetopicSet.matchPastingDiagrams(self.seq, shapeProof))
+        pds = match(UnnamedOpetope.OpetopicInteger(2))
+        self.assertEqual([P.nodes for P in pds], [{
+            UnnamedOpetope.address([], 1): "bc",
+            UnnamedOpetope.address(['*']): "ab"
+        }, {
+            UnnamedOpetope.address([], 1): "cd",
+            UnnamedOpetope.address(['*']): "ac"
+        }, {
+            UnnamedOpetope.address([], 1): "cd",
+            UnnamedOpetope.address(['*']): "bc"
+        }])
+        for P in pds:
+            UnnamedOpetopicSet.graft(self.seq, P)
+        self.assertEqual(len(match(UnnamedOpetope.OpetopicInteger(3))), 1)
+        self.assertEqual(match(UnnamedOpetope.OpetopicInteger(4)), [])
+        self.assertEqual(
+            [P.degeneracy for P in match(UnnamedOpetope.OpetopicInteger(0))],
+            ["a", "b", "c", "d"])
+        self.assertEqual(len(match(UnnamedOpetope.Arrow())), 4)
+        self.assertEqual(match(UnnamedOpetope.Point()),
+                         [UnnamedOpetopicSet.PastingDiagram.point()])
+        # Generation is lazy
+        gen = UnnamedOpetopicSet.matchPastingDiagrams(
+            self.seq, UnnamedOpetope.OpetopicInteger(2))
+        self.assertEqual(next(gen), pds[0])
+
+    def test_representable(self):
+        U = UnnamedOpetope
+        classic = U.Graft(U.Shift(U.OpetopicInteger(2)),
+                          U.OpetopicInteger(2), U.address([['*']]))
+        for p, n in [(U.Point(), 1), (U.Arrow(), 3), (U.OpetopicInteger(0), 3),
+                     (U.OpetopicInteger(3), 9), (U.Degen(U.Arrow()), 5),
+                     (classic, 13), (U.Shift(classic), 15)]:
+            cells = UnnamedOpetopicSet.representableCells(p, "ω")
+            self.assertEqual(len(cells), n)
+            # The cells are well typed
+            s = UnnamedOpetopicSet.addcells(UnnamedOpetopicSet.Sequent(),
+                                            cells)
+            self.assertEqual(s["ω"].sharedShape, U.shape(p))
+        s = UnnamedOpetopicSet.representable(U.OpetopicInteger(2), "A")
+        self.assertEqual(
+            s.context["A"].type.source.nodes, {
+                U.address([], 1): "A.s[]",
+                U.address(['*']): "A.s[*]"
+            })
+        self.assertEqual(s.context.target("A"), "A.t")
+        self.assertEqual(s.context.target("A.s[*]"),
+                         s.context.source("A.s[]", U.address('*')))
+        self.assertIs(s["A.s[]"].sharedShape, s["A.t"].sharedShape)
+        # Faces of a degenerate opetope
+        s = UnnamedOpetopicSet.representable(U.OpetopicInteger(0))
+        self.assertEqual(s.context["x"].type.source.degeneracy, "x.d")
+        self.assertEqual(s.context.target("x.t"), "x.d")
+        # Faces up to a dimension
+        s = UnnamedOpetopicSet.representable(classic, dim=1)
+        self.assertEqual(len(s.context), 9)
+        self.assertNotIn("x", s.context)
+
+    def test_pastingDiagramBuilder(self):
+        b = UnnamedOpetopicSet.PastingDiagramBuilder(self.seq, "bc")
+        self.assertEqual(b.leaves, {UnnamedOpetope.address(['*']): "b"})
+        with self.assertRaises(DerivationError):  # cd is not on top of bc
+            b.graft(UnnamedOpetope.address(['*']), "cd")
+        with self.assertRaises(DerivationError):  # not a leaf
+            b.graft(UnnamedOpetope.address(['*', '*']), "ab")
+        c = b.copy().graft(UnnamedOpetope.address(['*']), "ab")
+        self.assertEqual(len(b.nodes), 1)
+        self.assertEqual(c.leaves, {UnnamedOpetope.address(['*', '*']): "a"})
+        pd = c.pastingDiagram()
+        q = UnnamedOpetopicSet.PastingDiagram.nonDegeneratePastingDiagram(
+            UnnamedOpetope.OpetopicInteger(2), {
+                UnnamedOpetope.Address.epsilon(1): "bc",
+                UnnamedOpetope.Address.epsilon(0).shift(): "ab"
+            })
+        self.assertEqual(pd, q)
+        self.assertEqual(q.leafSources(self.seq.context), c.leaves)
+        s = c.toSequent()
+        self.assertEqual(s.pastingDiagram, pd)
+        with self.assertRaises(DerivationError):
+            UnnamedOpetopicSet.shift(s, "cd", "A")
+        s = UnnamedOpetopicSet.shift(s, "ac", "A")
+        self.assertEqual(s.context["A"].type.source, pd)
 
     def test_point(self):
         s = UnnamedOpetopicSet.point(UnnamedOpetopicSet.Sequent(), "x")